@@ -0,0 +1,78 @@
+"""Time-to-first-token with and without prompt-prefix KV reuse.
+
+Speaker detection and summarisation alternate on the same model, as they do
+in a full pipeline run, so llama-cpp-python's own "longest common prefix"
+reuse never kicks in across calls. Three modes are compared:
+
+* ``cold``: ``llm.reset()`` before every call (prompt evaluated from scratch)
+* ``implicit``: no reset, only llama-cpp-python's reuse of the previous prompt
+* ``prefix``: the stage prefix state is restored with :class:`PrefixCache`
+
+    python -m benchmarks.bench_prefix_cache --model ./data/models/eva_gguf/Turdus-trained-20-int4.gguf
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from typing import List, Tuple
+
+from src.inference import speaker_splitter_llm, summarizer
+from src.inference.llm_utils import PrefixCache, load_model
+
+_CHUNKS = [
+    "Señor Presidente, muchas gracias. Quiero comenzar recordando a todos los presentes que hoy es un día histórico para nuestro país.",
+    "No basta con aprobar leyes; debemos asegurarnos de que sean implementadas de manera efectiva en cada rincón del país.",
+    "Seguidamente quiero convocar a la doctora Estela González de Rojas, prologuista, a quien recibimos con un fuerte aplauso.",
+    "En el ámbito económico, debemos redoblar nuestros esfuerzos para fomentar la inversión extranjera, sin descuidar nuestras industrias locales.",
+    "Finalmente, quiero invitar a la diputada Rocío Abed de Zacarías, coautora del libro.",
+    "Por otro lado, no podemos ignorar el impacto del cambio climático.",
+]
+
+_STAGES = [
+    (speaker_splitter_llm.build_prompt, speaker_splitter_llm.PROMPT_PREFIX),
+    (summarizer.build_prompt, summarizer.PROMPT_PREFIX),
+]
+
+
+def _ttft(llm, prompt: str) -> float:
+    """Seconds until the first streamed token."""
+    start = time.perf_counter()
+    for _ in llm(prompt, max_tokens=1, temperature=0.0, stream=True):
+        break
+    return time.perf_counter() - start
+
+
+def run(llm, mode: str, rounds: int) -> List[Tuple[str, float]]:
+    prefixes = PrefixCache()
+    timings = []
+    for _ in range(rounds):
+        for chunk in _CHUNKS:
+            for build, prefix in _STAGES:
+                if mode == "cold":
+                    llm.reset()
+                elif mode == "prefix":
+                    prefixes.restore(llm, prefix)
+                timings.append((build.__module__, _ttft(llm, build(chunk))))
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", required=True, help="Path to the GGUF checkpoint")
+    parser.add_argument("--gpu-layers", type=int, default=0)
+    parser.add_argument("--rounds", type=int, default=2)
+    args = parser.parse_args()
+
+    llm = load_model(args.model, n_gpu_layers=args.gpu_layers)
+    _ttft(llm, "[INST] Hola [/INST]")  # warm-up
+
+    for mode in ("cold", "implicit", "prefix"):
+        timings = run(llm, mode, args.rounds)
+        values = [t for _, t in timings]
+        print(f"{mode:>8}: median TTFT {statistics.median(values) * 1000:7.1f} ms · "
+              f"mean {statistics.mean(values) * 1000:7.1f} ms over {len(values)} calls")
+
+
+if __name__ == "__main__":
+    main()
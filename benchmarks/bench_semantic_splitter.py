@@ -0,0 +1,67 @@
+"""Greedy vs. topic-boundary chunking on a synthetic long transcript.
+
+Runs offline: the transcript is generated from a few topic vocabularies and,
+unless ``--model`` is given, sentences are embedded with a hashed
+bag-of-words so no trained model is needed.
+
+    python -m benchmarks.bench_semantic_splitter --sentences 20000
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import List
+
+import numpy as np
+
+from src.inference.semantic_splitter import SemanticSplitter
+
+from .fixtures import hashed_bow, synthetic_transcript
+
+
+def _boundary_precision(chunks: List[str], sentences: List[str], truth: set) -> float:
+    cut, hits = 0, 0
+    for chunk in chunks[:-1]:
+        cut += chunk.count(". ") + 1
+        hits += cut in truth
+    return hits / max(1, len(chunks) - 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sentences", type=int, default=20_000)
+    parser.add_argument("--max-words", type=int, default=1024)
+    parser.add_argument("--model", default=None, help="spaCy model to embed with (default: hashed BoW)")
+    parser.add_argument("--window", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=1.0)
+    args = parser.parse_args()
+
+    sentences, truth = synthetic_transcript(args.sentences)
+    text = " ".join(sentences)
+    print(f"{len(sentences)} sentences, {len(text.split())} words, {len(truth)} topic shifts")
+
+    for strategy in ("greedy", "topic"):
+        splitter = SemanticSplitter(
+            args.model or "blank:es",
+            max_words=args.max_words,
+            strategy=strategy,
+            embed=None if args.model else hashed_bow,
+            window=args.window,
+            threshold=args.threshold,
+            min_words=64,
+        )
+        if not args.model:
+            splitter.nlp.add_pipe("sentencizer")
+        splitter.nlp.max_length = max(splitter.nlp.max_length, len(text) + 1)
+
+        start = time.perf_counter()
+        chunks = splitter.split_text(text)
+        elapsed = time.perf_counter() - start
+        sizes = [len(c.split()) for c in chunks]
+        print(f"{strategy:>6}: {elapsed:6.2f} s · {len(chunks):5d} chunks · "
+              f"mean {np.mean(sizes):6.0f} / max {max(sizes)} words · "
+              f"cuts on a topic shift: {_boundary_precision(chunks, sentences, truth):.0%}")
+
+
+if __name__ == "__main__":
+    main()
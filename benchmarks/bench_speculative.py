@@ -0,0 +1,78 @@
+"""Speculative vs. plain decoding on the summary and speaker prompts.
+
+Every configuration loads its own copy of the model (a draft is fixed at
+load time), then summarises and analyses the same Spanish session excerpts
+with the completion cache off. Reported per configuration: generated
+tokens per second, mean latency per chunk, speedup over plain decoding and
+the share of draft tokens the model accepted.
+
+    python -m benchmarks.bench_speculative --model ./data/models/eva_gguf/Turdus-trained-20-int4.gguf
+    python -m benchmarks.bench_speculative --model big.gguf --drafts prompt-lookup prompt-lookup:4 small.gguf
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import statistics
+from typing import Dict, List
+
+from src.inference import speaker_splitter_llm, summarizer
+from src.inference.llm_cache import LLMCache
+from src.inference.llm_utils import BatchResult, generate_batch, load_model
+
+from .bench_prefix_cache import _CHUNKS
+
+# Longer excerpts for the summaries: they copy names and phrases from here,
+# which is where prompt lookup pays off.
+_TEXTS = [" ".join(_CHUNKS[i:] + _CHUNKS[:i]) for i in range(len(_CHUNKS))]
+
+
+def _run(llm, args: argparse.Namespace) -> Dict[str, List[BatchResult]]:
+    cache = LLMCache(enabled=False)
+    results = {"summary": [], "speakers": []}
+    for _ in range(args.rounds):
+        results["summary"] += generate_batch(
+            llm, [summarizer.build_prompt(text) for text in _TEXTS], args.max_tokens,
+            prompt_version=summarizer.PROMPT_VERSION, cache=cache, prefix=summarizer.PROMPT_PREFIX,
+        )
+        results["speakers"] += generate_batch(
+            llm, [speaker_splitter_llm.build_structured_prompt(chunk) for chunk in _CHUNKS],
+            speaker_splitter_llm.STRUCTURED_MAX_TOKENS,
+            prompt_version=speaker_splitter_llm.STRUCTURED_PROMPT_VERSION, cache=cache,
+            prefix=speaker_splitter_llm.PROMPT_PREFIX, grammar=speaker_splitter_llm.SPEAKER_GRAMMAR,
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", required=True, help="Path to the GGUF checkpoint")
+    parser.add_argument("--drafts", nargs="+", default=["prompt-lookup"],
+                        help="Draft specs to compare with plain decoding (see load_model)")
+    parser.add_argument("--gpu-layers", type=int, default=0)
+    parser.add_argument("--n-ctx", type=int, default=2048)
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--rounds", type=int, default=2)
+    args = parser.parse_args()
+
+    baseline: Dict[str, float] = {}
+    for draft in [None, *args.drafts]:
+        llm = load_model(args.model, n_gpu_layers=args.gpu_layers, n_ctx=args.n_ctx, draft=draft)
+        generate_batch(llm, ["[INST] Hola [/INST]"], 4, cache=LLMCache(enabled=False))  # warm-up
+        for stage, results in _run(llm, args).items():
+            tokens = sum(r.completion_tokens for r in results)
+            seconds = sum(r.latency_s for r in results)
+            tps = tokens / seconds if seconds else 0.0
+            baseline.setdefault(stage, tps)
+            proposed = sum(r.draft_tokens for r in results)
+            accepted = sum(r.accepted_draft_tokens for r in results)
+            acceptance = f"{accepted / proposed:6.1%} of {proposed} draft tokens" if proposed else "-"
+            print(f"{draft or 'plain':>16} {stage:>8}: {tps:6.1f} tok/s · "
+                  f"{statistics.mean(r.latency_s for r in results) * 1000:7.0f} ms/chunk · "
+                  f"x{tps / baseline[stage]:.2f} · accepted {acceptance}")
+        del llm
+        gc.collect()
+
+
+if __name__ == "__main__":
+    main()
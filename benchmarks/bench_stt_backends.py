@@ -0,0 +1,89 @@
+"""Real-time factor and peak memory of each STT backend on the same audio.
+
+Every backend runs in its own subprocess so peak RSS is not polluted by the
+others (or by the libraries they import). The audio is decoded once per run
+and trimmed to ``--seconds`` so backends see identical input.
+
+    python -m benchmarks.bench_stt_backends session.mp4 --seconds 300
+    python -m benchmarks.bench_stt_backends session.mp4 --backends hf ct2 --threads 8
+"""
+from __future__ import annotations
+
+import argparse
+import difflib
+import json
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Dict
+
+from src.inference.audio import SAMPLE_RATE, decode_audio
+from src.inference.stt import get_engine
+
+
+def _child(args: argparse.Namespace) -> None:
+    audio = decode_audio(args.audio, SAMPLE_RATE)
+    if args.seconds:
+        audio = audio[:int(args.seconds * SAMPLE_RATE)]
+
+    config: Dict[str, Any] = {}
+    if args.backend in ("ct2", "faster-whisper") and args.threads:
+        config["cpu_threads"] = args.threads
+    engine = get_engine(backend=args.backend, **config)
+    engine.load()
+
+    start = time.perf_counter()
+    result = engine.run({"raw": audio, "sampling_rate": SAMPLE_RATE}, batch_size=args.batch_size)[0]
+    inference = time.perf_counter() - start
+
+    audio_seconds = audio.size / SAMPLE_RATE
+    print(json.dumps({
+        "backend": args.backend,
+        "model": engine.model_id,
+        "load_s": engine.load_time,
+        "audio_s": audio_seconds,
+        "inference_s": inference,
+        "rtf": inference / audio_seconds if audio_seconds else 0.0,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # KiB on Linux
+        "text": result["text"],
+    }, ensure_ascii=False))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("audio", help="Audio/video file")
+    parser.add_argument("--backends", nargs="+", default=["hf", "ct2"])
+    parser.add_argument("--seconds", type=float, default=300.0, help="Audio to transcribe (0 for all)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads for ct2 (0: automatic)")
+    parser.add_argument("--child", metavar="BACKEND", dest="backend", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.backend:
+        _child(args)
+        return
+
+    reports = []
+    for backend in args.backends:
+        cmd = [sys.executable, "-m", "benchmarks.bench_stt_backends", args.audio, "--child", backend,
+               "--seconds", str(args.seconds), "--batch-size", str(args.batch_size),
+               "--threads", str(args.threads)]
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=False)
+        if proc.returncode != 0:
+            print(f"{backend:>8}: failed (exit {proc.returncode})")
+            continue
+        reports.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    if not reports:
+        return
+    reference = reports[0]["text"].split()
+    for r in reports:
+        agreement = difflib.SequenceMatcher(None, reference, r["text"].split(), autojunk=False).ratio()
+        print(f"{r['backend']:>8}: RTF {r['rtf']:.3f} · inference {r['inference_s']:6.1f} s for "
+              f"{r['audio_s']:.0f} s audio · load {r['load_s']:5.1f} s · peak RSS {r['peak_rss_mb']:7.0f} MB · "
+              f"word agreement with {reports[0]['backend']} {agreement:.1%}")
+
+
+if __name__ == "__main__":
+    main()
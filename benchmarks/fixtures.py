@@ -0,0 +1,187 @@
+"""Deterministic offline inputs for the benchmarks.
+
+Everything here is generated from a seed, so two runs on the same machine
+measure exactly the same work: Spanish-looking transcripts with topic shifts,
+speech-like audio with known speaker turns (voiced syllables synthesised
+from per-speaker harmonic spectra, no TTS involved) and an STT engine stand-in
+with a fixed cost per second of audio.
+"""
+from __future__ import annotations
+
+import random
+import time
+import zlib
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from src.inference.audio import SAMPLE_RATE
+from src.inference.stt import Segment
+
+_TOPICS = [
+    "presupuesto gasto fiscal deuda impuestos recaudación déficit ministerio hacienda partidas",
+    "educación escuelas docentes alumnos universidad becas currículo aulas formación matrícula",
+    "salud hospitales médicos pacientes vacunas enfermeras medicamentos clínicas emergencias camas",
+    "seguridad policía delitos cárceles fiscalía narcotráfico patrullas denuncias jueces penas",
+    "agricultura sequía productores cosecha ganado soja semillas créditos rural exportación",
+]
+_FILLER = "el la de que y en los se por un para con no una su al es lo como más pero sus le ya o".split()
+_SPEAKERS = [
+    "la diputada Rocío Abed de Zacarías",
+    "el senador Juan Carlos Benítez",
+    "la doctora Estela González de Rojas",
+    "el ministro Óscar Llamosas",
+]
+
+
+def _sentence(rng: random.Random, topic: List[str]) -> str:
+    words = [rng.choice(topic) if rng.random() < 0.4 else rng.choice(_FILLER)
+             for _ in range(rng.randint(6, 25))]
+    return " ".join(words).capitalize() + "."
+
+
+def synthetic_transcript(n_sentences: int, mean_topic_len: int = 40, seed: int = 0) -> Tuple[List[str], set]:
+    """Return *(sentences, true_boundaries)* with topic shifts every ~*mean_topic_len* sentences."""
+    rng = random.Random(seed)
+    vocab = [topic.split() for topic in _TOPICS]
+    sentences: List[str] = []
+    boundaries = set()
+    topic = 0
+    while len(sentences) < n_sentences:
+        if sentences:
+            boundaries.add(len(sentences))
+        topic = (topic + rng.randint(1, len(vocab) - 1)) % len(vocab)
+        for _ in range(max(3, int(rng.expovariate(1 / mean_topic_len)))):
+            sentences.append(_sentence(rng, vocab[topic]))
+    return sentences[:n_sentences], {b for b in boundaries if b < n_sentences}
+
+
+def synthetic_session(n_words: int, *, words_per_s: float = 2.5, mean_turn_sentences: int = 60,
+                      seed: int = 0) -> List[Segment]:
+    """Timestamped transcript segments of about *n_words*, one sentence each.
+
+    Every ~*mean_turn_sentences* sentences the floor is handed over with an
+    introduction ("Tiene la palabra el senador ..."), which is what the
+    speaker detector looks for.
+    """
+    rng = random.Random(seed)
+    sentences, _ = synthetic_transcript(max(1, n_words // 15), seed=seed)
+    segments: List[Segment] = []
+    t = 0.0
+    for i, sentence in enumerate(sentences):
+        if i and rng.random() < 1 / mean_turn_sentences:
+            sentence = f"Tiene la palabra {rng.choice(_SPEAKERS)}. " + sentence
+        duration = len(sentence.split()) / words_per_s
+        segments.append(Segment(round(t, 2), round(t + duration, 2), sentence))
+        t += duration + rng.uniform(0.1, 0.6)
+    return segments
+
+
+def hashed_bow(sentences: List[str], dim: int = 512) -> np.ndarray:
+    """Vectorised hashed bag-of-words embedding (stand-in for a real model)."""
+    rows, cols = [], []
+    for i, sentence in enumerate(sentences):
+        for word in sentence.lower().split():
+            rows.append(i)
+            cols.append(zlib.crc32(word.strip(".,;:").encode()) % dim)
+    emb = np.zeros((len(sentences), dim), dtype=np.float32)
+    np.add.at(emb, (np.array(rows), np.array(cols)), 1.0)
+    return emb
+
+
+def _voice(rng: np.random.Generator, size: int = 1024) -> np.ndarray:
+    """One period of a voiced sound: harmonics shaped by two random formants."""
+    k = np.arange(1, 41)
+    formants = rng.uniform([4, 12], [9, 24])
+    amp = k ** -1.0 * (1 + 4 * np.exp(-((k - formants[0]) / 2) ** 2) + 2 * np.exp(-((k - formants[1]) / 3) ** 2))
+    phase = np.arange(size) / size
+    wave = (amp[:, None] * np.sin(2 * np.pi * k[:, None] * phase + rng.uniform(0, 2 * np.pi, (k.size, 1)))).sum(0)
+    return (wave / np.abs(wave).max()).astype(np.float32)
+
+
+def synthetic_audio(seconds: float, *, n_speakers: int = 3, sample_rate: int = SAMPLE_RATE,
+                    mean_turn_s: float = 20.0, seed: int = 0) -> Tuple[np.ndarray, List[Tuple[float, float, int]]]:
+    """Speech-like mono audio and its true speaker turns.
+
+    Each speaker has its own pitch and harmonic spectrum; speech is a train
+    of 2-5 Hz syllables grouped into words and phrases, with pauses long
+    enough for a VAD to find and a -60 dBFS noise floor in between.
+
+    Returns
+    -------
+    audio : np.ndarray
+        float32 samples in [-1, 1].
+    turns : list of (start, end, speaker)
+        Ground truth, in seconds.
+    """
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sample_rate)
+    audio = (rng.standard_normal(total) * 1e-3).astype(np.float32)
+    pitches = 95.0 * 1.45 ** np.arange(n_speakers)
+    voices = [_voice(rng) for _ in range(n_speakers)]
+
+    turns: List[Tuple[float, float, int]] = []
+    pos, speaker = 0, 0
+    while pos < total:
+        turn_end = min(total, pos + int(np.clip(rng.exponential(mean_turn_s), 3, 60) * sample_rate))
+        turn_start = pos
+        while pos < turn_end:
+            for _ in range(rng.integers(3, 10)):  # one phrase
+                for _ in range(rng.integers(1, 4)):  # one word
+                    n = int(rng.uniform(0.12, 0.25) * sample_rate)
+                    if pos + n > turn_end:
+                        break
+                    f0 = pitches[speaker] * (1 + rng.normal(0, 0.04)) * np.linspace(1.03, 0.97, n)
+                    phase = np.cumsum(f0 / sample_rate) % 1.0
+                    table = voices[speaker]
+                    syllable = table[(phase * table.size).astype(np.int64)] * np.hanning(n)
+                    audio[pos:pos + n] += 0.3 * syllable.astype(np.float32)
+                    pos += n
+                pos += int(rng.uniform(0.05, 0.2) * sample_rate)
+            pos += int(rng.uniform(0.4, 1.2) * sample_rate)
+        turns.append((turn_start / sample_rate, min(pos, total) / sample_rate, speaker))
+        pos = max(pos, turn_end)
+        if n_speakers > 1:
+            speaker = (speaker + int(rng.integers(1, n_speakers))) % n_speakers
+    return np.clip(audio, -1, 1), turns
+
+
+class StubEngine:
+    """STT engine stand-in with the result format of the Whisper engines.
+
+    Audio is "transcribed" into generated sentences, one segment per
+    *segment_s* of non-silent audio, chosen from a hash of the samples so
+    identical audio always gives identical text. Every call sleeps
+    ``rtf * audio seconds`` to stand for the decoding cost.
+    """
+
+    def __init__(self, *, rtf: float = 0.02, segment_s: float = 4.0, language: str = "spanish"):
+        self.model_id = "stub"
+        self.language = language
+        self.rtf = rtf
+        self.segment_s = segment_s
+        self.load_time: float | None = 0.0
+        self._vocab = [topic.split() for topic in _TOPICS]
+
+    def load(self) -> "StubEngine":
+        return self
+
+    def run(self, inputs: Any, **kwargs: Any) -> List[Dict[str, Any]]:
+        if isinstance(inputs, dict):
+            inputs = [inputs]
+        results = []
+        for item in inputs:
+            audio, sample_rate = item["raw"], item["sampling_rate"]
+            duration = audio.size / sample_rate
+            time.sleep(duration * self.rtf)
+            chunks = []
+            for start in np.arange(0.0, duration, self.segment_s):
+                end = min(start + self.segment_s, duration)
+                piece = audio[int(start * sample_rate):int(end * sample_rate)]
+                if piece.size == 0 or np.sqrt(np.mean(piece ** 2)) < 0.01:
+                    continue
+                rng = random.Random(zlib.crc32(piece.tobytes()))
+                chunks.append({"text": " " + _sentence(rng, rng.choice(self._vocab)),
+                               "timestamp": (float(start), float(end))})
+            results.append({"text": "".join(c["text"] for c in chunks), "chunks": chunks})
+        return results
@@ -0,0 +1,141 @@
+"""``llama_cpp.Llama`` stand-in for benchmarking the LLM stages without weights.
+
+:class:`StubLlama` answers the speaker-detection and summary prompts with
+plausible, deterministic completions and sleeps a fixed time per evaluated
+prompt token and per generated token, so what gets measured is everything
+around the model: prompt building, prefix reuse, batching, parsing and the
+pipeline plumbing. Pass ``--model`` to the suite to measure a real GGUF.
+"""
+from __future__ import annotations
+
+import json
+import re
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+from unittest import mock
+
+from llama_cpp import Llama
+
+from src.inference import speaker_splitter_llm, summarizer
+
+_TOKEN = re.compile(rb"\w+|[^\w\s]")
+_CHANGE = re.compile(r"Tiene la palabra ([^.]+)\.")
+
+
+class StubLlama(Llama):
+    """Fixed-cost fake model with the parts of the ``Llama`` API this repo uses.
+
+    Parameters
+    ----------
+    n_ctx : int
+        Reported context size.
+    prompt_ms : float
+        Cost of evaluating one prompt token. Tokens shared with the previous
+        prompt (or restored with ``load_state``) are free, as in llama.cpp.
+    token_ms : float
+        Cost of generating one token.
+    model_path : str
+        Reported checkpoint path (only used for cache keys).
+    """
+
+    def __init__(self, *, n_ctx: int = 4096, prompt_ms: float = 0.5, token_ms: float = 20.0,
+                 model_path: str = __file__):
+        # Llama.__init__ is skipped on purpose: there are no weights to load
+        self.model_path = model_path
+        self._stub_n_ctx = n_ctx
+        self.prompt_ms = prompt_ms
+        self.token_ms = token_ms
+        self._stub_ids: List[int] = []
+
+    # Llama exposes these as read-only views of its KV cache state, so the
+    # stub keeps its tokens in a private list and rewinds by truncating it.
+    @property
+    def input_ids(self) -> List[int]:
+        return self._stub_ids
+
+    @property
+    def n_tokens(self) -> int:
+        return len(self._stub_ids)
+
+    @n_tokens.setter
+    def n_tokens(self, n: int) -> None:
+        del self._stub_ids[n:]
+
+    def n_ctx(self) -> int:
+        return self._stub_n_ctx
+
+    def tokenize(self, text: bytes, add_bos: bool = True, special: bool = False) -> List[int]:
+        tokens = [zlib.crc32(t) % 32000 + 3 for t in _TOKEN.findall(text)]
+        return [1] + tokens if add_bos else tokens
+
+    def reset(self) -> None:
+        self._stub_ids = []
+
+    def eval(self, tokens: List[int]) -> None:
+        time.sleep(len(tokens) * self.prompt_ms / 1000)
+        self._stub_ids = self._stub_ids + list(tokens)
+
+    def save_state(self) -> List[int]:
+        return list(self._stub_ids)
+
+    def load_state(self, state: List[int]) -> None:
+        self._stub_ids = list(state)
+
+    def close(self) -> None:
+        pass
+
+    def __del__(self) -> None:
+        pass
+
+    def __call__(self, prompt: str, max_tokens: int = 256, grammar: Any = None, **kwargs: Any) -> Dict[str, Any]:
+        tokens = self.tokenize(prompt.encode("utf-8"))
+        shared = 0
+        for a, b in zip(self._stub_ids, tokens):
+            if a != b:
+                break
+            shared += 1
+        text = self._answer(prompt, structured=grammar is not None)
+        n_out = min(len(self.tokenize(text.encode("utf-8"), add_bos=False)), max_tokens)
+        time.sleep((len(tokens) - shared) * self.prompt_ms / 1000 + n_out * self.token_ms / 1000)
+        self._stub_ids = tokens
+        return {
+            "choices": [{"text": text}],
+            "usage": {"prompt_tokens": len(tokens) - shared, "completion_tokens": n_out},
+        }
+
+    @staticmethod
+    def _answer(prompt: str, structured: bool) -> str:
+        if prompt.startswith(speaker_splitter_llm.PROMPT_PREFIX):
+            chunk = prompt[len(speaker_splitter_llm.PROMPT_PREFIX):].split("\n\nTus tareas:", 1)[0]
+            match = _CHANGE.search(chunk)
+            if structured:
+                if match is None:
+                    return json.dumps({"cambio": False})
+                return json.dumps({"cambio": True, "orador": match.group(1), "oracion": match.group(0)},
+                                  ensure_ascii=False)
+            if match is None:
+                return "No speaker change|" + chunk[:80]
+            return f"{match.group(1)}|{match.group(0)}"
+        if prompt.startswith(summarizer.PROMPT_PREFIX):
+            text = prompt[len(summarizer.PROMPT_PREFIX):].split("\n\nDevuelve", 1)[0]
+            return "El orador afirma que " + " ".join(text.split()[:45]) + "."
+        return " ".join(prompt.split()[-30:])
+
+
+@contextmanager
+def stub_models(**cost: Any) -> Iterator[Dict[tuple, StubLlama]]:
+    """Make ``get_model`` hand out :class:`StubLlama` s (one per checkpoint, context and replica)."""
+    models: Dict[tuple, StubLlama] = {}
+
+    def _get_model(path, n_gpu_layers=None, *, n_ctx=4096, replica=0, **kwargs):
+        key = (str(path), n_ctx, replica)
+        if key not in models:
+            models[key] = StubLlama(n_ctx=n_ctx, **cost)
+        return models[key]
+
+    with mock.patch("src.inference.llm_utils.get_model", _get_model), \
+            mock.patch("src.inference.speaker_splitter_llm.get_model", _get_model), \
+            mock.patch("src.pipeline.get_model", _get_model):
+        yield models
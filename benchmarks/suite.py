@@ -0,0 +1,372 @@
+"""Benchmark suite: every stage and the whole pipeline, on generated inputs.
+
+Runs offline on CPU. Transcripts and audio come from
+:mod:`benchmarks.fixtures`; speaker detection and summaries run on
+:class:`~benchmarks.stub_llama.StubLlama` (fixed cost per token) unless
+``--model`` points at a GGUF; STT is measured with the real engine and
+skipped when it cannot be loaded (no checkpoint in the local cache, say).
+
+Results are written as JSON and compared with a baseline from an earlier
+run; a metric that got worse by more than ``--tolerance`` is a regression
+and makes the command exit with status 1. The first run on a machine (or
+``--update-baseline``) writes the baseline instead, and stages missing from
+an existing baseline are added to it. Baselines only compare
+on the same machine and configuration, which is why none is checked in:
+``--quick`` runs keep their own ``baseline-quick.json``, and a baseline
+recorded with other options is not compared at all (exit status 2).
+
+    python -m benchmarks.suite --quick
+    python -m benchmarks.suite --update-baseline
+    python -m benchmarks.suite --stages splitter vad diarization --output /tmp/bench.json
+    python -m benchmarks.suite --stages speakers summarise --model ./data/models/tiny-q4.gguf
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List
+from unittest import mock
+
+import numpy as np
+
+from src.inference.audio import SAMPLE_RATE, decode_audio
+from src.inference.metrics import metrics
+from src.inference.semantic_splitter import SemanticSplitter
+from src.inference.transcript import Transcript
+
+from .fixtures import StubEngine, hashed_bow, synthetic_audio, synthetic_session, synthetic_transcript
+
+Results = Dict[str, Dict[str, float]]
+
+_BASELINE = Path(__file__).with_name("baseline.json")
+_QUICK_BASELINE = Path(__file__).with_name("baseline-quick.json")
+_CONFIG_MISMATCH = 2
+_STAGES = ("splitter", "speakers", "summarise", "vad", "diarization", "stt", "pipeline")
+
+
+def _best_of(fn: Callable[[], Any], repeat: int) -> tuple:
+    """*(fastest wall time, last result)* of *repeat* calls."""
+    best, result = float("inf"), None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _latencies(ms: List[float]) -> Dict[str, float]:
+    ordered = sorted(ms)
+    return {
+        "mean_ms": statistics.fmean(ordered),
+        "p50_ms": ordered[len(ordered) // 2],
+        "p95_ms": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+    }
+
+
+def _splitter(args: argparse.Namespace, strategy: str = "greedy", max_length: int = 0) -> SemanticSplitter:
+    splitter = SemanticSplitter(
+        args.spacy_model or "blank:es",
+        max_words=args.max_words,
+        strategy=strategy,
+        embed=None if args.spacy_model else hashed_bow,
+        min_words=64,
+    )
+    if not args.spacy_model:
+        splitter.nlp.add_pipe("sentencizer")
+    splitter.nlp.max_length = max(splitter.nlp.max_length, max_length + 1)
+    return splitter
+
+
+def _chunks(args: argparse.Namespace, n_words: int) -> list:
+    """Transcript chunks as the pipeline hands them to the LLM stages."""
+    transcript = Transcript.from_segments(synthetic_session(n_words, seed=args.seed))
+    return _splitter(args, max_length=len(str(transcript))).split_transcript(transcript)
+
+
+def _audio(args: argparse.Namespace, seconds: float) -> np.ndarray:
+    if args.audio:
+        audio = decode_audio(args.audio, SAMPLE_RATE)
+        return audio[:int(seconds * SAMPLE_RATE)]
+    return synthetic_audio(seconds, seed=args.seed)[0]
+
+
+@contextlib.contextmanager
+def _models(args: argparse.Namespace) -> Iterator[str]:
+    """Model path for the LLM stages, with stub models patched in unless ``--model`` is given."""
+    if args.model:
+        yield args.model
+        return
+    from .stub_llama import stub_models
+
+    with stub_models(prompt_ms=args.stub_prompt_ms, token_ms=args.stub_token_ms):
+        yield "stub.gguf"
+
+
+# -- stages ---------------------------------------------------------------
+
+def bench_splitter(args: argparse.Namespace) -> Results:
+    """Chunking throughput against transcript length, per strategy."""
+    results: Results = {}
+    sizes = (10_000, 50_000) if args.quick else (10_000, 50_000, 200_000)
+    for n_words in sizes:
+        sentences, _ = synthetic_transcript(n_words // 15, seed=args.seed)
+        text = " ".join(sentences)
+        words = len(text.split())
+        for strategy in ("greedy", "topic"):
+            splitter = _splitter(args, strategy, len(text))
+            wall, chunks = _best_of(lambda: splitter.split_text(text), args.repeat)
+            results[f"splitter.{strategy}.{n_words // 1000}k"] = {
+                "wall_s": wall, "words_per_s": words / wall, "chunks": len(chunks),
+            }
+
+        transcript = Transcript.from_segments(synthetic_session(n_words, seed=args.seed))
+        splitter = _splitter(args, max_length=len(str(transcript)))
+        wall, chunks = _best_of(lambda: splitter.split_transcript(transcript), args.repeat)
+        results[f"splitter.transcript.{n_words // 1000}k"] = {
+            "wall_s": wall, "words_per_s": len(str(transcript).split()) / wall, "chunks": len(chunks),
+        }
+    return results
+
+
+def bench_speakers(args: argparse.Namespace) -> Results:
+    """Speaker-detection latency per chunk, one chunk at a time."""
+    from src.inference.llm_cache import LLMCache
+    from src.inference.speaker_splitter_llm import SpeakerAwareSplitter, SpeakerDetectorLLM
+
+    chunks = _chunks(args, 6_000 if args.quick else 30_000)
+    results: Results = {}
+    with _models(args) as model:
+        for structured in (True, False):
+            detector = SpeakerDetectorLLM(model, n_ctx=args.n_ctx, cache=LLMCache(enabled=False),
+                                          structured=structured)
+            metrics.reset()
+            latencies, turns, speaker = [], 0, "Maestro de Ceremonias"
+            for chunk in chunks:
+                start = time.perf_counter()
+                detection = detector.detect_speaker_and_location(str(chunk))
+                latencies.append((time.perf_counter() - start) * 1000)
+                for speaker_name, _ in SpeakerAwareSplitter._apply_detection(chunk, detection, speaker):
+                    turns += speaker_name != speaker
+                    speaker = speaker_name
+            stage = metrics.snapshot()["speakers"]
+            results[f"speakers.{'json' if structured else 'text'}"] = dict(
+                _latencies(latencies), tokens_per_s=stage["tokens_per_s"], chunks=len(chunks), turns=turns,
+            )
+    return results
+
+
+def bench_summarise(args: argparse.Namespace) -> Results:
+    """Summary latency per chunk."""
+    from src.inference import llm_utils
+    from src.inference.llm_cache import LLMCache
+    from src.inference.summarizer import summarise
+
+    chunks = _chunks(args, 4_000 if args.quick else 15_000)
+    with _models(args) as model:
+        llm = llm_utils.get_model(model, n_ctx=args.n_ctx)  # looked up late so the stub applies
+        cache = LLMCache(enabled=False)
+        metrics.reset()
+        latencies = [summarise(llm, chunk, max_tokens=args.summary_tokens, cache=cache)[1] for chunk in chunks]
+        stage = metrics.snapshot()["summarise"]
+    return {"summarise": dict(_latencies(latencies), tokens_per_s=stage["tokens_per_s"], chunks=len(chunks))}
+
+
+def bench_vad(args: argparse.Namespace) -> Results:
+    """Energy VAD and clip packing speed."""
+    from src.inference.vad import EnergyVAD, plan_clips
+
+    seconds = 600.0 if args.quick else 3600.0
+    audio = _audio(args, seconds)
+    vad = EnergyVAD()
+    wall, plan = _best_of(lambda: plan_clips(audio, vad.regions(audio)), args.repeat)
+    return {"vad": {"wall_s": wall, "x_realtime": plan.audio_seconds / wall,
+                    "clips": len(plan.clips), "skipped": plan.skipped}}
+
+
+def bench_diarization(args: argparse.Namespace) -> Results:
+    """Diarization real-time factor on audio with known turns."""
+    from src.inference.diarization import Diarizer
+
+    seconds = 300.0 if args.quick else 1800.0
+    if args.audio:
+        audio, true_speakers = _audio(args, seconds), 0
+    else:
+        audio, turns = synthetic_audio(seconds, seed=args.seed)
+        true_speakers = len({speaker for _, _, speaker in turns})
+    diarizer = Diarizer()
+    wall, found = _best_of(lambda: diarizer.diarize(audio), args.repeat)
+    return {"diarization": {"wall_s": wall, "rtf": wall / (audio.size / SAMPLE_RATE),
+                            "speakers": len({turn.label for turn in found}), "true_speakers": true_speakers}}
+
+
+def bench_stt(args: argparse.Namespace) -> Results:
+    """Whisper real-time factor (skipped when no engine can be loaded)."""
+    from src.inference.stt import get_engine
+
+    audio = _audio(args, 60.0 if args.quick else 300.0)
+    try:
+        engine = get_engine(args.stt_model, backend=args.stt_backend).load()
+    except Exception as exc:  # backend not installed, checkpoint not cached, ...
+        print(f"  stt skipped: {exc}", file=sys.stderr)
+        return {}
+    wall, _ = _best_of(lambda: engine.run({"raw": audio, "sampling_rate": SAMPLE_RATE},
+                                          batch_size=args.stt_batch_size), 1)
+    return {f"stt.{args.stt_backend}": {"rtf": wall / (audio.size / SAMPLE_RATE), "wall_s": wall,
+                                        "load_s": engine.load_time or 0.0}}
+
+
+def bench_pipeline(args: argparse.Namespace) -> Results:
+    """The whole pipeline on synthetic audio, with a fixed-cost STT engine."""
+    from src.inference.llm_cache import LLMCache
+    from src.pipeline import Pipeline
+
+    seconds = 300.0 if args.quick else 1200.0
+    audio = _audio(args, seconds)
+
+    def _stream(source, *, sample_rate=SAMPLE_RATE, block_sec=1.0, **kwargs):
+        pcm = (np.clip(audio, -1, 1) * 32767).astype("<i2")
+        block = int(block_sec * sample_rate)
+        for start in range(0, pcm.size, block):
+            yield pcm[start:start + block].tobytes()
+
+    with _models(args) as model, mock.patch("src.pipeline.stream_audio", _stream):
+        pipeline = Pipeline(model, n_ctx=args.n_ctx, engine=StubEngine(rtf=args.stub_rtf),
+                            splitter=_splitter(args), speaker_workers=args.speaker_workers,
+                            summary_workers=args.summary_workers, summary_tokens=args.summary_tokens,
+                            cache=LLMCache(enabled=False), token_budget=False)
+        start = time.perf_counter()
+        records = list(pipeline.run("synthetic"))
+        wall = time.perf_counter() - start
+
+    result = {"wall_s": wall, "x_realtime": (audio.size / SAMPLE_RATE) / wall, "records": len(records)}
+    for name, stats in pipeline.stats.items():
+        result[f"{name}_busy_s"] = stats["busy_s"]
+    return {"pipeline": result}
+
+
+# -- baseline -------------------------------------------------------------
+
+def _direction(metric: str) -> int:
+    """+1 if higher is better, -1 if lower is better, 0 for counts (not compared)."""
+    if metric.endswith("_per_s") or metric == "x_realtime":
+        return 1
+    if metric.endswith(("_s", "_ms")) or metric == "rtf":
+        return -1
+    return 0
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print current against *baseline* results and return the regressions."""
+    regressions = []
+    for case, values in current["results"].items():
+        base = baseline["results"].get(case)
+        if base is None:
+            print(f"{case:<28} (new)")
+            continue
+        for metric, value in values.items():
+            direction = _direction(metric)
+            if not direction or not base.get(metric):
+                continue
+            change = value / base[metric] - 1
+            worse = -direction * change > tolerance
+            print(f"{case:<28} {metric:<18} {base[metric]:>12.4g} -> {value:>12.4g}  {change:+7.1%}"
+                  f"{'  REGRESSION' if worse else ''}")
+            if worse:
+                regressions.append(f"{case} {metric} {change:+.1%}")
+    return regressions
+
+
+def _machine() -> Dict[str, Any]:
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stages", nargs="+", choices=_STAGES, default=list(_STAGES))
+    parser.add_argument("--quick", action="store_true", help="Smaller inputs (with their own baseline file)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of the cheap stages; the fastest counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", type=Path, default=None,
+                        help="Baseline file (default: benchmarks/baseline.json, or baseline-quick.json with --quick)")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative slowdown counted as a regression")
+    parser.add_argument("--output", type=Path, default=None, help="Also write this run's results here")
+    parser.add_argument("--audio", default=None, help="Use this recording instead of synthetic audio")
+    parser.add_argument("--spacy-model", default=None, help="spaCy model (default: blank:es + hashed BoW)")
+    parser.add_argument("--max-words", type=int, default=400)
+    parser.add_argument("--model", default=None, help="GGUF for the LLM stages (default: StubLlama)")
+    parser.add_argument("--n-ctx", type=int, default=4096)
+    parser.add_argument("--summary-tokens", type=int, default=128)
+    parser.add_argument("--stub-prompt-ms", type=float, default=0.5, help="StubLlama cost per prompt token")
+    parser.add_argument("--stub-token-ms", type=float, default=20.0, help="StubLlama cost per generated token")
+    parser.add_argument("--stub-rtf", type=float, default=0.02, help="Stub STT cost per second of audio")
+    parser.add_argument("--stt-backend", default="ct2", help="Engine of the stt stage")
+    parser.add_argument("--stt-model", default=None, help="Checkpoint of the stt stage (backend default if None)")
+    parser.add_argument("--stt-batch-size", type=int, default=8)
+    parser.add_argument("--speaker-workers", type=int, default=1)
+    parser.add_argument("--summary-workers", type=int, default=1)
+    args = parser.parse_args()
+    if args.baseline is None:
+        args.baseline = _QUICK_BASELINE if args.quick else _BASELINE
+    return args
+
+
+def main() -> None:
+    args = _parse_args()
+    config = {key: value for key, value in vars(args).items()
+              if key not in ("stages", "baseline", "update_baseline", "tolerance", "output")}
+    report: Dict[str, Any] = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "machine": _machine(),
+                              "config": config, "results": {}}
+
+    for stage in args.stages:
+        print(f"{stage}...", file=sys.stderr)
+        start = time.perf_counter()
+        report["results"].update(globals()[f"bench_{stage}"](args))
+        print(f"  done in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+
+    payload = json.dumps(report, indent=2, default=str)
+    if args.output:
+        args.output.write_text(payload + "\n", encoding="utf-8")
+
+    if args.update_baseline or not args.baseline.exists():
+        args.baseline.write_text(payload + "\n", encoding="utf-8")
+        print(json.dumps(report["results"], indent=2))
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+        return
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    if baseline.get("config") != report["config"]:
+        changed = sorted(key for key in {*report["config"], *baseline.get("config", {})}
+                         if report["config"].get(key) != baseline.get("config", {}).get(key))
+        print(f"config mismatch with {args.baseline} ({', '.join(changed)}): not compared; "
+              "use --update-baseline or --baseline to pick another file", file=sys.stderr)
+        sys.exit(_CONFIG_MISMATCH)
+    if baseline.get("machine") != report["machine"]:
+        print("warning: baseline was recorded on another machine", file=sys.stderr)
+    regressions = compare(report, baseline, args.tolerance)
+    new_cases = {case: values for case, values in report["results"].items() if case not in baseline["results"]}
+    if new_cases:
+        # stages measured for the first time start their own baseline
+        baseline["results"].update(new_cases)
+        args.baseline.write_text(json.dumps(baseline, indent=2, default=str) + "\n", encoding="utf-8")
+        print(f"Added {', '.join(new_cases)} to {args.baseline}", file=sys.stderr)
+    if regressions:
+        print(f"{len(regressions)} regression(s): " + "; ".join(regressions), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
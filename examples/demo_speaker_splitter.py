@@ -23,6 +23,12 @@ def _parse_args() -> argparse.Namespace:
             "default is chosen based on the backend (CUDA vs. CPU build)."
         ),
     )
+    parser.add_argument(
+        "--contexts",
+        type=int,
+        default=1,
+        help="Llama contexts used to analyse chunks in parallel (1 = sequential).",
+    )
     return parser.parse_args()
 
 
@@ -36,7 +42,7 @@ def main() -> None:
         )
 
     # Initialize the speaker detector and splitter
-    speaker_detector = SpeakerDetectorLLM(model_path, n_gpu_layers=args.gpu_layers)
+    speaker_detector = SpeakerDetectorLLM(model_path, n_gpu_layers=args.gpu_layers, n_contexts=args.contexts)
     splitter = SpeakerAwareSplitter(speaker_detector)
 
     # Define the chunks
@@ -0,0 +1,21 @@
+import argparse
+
+from src.inference.stt import transcribe_stream
+from src.models.download_video import stream_audio
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Live transcription demo (Whisper large‑v3‑turbo)")
+    parser.add_argument("source", help="YouTube/live URL or local media file")
+    parser.add_argument("--duration", type=int, default=None, help="Stop after that many seconds")
+    parser.add_argument("--window", type=float, default=30.0, help="Window size in seconds")
+    parser.add_argument("--overlap", type=float, default=5.0, help="Overlap between windows in seconds")
+    parser.add_argument(
+        "--realtime",
+        action="store_true",
+        help="Replay a local file at native speed to simulate a live session",
+    )
+    args = parser.parse_args()
+
+    pcm = stream_audio(args.source, duration_sec=args.duration, realtime=args.realtime)
+    for segment in transcribe_stream(pcm, window_s=args.window, overlap_s=args.overlap):
+        print(f"[{segment.start:8.2f} → {segment.end:8.2f}] {segment.text}", flush=True)
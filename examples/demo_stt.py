@@ -10,4 +10,4 @@ if __name__ == "__main__":
     transcription, inference_time =  transcribe(args.audio)
 
     print(transcription[0])
-    print(f"Inference time: {inference_time:0f} ms")
\ No newline at end of file
+    print(f"Inference time: {inference_time:.1f} s")
\ No newline at end of file
@@ -3,7 +3,7 @@ from __future__ import annotations
 import argparse
 from pathlib import Path
 
-from src.inference.llm_utils import load_model
+from src.inference.llm_utils import get_model
 from src.inference.summarizer import summarise
 
 
@@ -24,6 +24,11 @@ def _parse_args() -> argparse.Namespace:
             "default is chosen based on the backend (CUDA vs. CPU build)."
         ),
     )
+    parser.add_argument(
+        "--draft",
+        default=None,
+        help="Speculative decoding: 'prompt-lookup' or the path of a small draft GGUF",
+    )
     parser.add_argument(
         "--text",
         default=(
@@ -46,7 +51,7 @@ def main() -> None:
             f"Model file not found: {model_path}. Run examples/demo_download.py first."
         )
 
-    llm = load_model(model_path, n_gpu_layers=args.gpu_layers)
+    llm = get_model(model_path, n_gpu_layers=args.gpu_layers, draft=args.draft)
     print("backend =", llm.metadata.get("backend", "cpu"))
     summary, ms = summarise(llm, args.text, max_tokens=48)
     print(summary)
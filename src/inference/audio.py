@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import subprocess
+import time
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+SAMPLE_RATE = 16_000
+
+
+def decode_audio(path: str | Path, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode any media file to mono float32 PCM in [-1, 1] using ffmpeg."""
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-i", str(path),
+        "-vn", "-ac", "1", "-ar", str(sample_rate),
+        "-f", "s16le", "pipe:1",
+    ]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed on {path}: {proc.stderr.decode(errors='replace').strip()}")
+    return pcm16_to_float(proc.stdout)
+
+
+def pcm16_to_float(data: bytes) -> np.ndarray:
+    """Convert little-endian int16 PCM bytes to float32 samples in [-1, 1]."""
+    return np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def decode_audio_timed(path: str, sample_rate: int = SAMPLE_RATE) -> Tuple[str, np.ndarray, float]:
+    """Return *(path, audio, decode_seconds)*; picklable for process pools."""
+    start = time.perf_counter()
+    audio = decode_audio(path, sample_rate)
+    return path, audio, time.perf_counter() - start
@@ -0,0 +1,391 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .audio import SAMPLE_RATE, decode_audio
+from .metrics import metrics
+from .transcript import Transcript, TranscriptView
+
+if TYPE_CHECKING:
+    from .llm_cache import LLMCache
+    from .llm_utils import Backend
+
+EmbedFn = Callable[[np.ndarray], np.ndarray]
+
+
+@dataclass(slots=True)
+class SpeakerTurn:
+    """A stretch of audio attributed to one speaker cluster, in seconds."""
+    start: float
+    end: float
+    label: int
+
+
+def _mel_filterbank(n_mels: int, n_fft: int, sample_rate: int) -> np.ndarray:
+    """Triangular HTK mel filters, shape ``(n_mels, n_fft // 2 + 1)``."""
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    mels = np.linspace(hz_to_mel(20.0), hz_to_mel(sample_rate / 2), n_mels + 2)
+    bins = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    hz = mel_to_hz(mels)
+    lower, center, upper = hz[:-2, None], hz[1:-1, None], hz[2:, None]
+    up = (bins - lower) / (center - lower)
+    down = (upper - bins) / (upper - center)
+    return np.maximum(0.0, np.minimum(up, down)).astype(np.float32)
+
+
+class LogMelStats:
+    """Default speaker embedding: mean and std of log-mel energies over a window.
+
+    Much weaker than a trained speaker encoder, but it needs nothing beyond
+    NumPy and separates voices well enough in a single-room recording. Any
+    ``(batch, samples) -> (batch, dim)`` callable can replace it.
+
+    Only frames within *voiced_db* of the loudest frame of the window are
+    pooled; otherwise the share of pauses in a window dominates the features
+    and one voice splits into "dense" and "sparse" clusters.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, n_mels: int = 40,
+                 frame_s: float = 0.025, hop_s: float = 0.010, voiced_db: float = 20.0):
+        self.voiced = voiced_db / 10 * np.log(10)  # in natural-log power units
+        self.frame = int(frame_s * sample_rate)
+        self.hop = int(hop_s * sample_rate)
+        self.n_fft = 1 << (self.frame - 1).bit_length()
+        self.window = np.hanning(self.frame).astype(np.float32)
+        self.filters = _mel_filterbank(n_mels, self.n_fft, sample_rate)
+
+    def __call__(self, windows: np.ndarray) -> np.ndarray:
+        frames = sliding_window_view(windows, self.frame, axis=1)[:, ::self.hop]  # (B, F, frame)
+        spec = np.abs(np.fft.rfft(frames * self.window, n=self.n_fft)) ** 2
+        logmel = np.log(spec.astype(np.float32) @ self.filters.T + 1e-10)     # (B, F, n_mels)
+        energy = np.log(spec.sum(axis=2) + 1e-10)                             # (B, F)
+        weights = (energy >= energy.max(axis=1, keepdims=True) - self.voiced).astype(np.float32)
+        weights /= weights.sum(axis=1, keepdims=True)
+        mean = np.einsum("bf,bfm->bm", weights, logmel)
+        var = np.einsum("bf,bfm->bm", weights, (logmel - mean[:, None]) ** 2)
+        return np.concatenate([mean, np.sqrt(var)], axis=1)
+
+
+class Diarizer:
+    """CPU speaker diarization: windowed embeddings + agglomerative clustering.
+
+    The audio is cut into overlapping windows, embedded in vectorised batches,
+    windows that are too quiet are dropped, consecutive similar windows are
+    merged into segments, and segments are clustered with average-linkage
+    agglomerative clustering on cosine distance.
+
+    Parameters
+    ----------
+    embed : callable or None
+        ``(batch, samples) -> (batch, dim)`` embedder (:class:`LogMelStats` if None).
+    window_s, hop_s : float
+        Embedding window and hop.
+    batch_size : int
+        Windows embedded per batch.
+    change_threshold : float
+        Cosine similarity between consecutive windows under which a new
+        segment starts.
+    max_segment_s : float
+        Segments are also cut at this length.
+    min_turn_s : float
+        Segments shorter than this, right after another one, are given
+        its speaker.
+    cluster_threshold : float
+        Cosine distance at which clusters stop merging (ignored when
+        ``n_speakers`` is given).
+    min_speaker_s : float
+        Clusters with less speech than this are folded into the closest
+        larger one (ignored when ``n_speakers`` is given): they are
+        almost always one voice split by a change of tone or microphone,
+        not an extra person.
+    n_speakers : int or None
+        Exact number of speakers, when known.
+    silence_db : float
+        Windows quieter than this many dB under the loud (90th percentile)
+        windows are treated as non-speech.
+    """
+
+    def __init__(self, embed: EmbedFn | None = None, *, sample_rate: int = SAMPLE_RATE,
+                 window_s: float = 1.5, hop_s: float = 0.75, batch_size: int = 256,
+                 change_threshold: float = 0.6, max_segment_s: float = 10.0,
+                 min_turn_s: float = 1.0,
+                 cluster_threshold: float = 0.65, min_speaker_s: float = 10.0,
+                 n_speakers: int | None = None, silence_db: float = 35.0):
+        self.sample_rate = sample_rate
+        self.embed = embed or LogMelStats(sample_rate)
+        self.window = int(window_s * sample_rate)
+        self.hop = int(hop_s * sample_rate)
+        self.batch_size = batch_size
+        self.change_threshold = change_threshold
+        self.max_segment_s = max_segment_s
+        self.min_turn_s = min_turn_s
+        self.cluster_threshold = cluster_threshold
+        self.min_speaker_s = min_speaker_s
+        self.n_speakers = n_speakers
+        self.silence_db = silence_db
+
+    def diarize_file(self, path: str | Path) -> List[SpeakerTurn]:
+        return self.diarize(decode_audio(path, self.sample_rate))
+
+    def diarize(self, audio: np.ndarray) -> List[SpeakerTurn]:
+        """Return speaker turns (sorted, non-overlapping) for mono *audio*."""
+        with metrics.stage("diarization") as span:
+            span.add(audio_s=audio.size / self.sample_rate)
+            return self._diarize(audio)
+
+    def _diarize(self, audio: np.ndarray) -> List[SpeakerTurn]:
+        if audio.size < self.window:
+            return []
+
+        embeddings, rms = self._embed_windows(audio)
+        loud = np.quantile(rms, 0.9)
+        speech = rms > loud * 10 ** (-self.silence_db / 20)
+        if not loud or not speech.any():
+            return []
+
+        # centre on the session mean (channel and room), then unit-normalise for cosine
+        emb = embeddings - embeddings[speech].mean(axis=0)
+        # per-dimension scale: the mean and std parts of LogMelStats differ by orders of magnitude
+        emb /= emb[speech].std(axis=0) + 1e-8
+        emb /= np.linalg.norm(emb, axis=1, keepdims=True) + 1e-8
+
+        segments = self._segments(emb, speech)
+        seg_emb = np.stack([emb[lo:hi][speech[lo:hi]].mean(axis=0) for lo, hi in segments])
+        labels = self._cluster(seg_emb)
+
+        hop_s = self.hop / self.sample_rate
+        win_s = self.window / self.sample_rate
+        if self.n_speakers is None:
+            labels = self._merge_small(labels, seg_emb, np.array([hi - lo for lo, hi in segments]) * hop_s)
+        # very short segments are mostly windows straddling a speaker change
+        for k in range(1, len(segments)):
+            lo, hi = segments[k]
+            if (hi - lo) * hop_s < self.min_turn_s and lo == segments[k - 1][1]:
+                labels[k] = labels[k - 1]
+        # number the speakers in order of first appearance
+        _, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+        labels = np.argsort(np.argsort(first))[inverse]
+
+        turns: List[SpeakerTurn] = []
+        for (lo, hi), label in zip(segments, labels):
+            start, end = lo * hop_s, (hi - 1) * hop_s + win_s
+            if turns and turns[-1].label == label and start - turns[-1].end <= win_s:
+                turns[-1].end = end
+            else:
+                if turns and start < turns[-1].end:  # windows overlap: split the difference
+                    turns[-1].end = start = (start + turns[-1].end) / 2
+                turns.append(SpeakerTurn(start, end, int(label)))
+        return turns
+
+    def _embed_windows(self, audio: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        n = 1 + (audio.size - self.window) // self.hop
+        views = sliding_window_view(audio, self.window)[::self.hop][:n]  # no copy
+        embeddings, rms = [], []
+        for lo in range(0, n, self.batch_size):
+            batch = np.ascontiguousarray(views[lo:lo + self.batch_size], dtype=np.float32)
+            embeddings.append(np.asarray(self.embed(batch), dtype=np.float32))
+            rms.append(np.sqrt((batch ** 2).mean(axis=1)))
+        return np.concatenate(embeddings), np.concatenate(rms)
+
+    def _segments(self, emb: np.ndarray, speech: np.ndarray) -> List[Tuple[int, int]]:
+        """Runs of consecutive speech windows without a similarity drop."""
+        sim = np.einsum("ij,ij->i", emb[1:], emb[:-1])
+        cut = np.ones(len(emb), dtype=bool)
+        cut[1:] = (sim < self.change_threshold) | (speech[1:] != speech[:-1])
+        max_windows = max(1, int(self.max_segment_s * self.sample_rate / self.hop))
+
+        segments = []
+        starts = np.flatnonzero(cut).tolist() + [len(emb)]
+        for lo, hi in zip(starts[:-1], starts[1:]):
+            if not speech[lo]:
+                continue
+            for sub in range(lo, hi, max_windows):
+                segments.append((sub, min(sub + max_windows, hi)))
+        return segments
+
+    def _cluster(self, seg_emb: np.ndarray) -> np.ndarray:
+        """Average-linkage agglomerative clustering on cosine distance."""
+        n = len(seg_emb)
+        if n == 1:
+            return np.zeros(1, dtype=np.int64)
+        unit = seg_emb / (np.linalg.norm(seg_emb, axis=1, keepdims=True) + 1e-8)
+        dist = 1.0 - unit @ unit.T
+        np.fill_diagonal(dist, np.inf)
+        sizes = np.ones(n)
+        parent = np.arange(n)
+        active = n
+        nearest = dist.argmin(axis=1)
+        nearest_d = dist[np.arange(n), nearest]
+
+        while active > 1:
+            i = int(nearest_d.argmin())
+            j = int(nearest[i])
+            if self.n_speakers is not None:
+                if active <= self.n_speakers:
+                    break
+            elif nearest_d[i] > self.cluster_threshold:
+                break
+
+            # merge j into i (Lance-Williams update for average linkage)
+            merged = (sizes[i] * dist[i] + sizes[j] * dist[j]) / (sizes[i] + sizes[j])
+            dist[i], dist[:, i] = merged, merged
+            dist[i, i] = np.inf
+            dist[j], dist[:, j] = np.inf, np.inf
+            sizes[i] += sizes[j]
+            parent[parent == j] = i
+            nearest_d[j] = np.inf
+            active -= 1
+
+            stale = (nearest == i) | (nearest == j)
+            stale[i] = True
+            stale[j] = False
+            rows = np.flatnonzero(stale)
+            nearest[rows] = dist[rows].argmin(axis=1)
+            nearest_d[rows] = dist[rows, nearest[rows]]
+            closer = dist[:, i] < nearest_d
+            nearest[closer] = i
+            nearest_d[closer] = dist[closer, i]
+
+        _, labels = np.unique(parent, return_inverse=True)
+        return labels
+
+    def _merge_small(self, labels: np.ndarray, seg_emb: np.ndarray, seg_s: np.ndarray) -> np.ndarray:
+        """Move the segments of clusters under ``min_speaker_s`` to the closest larger cluster."""
+        clusters = np.unique(labels)
+        speech_s = np.bincount(labels, weights=seg_s)[clusters]
+        kept = clusters[speech_s >= self.min_speaker_s]
+        if kept.size == clusters.size:
+            return labels
+        if kept.size == 0:
+            kept = clusters[[speech_s.argmax()]]
+        unit = seg_emb / (np.linalg.norm(seg_emb, axis=1, keepdims=True) + 1e-8)
+        centroids = np.stack([(unit[labels == k] * seg_s[labels == k, None]).sum(axis=0) for k in kept])
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True) + 1e-8
+        small = ~np.isin(labels, kept)
+        labels = labels.copy()
+        labels[small] = kept[(unit[small] @ centroids.T).argmax(axis=1)]
+        return np.unique(labels, return_inverse=True)[1]
+
+
+def assign_speakers(transcript: Transcript, turns: Sequence[SpeakerTurn]) -> np.ndarray:
+    """Label of the turn covering each transcript unit's midpoint (-1 outside every turn)."""
+    if not turns:
+        return np.full(len(transcript), -1, dtype=np.int64)
+    starts = np.array([t.start for t in turns])
+    ends = np.array([t.end for t in turns])
+    labels = np.array([t.label for t in turns])
+    mid = (transcript.start + transcript.end) / 2
+    idx = np.clip(np.searchsorted(starts, mid, side="right") - 1, 0, len(turns) - 1)
+    return np.where((mid >= starts[idx]) & (mid <= ends[idx]), labels[idx], -1)
+
+
+def speaker_segments(transcript: Transcript, turns: Sequence[SpeakerTurn],
+                     names: Dict[int, str] | None = None) -> List[Tuple[str, TranscriptView]]:
+    """Group consecutive units by speaker, in ``SpeakerAwareSplitter.split_chunks`` format.
+
+    Units outside every turn stay with the previous speaker.
+    """
+    labels = assign_speakers(transcript, turns)
+    if labels.size == 0:
+        return []
+    # carry the last known label forward over -1 gaps
+    known = np.where(labels >= 0, np.arange(labels.size), -1)
+    np.maximum.accumulate(known, out=known)
+    labels = np.where(known >= 0, labels[np.maximum(known, 0)], labels)
+
+    bounds = np.flatnonzero(np.diff(labels)) + 1
+    starts = np.concatenate([[0], bounds])
+    stops = np.concatenate([bounds, [labels.size]])
+    names = names or {}
+    return [
+        (names.get(int(labels[lo]), f"Orador {int(labels[lo]) + 1}"), transcript.view(int(lo), int(hi)))
+        for lo, hi in zip(starts, stops)
+    ]
+
+
+# Bump whenever build_naming_prompt changes so cached completions are not reused.
+NAMING_PROMPT_VERSION = "naming-v2"
+
+NAMING_PREFIX = (
+    "[INST] <<SYS>>Eres un asistente analizando transcripciones de discursos políticos. "
+    "Responde solo con JSON.<</SYS>>\n\n"
+    "Fragmentos de una sesión. En cada uno, el texto ANTES es lo que se dijo justo antes "
+    "de que hable la persona y el texto DURANTE es lo que dijo ella:\n\n"
+)
+
+_MAX_NAME_CHARS = 80
+
+NAMING_GRAMMAR = rf"""
+root ::= "{{" " "? "\"nombre\":" " "? "\"" [^"\\\x00-\x1f]{{1,{_MAX_NAME_CHARS}}} "\"" " "? "}}"
+"""
+
+# Longest answer the grammar allows, at one token per character.
+NAMING_MAX_TOKENS = len('{ "nombre": "" }') + _MAX_NAME_CHARS
+
+
+def build_naming_prompt(excerpts: Sequence[Tuple[str, str]]) -> str:
+    """Prompt asking who speaks in *excerpts* of ``(before, during)`` text."""
+    body = "\n\n".join(f"ANTES: {before}\nDURANTE: {during}" for before, during in excerpts)
+    return NAMING_PREFIX + (
+        f"{body}\n\n"
+        "¿Quién es la persona que habla en DURANTE? Da su nombre completo y título si se "
+        "menciona, o \"Desconocido\".\n"
+        "{\"nombre\": \"...\"}[/INST]"
+    )
+
+
+def name_clusters(backends: Backend | Sequence[Backend], segments: Sequence[Tuple[str, TranscriptView]], *,
+                  excerpts: int = 3, context_units: int = 60, during_units: int = 60,
+                  cache: LLMCache | None = None) -> Dict[str, str]:
+    """Ask the LLM once per cluster who it is.
+
+    For the first *excerpts* turns of every cluster, the *context_units*
+    transcript units (words or segments, depending on how the transcript was
+    built) said right before it, where the chair usually announces the next
+    speaker, and its first *during_units* units are shown to the model.
+    Returns a mapping from the placeholder names of :func:`speaker_segments`
+    to real names (clusters the model cannot identify, or whose answer does
+    not parse, keep their placeholder).
+    """
+    from .llm_utils import generate_batch
+
+    by_cluster: Dict[str, List[Tuple[str, str]]] = {}
+    for speaker, view in segments:
+        found = by_cluster.setdefault(speaker, [])
+        if len(found) >= excerpts:
+            continue
+        before = view.transcript.view(max(0, view.lo - context_units), view.lo).text
+        during = view.view(0, during_units).text
+        found.append((before, during))
+
+    clusters = list(by_cluster)
+    results = generate_batch(
+        backends,
+        [build_naming_prompt(by_cluster[c]) for c in clusters],
+        NAMING_MAX_TOKENS,
+        prompt_version=NAMING_PROMPT_VERSION,
+        cache=cache,
+        prefix=NAMING_PREFIX,
+        grammar=NAMING_GRAMMAR,
+    )
+
+    names = {}
+    for cluster, result in zip(clusters, results):
+        try:
+            name = json.loads(result.text, strict=False)["nombre"].strip()
+        except (json.JSONDecodeError, KeyError, TypeError, AttributeError):
+            print(f"Could not parse the name of {cluster}: {result.text!r}")
+            name = ""
+        names[cluster] = cluster if not name or name.lower() == "desconocido" else name
+    return names
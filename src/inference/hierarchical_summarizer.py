@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import hashlib
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+from .llm_cache import LLMCache
+from .llm_utils import Backend, generate_batch
+from .metrics import metrics
+from .summarizer import PROMPT_PREFIX as LEAF_PREFIX, PROMPT_VERSION as LEAF_VERSION, build_prompt
+from .transcript import TranscriptView
+
+# Bump whenever build_reduce_prompt changes so cached summaries are not reused.
+REDUCE_PROMPT_VERSION = "reduce-v1"
+
+# Constant head of the prompt; its KV state is evaluated once and reused.
+REDUCE_PREFIX = (
+    "[INST] <<SYS>>Responde **EXCLUSIVAMENTE** en español. "
+    "No utilices ningún otro idioma.<</SYS>>\n\n"
+    "Resúmenes parciales de una sesión parlamentaria, en orden cronológico:\n"
+)
+
+
+def build_reduce_prompt(summaries: Sequence[str], scope: str) -> str:
+    """Prompt merging partial *summaries* into one; *scope* says what they cover."""
+    body = "\n".join(f"- {summary}" for summary in summaries)
+    return REDUCE_PREFIX + (
+        f"{body}\n\n"
+        f"Combínalos en un único resumen de {scope}, gramaticalmente correcto, coherente y de "
+        "máximo 5 frases, conservando quién dijo qué.[/INST]"
+    )
+
+
+@dataclass
+class WindowSummary:
+    start: float  # seconds, NaN when the segments carry no timestamps
+    end: float
+    summary: str
+
+
+@dataclass
+class SessionSummary:
+    session: str
+    speakers: Dict[str, str] = field(default_factory=dict)
+    windows: List[WindowSummary] = field(default_factory=list)
+
+
+class HierarchicalSummarizer:
+    """Map-reduce summarizer for full-length sessions.
+
+    Every ``(speaker, text)`` segment from ``SpeakerAwareSplitter`` is
+    summarised on its own (map, batched), then the partial summaries are
+    merged *fan_in* at a time, level by level, until one remains (reduce).
+    This happens for each time window, for each speaker, and for the whole
+    session (over the window summaries).
+
+    Each node is memoised by a hash of its inputs, so calling
+    :meth:`summarise_session` again after new segments arrive only
+    recomputes their leaves and the branches above them.
+
+    Parameters
+    ----------
+    backends : Llama, LlamaServer or a sequence of them
+        Passed to ``generate_batch``.
+    window_s : float
+        Length of the time windows (when segments are ``TranscriptView`` s).
+    window_segments : int
+        Segments per window when segments have no timestamps.
+    fan_in : int
+        Partial summaries merged per reduce call.
+    max_tokens : int
+        Generation budget of every call.
+    cache : LLMCache or None
+        Completion cache (the shared default if None).
+    max_workers : int or None
+        Concurrent calls (see ``generate_batch``).
+    """
+
+    def __init__(self, backends: Backend | Sequence[Backend], *, window_s: float = 900.0,
+                 window_segments: int = 16, fan_in: int = 8, max_tokens: int = 256,
+                 cache: LLMCache | None = None, max_workers: int | None = None):
+        if fan_in < 2:
+            raise ValueError("fan_in must be at least 2")
+        self.backends = backends
+        self.window_s = window_s
+        self.window_segments = window_segments
+        self.fan_in = fan_in
+        self.max_tokens = max_tokens
+        self.cache = cache
+        self.max_workers = max_workers
+        self.calls = 0  # LLM calls actually issued (memo misses)
+        self._memo: Dict[str, str] = {}
+
+    def summarise_session(self, segments: Sequence[Tuple[str, str | TranscriptView]]) -> SessionSummary:
+        """Summarise a whole session given its ``(speaker, text)`` segments in order."""
+        if not segments:
+            return SessionSummary(session="")
+
+        leaves = self._leaf_summaries(segments)
+
+        windows: Dict[int, List[int]] = {}
+        by_speaker: Dict[str, List[int]] = {}
+        for i, (speaker, text) in enumerate(segments):
+            windows.setdefault(self._window_of(i, text), []).append(i)
+            by_speaker.setdefault(speaker, []).append(i)
+        window_ids = sorted(windows)
+
+        jobs: Dict[tuple, Tuple[str, List[str]]] = {}
+        for w in window_ids:
+            jobs[("window", w)] = ("este tramo de la sesión", [leaves[i] for i in windows[w]])
+        for speaker, idx in by_speaker.items():
+            jobs[("speaker", speaker)] = (f"las intervenciones de {speaker}", [leaves[i] for i in idx])
+        reduced = self._reduce_many(jobs)
+
+        session = self._reduce_many({
+            "session": ("toda la sesión", [reduced[("window", w)] for w in window_ids])
+        })["session"]
+
+        return SessionSummary(
+            session=session,
+            speakers={speaker: reduced[("speaker", speaker)] for speaker in by_speaker},
+            windows=[
+                WindowSummary(
+                    start=_time(segments[windows[w][0]][1], "start"),
+                    end=_time(segments[windows[w][-1]][1], "end"),
+                    summary=reduced[("window", w)],
+                )
+                for w in window_ids
+            ],
+        )
+
+    def _window_of(self, i: int, text: str | TranscriptView) -> int:
+        start = _time(text, "start")
+        if not math.isnan(start):
+            return int(start // self.window_s)
+        return i // self.window_segments
+
+    def _leaf_summaries(self, segments: Sequence[Tuple[str, str | TranscriptView]]) -> List[str]:
+        prompts = [build_prompt(f"Orador: {speaker}\n{text}") for speaker, text in segments]
+        return self._run(prompts, LEAF_VERSION, LEAF_PREFIX)
+
+    def _reduce_many(self, jobs: Dict) -> Dict:
+        """Reduce every job's summaries to one, batching each level across all jobs."""
+        levels = {name: list(summaries) for name, (_, summaries) in jobs.items()}
+        while True:
+            pending = [(name, lo) for name, items in levels.items() if len(items) > 1
+                       for lo in range(0, len(items), self.fan_in)]
+            if not pending:
+                break
+            prompts = []
+            for name, lo in pending:
+                group = levels[name][lo:lo + self.fan_in]
+                prompts.append(build_reduce_prompt(group, jobs[name][0]) if len(group) > 1 else None)
+            outputs = self._run([p for p in prompts if p is not None], REDUCE_PROMPT_VERSION, REDUCE_PREFIX)
+
+            merged: Dict = {name: [] for name, _ in pending}
+            outputs_iter = iter(outputs)
+            for (name, lo), prompt in zip(pending, prompts):
+                merged[name].append(next(outputs_iter) if prompt is not None else levels[name][lo])
+            levels.update(merged)
+        return {name: items[0] if items else "" for name, items in levels.items()}
+
+    def _run(self, prompts: List[str], prompt_version: str, prefix: str) -> List[str]:
+        """Complete *prompts*, only calling the LLM for those not memoised yet."""
+        keys = [hashlib.sha256(f"{prompt_version}\0{p}".encode("utf-8")).hexdigest() for p in prompts]
+        missing = list(dict.fromkeys(k for k in keys if k not in self._memo))
+        if missing:
+            by_key = dict(zip(keys, prompts))
+            with metrics.stage(f"summarise.{'map' if prompt_version == LEAF_VERSION else 'reduce'}") as span:
+                results = generate_batch(
+                    self.backends,
+                    [by_key[k] for k in missing],
+                    self.max_tokens,
+                    max_workers=self.max_workers,
+                    prompt_version=prompt_version,
+                    cache=self.cache,
+                    prefix=prefix,
+                )
+                span.add(items=len(results), tokens_in=sum(r.prompt_tokens for r in results),
+                         tokens_out=sum(r.completion_tokens for r in results))
+            self.calls += len(missing)
+            for key, result in zip(missing, results):
+                self._memo[key] = result.text
+        return [self._memo[k] for k in keys]
+
+
+def _time(text: str | TranscriptView, attr: str) -> float:
+    return getattr(text, attr) if isinstance(text, TranscriptView) else float("nan")
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+_DEFAULT_PATH = Path("~/.cache/py-congress-summary/llm_cache.sqlite")
+_DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def model_fingerprint(model_path: str | Path) -> str:
+    """Cheap identity of a model file: resolved path, size and mtime (no hashing of GBs)."""
+    path = Path(model_path).expanduser().resolve()
+    st = path.stat()
+    return f"{path}:{st.st_size}:{st.st_mtime_ns}"
+
+
+class LLMCache:
+    """On-disk, content-addressed cache of LLM completions.
+
+    Entries are keyed by a SHA-256 of (model identity, prompt template version,
+    sampling parameters, prompt), stored in SQLite and evicted least-recently
+    used first once the cache exceeds *max_bytes* or *max_entries*.
+
+    Parameters
+    ----------
+    path : str or Path
+        SQLite file (created if missing).
+    max_bytes : int
+        Size budget for the cached completions.
+    max_entries : int or None
+        Optional cap on the number of entries.
+    enabled : bool
+        When False every lookup misses and nothing is written.
+    """
+
+    def __init__(self, path: str | Path = _DEFAULT_PATH, *, max_bytes: int = _DEFAULT_MAX_BYTES,
+                 max_entries: int | None = None, enabled: bool = True):
+        self.path = Path(path).expanduser()
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        if enabled:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+                " created REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS completions_lru ON completions(last_access)")
+
+    @staticmethod
+    def key(model_id: str, prompt_version: str, params: Dict[str, Any], prompt: str) -> str:
+        """Content address of one completion."""
+        payload = json.dumps(
+            [model_id, prompt_version, params, prompt], sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        if not self.enabled:
+            self.misses += 1
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT value FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE completions SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions (key, value, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        entries, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+        while entries and (total > self.max_bytes or (self.max_entries is not None and entries > self.max_entries)):
+            excess = max(entries - (self.max_entries or entries), 1)
+            rows = self._db.execute(
+                "SELECT key, size FROM completions ORDER BY last_access LIMIT ?", (excess,)
+            ).fetchall()
+            self._db.executemany("DELETE FROM completions WHERE key = ?", [(k,) for k, _ in rows])
+            entries -= len(rows)
+            total -= sum(size for _, size in rows)
+
+    def clear(self) -> None:
+        if self.enabled:
+            with self._lock:
+                self._db.execute("DELETE FROM completions")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of this process plus what is on disk."""
+        entries, total = 0, 0
+        if self.enabled:
+            with self._lock:
+                entries, total = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions"
+                ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+        }
+
+
+_default: LLMCache | None = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> LLMCache:
+    """Process-wide cache used when a stage is not given one.
+
+    ``LLM_CACHE=off`` (or ``0``/``false``) disables it; any other value is
+    used as the SQLite path.
+    """
+    global _default
+    with _default_lock:
+        if _default is None:
+            setting = os.getenv("LLM_CACHE", "")
+            if setting.lower() in ("0", "off", "false", "no"):
+                _default = LLMCache(enabled=False)
+            else:
+                _default = LLMCache(setting or _DEFAULT_PATH)
+        return _default
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect or clear the LLM completion cache.")
+    parser.add_argument("--path", default=os.getenv("LLM_CACHE") or str(_DEFAULT_PATH))
+    parser.add_argument("--clear", action="store_true", help="Delete every cached completion")
+    args = parser.parse_args()
+
+    cache = LLMCache(args.path)
+    if args.clear:
+        cache.clear()
+    print(json.dumps(cache.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    _main()
@@ -1,9 +1,30 @@
+import functools
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict
-from llama_cpp import Llama
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Union
+import numpy as np
+from llama_cpp import Llama, LlamaGrammar
+from llama_cpp.llama_speculative import LlamaDraftModel, LlamaPromptLookupDecoding
+
+from .llm_cache import LLMCache, default_cache, model_fingerprint
+from .metrics import metrics, rss_bytes
 
 DEFAULT_N_CTX = 4096
 _STOP_TOKENS = ["</s>", "[/INST]"]
+_SAMPLING: Dict[str, Any] = {
+    "temperature": 0.2,
+    "top_p": 0.7,
+    "top_k": 40,
+    "repeat_penalty": 1.1,
+}
 
 def _guess_gpu_layers() -> int:
     """Heuristic: if the llama-cpp backend is CUDA/cuBLAS, load *all* layers."""
@@ -15,9 +36,113 @@ def _guess_gpu_layers() -> int:
     except Exception:
         return 0
 
+class GGUFDraftModel(LlamaDraftModel):
+    """Draft tokens from a small GGUF with the same vocabulary as the main model.
+
+    The draft model keeps its own KV cache and only evaluates the tokens
+    that are new since its previous call, then proposes *num_pred_tokens*
+    greedy tokens. It must only be used by one main model at a time (the
+    main model's :func:`model_lock` guarantees it).
+    """
+
+    def __init__(self, path: str | Path, *, num_pred_tokens: int = 8, n_ctx: int = DEFAULT_N_CTX,
+                 n_gpu_layers: int = 0, n_threads: int | None = None):
+        path = Path(path).expanduser().resolve()
+        if not path.exists():
+            raise FileNotFoundError(path)
+        self.model_path = str(path)
+        self.num_pred_tokens = num_pred_tokens
+        self.llm = Llama(model_path=self.model_path, n_gpu_layers=n_gpu_layers, n_ctx=n_ctx,
+                         n_threads=n_threads, verbose=False)
+
+    def __call__(self, input_ids: np.ndarray, /, **kwargs: Any) -> np.ndarray:
+        llm = self.llm
+        ids = input_ids.tolist()
+        common = 0
+        for a, b in zip(llm.input_ids[:llm.n_tokens].tolist(), ids):
+            if a != b:
+                break
+            common += 1
+        llm.n_tokens = min(common, len(ids) - 1)  # re-evaluate at least one token to get its logits
+        llm.eval(ids[llm.n_tokens:])
+
+        eos = llm.token_eos()
+        draft: List[int] = []
+        while len(draft) < self.num_pred_tokens and llm.n_tokens < llm.n_ctx():
+            token = int(np.argmax(llm.scores[llm.n_tokens - 1]))
+            if token == eos:
+                break
+            draft.append(token)
+            llm.eval([token])
+        return np.array(draft, dtype=np.intc)
+
+
+class _CountingDraft(LlamaDraftModel):
+    """Pass-through draft model that estimates how many of its tokens get accepted.
+
+    llama-cpp-python calls the draft model once per verification step with
+    everything decoded so far. When the next call extends the previous
+    input by ``n + 1`` tokens, the main model kept ``n`` of the proposed
+    tokens and added one of its own. The proposal of the last step of a
+    completion is never verified this way and is left out.
+    """
+
+    def __init__(self, draft: LlamaDraftModel, spec: str):
+        self.draft = draft
+        self.spec = spec
+        self.proposed = 0
+        self.accepted = 0
+        self._last: np.ndarray | None = None
+        self._last_n = 0
+
+    def __call__(self, input_ids: np.ndarray, /, **kwargs: Any) -> np.ndarray:
+        last = self._last
+        if last is not None and input_ids.size > last.size and np.array_equal(input_ids[:last.size], last):
+            self.proposed += self._last_n
+            self.accepted += min(self._last_n, input_ids.size - last.size - 1)
+        draft = self.draft(input_ids, **kwargs)
+        self._last = np.array(input_ids, copy=True)
+        self._last_n = len(draft)
+        return draft
+
+    def counts(self) -> Tuple[int, int]:
+        return self.proposed, self.accepted
+
+
+def make_draft(spec: str, *, n_ctx: int = DEFAULT_N_CTX, n_gpu_layers: int = 0,
+               n_threads: int | None = None) -> LlamaDraftModel:
+    """Build the draft model described by *spec*.
+
+    ``"prompt-lookup"`` (or ``"prompt-lookup:N"``) drafts N tokens (default
+    10) by matching the last n-gram against the prompt, which suits
+    summaries that copy names and phrases from the transcript. Anything else
+    is the path of a small GGUF sharing the main model's vocabulary,
+    optionally followed by ``:N`` draft tokens per step (default 8).
+    """
+    name, _, count = spec.rpartition(":")
+    if not (name and count.isdigit()):
+        name, count = spec, ""
+    if name == "prompt-lookup":
+        return LlamaPromptLookupDecoding(num_pred_tokens=int(count or 10))
+    return GGUFDraftModel(name, num_pred_tokens=int(count or 8), n_ctx=n_ctx, n_gpu_layers=n_gpu_layers,
+                          n_threads=n_threads)
+
+
 def load_model(path: str | Path, n_gpu_layers: int | None = None, *, n_ctx: int = DEFAULT_N_CTX,
-               verbose: bool = False) -> Llama:
-    """Load a GGUF checkpoint and return the *llama-cpp-python* object."""
+               use_mmap: bool = True, use_mlock: bool = False, n_threads: int | None = None,
+               draft: str | None = None, verbose: bool = False) -> Llama:
+    """Load a GGUF checkpoint and return the *llama-cpp-python* object.
+
+    This always loads a new copy; use :func:`get_model` to share one
+    instance between stages.
+
+    With a *draft* spec (see :func:`make_draft`) the model decodes
+    speculatively: the draft proposes several tokens and the model checks
+    them in one batch, keeping the ones it agrees with. Outputs follow the
+    same distribution; :func:`draft_stats` estimates the acceptance rate.
+    Note that llama-cpp-python keeps the logits of every position of a
+    model with a draft (``n_ctx * n_vocab`` floats).
+    """
     path = Path(path).expanduser().resolve()
     if not path.exists():
         raise FileNotFoundError(path)
@@ -27,22 +152,403 @@ def load_model(path: str | Path, n_gpu_layers: int | None = None, *, n_ctx: int
 
     print("n_gpu_layers =", n_gpu_layers)
 
-    return Llama(
+    draft_model = None
+    if draft:
+        draft_model = _CountingDraft(make_draft(draft, n_ctx=n_ctx, n_gpu_layers=n_gpu_layers,
+                                                n_threads=n_threads), draft)
+
+    llm = Llama(
         model_path=str(path),
         n_gpu_layers=n_gpu_layers,
         n_ctx=n_ctx,
+        use_mmap=use_mmap,
+        use_mlock=use_mlock,
+        n_threads=n_threads,
+        draft_model=draft_model,
         verbose=verbose,
     )
+    inner = draft_model.draft if draft_model is not None else None
+    if isinstance(inner, GGUFDraftModel) and inner.llm.n_vocab() != llm.n_vocab():
+        raise ValueError(f"draft model {inner.model_path} does not share the vocabulary of {path}")
+    return llm
 
-def generate_response(llm: Llama, prompt: str, max_tokens: int = 256) -> str:
-    """Generate a response from the LLM with consistent parameters."""
-    response = llm(
-        prompt,
-        max_tokens=max_tokens,
-        temperature=0.2,
-        top_p=0.7,
-        top_k=40,
-        repeat_penalty=1.1,
-        stop=_STOP_TOKENS,
-    )
-    return response["choices"][0]["text"].strip() 
\ No newline at end of file
+
+def draft_stats(llm: Llama) -> Dict[str, Any]:
+    """Draft spec, tokens proposed and accepted, and acceptance rate of *llm* so far."""
+    draft = getattr(llm, "draft_model", None)
+    if not isinstance(draft, _CountingDraft):
+        return {"draft": None, "proposed": 0, "accepted": 0, "acceptance_rate": 0.0}
+    proposed, accepted = draft.counts()
+    return {"draft": draft.spec, "proposed": proposed, "accepted": accepted,
+            "acceptance_rate": accepted / proposed if proposed else 0.0}
+
+
+_MODELS: Dict[tuple, Llama] = {}
+_MODEL_INFO: Dict[tuple, Dict[str, Any]] = {}
+_MODELS_LOCK = threading.Lock()
+_GENERATE_LOCKS: "weakref.WeakKeyDictionary[Llama, threading.RLock]" = weakref.WeakKeyDictionary()
+
+
+def get_model(path: str | Path, n_gpu_layers: int | None = None, *, n_ctx: int = DEFAULT_N_CTX,
+              use_mmap: bool = True, use_mlock: bool = False, n_threads: int | None = None,
+              replica: int = 0, draft: str | None = None, verbose: bool = False) -> Llama:
+    """Return the process-wide shared model for this checkpoint and context.
+
+    Models are keyed by resolved path and every loading parameter (``n_ctx``,
+    ``n_gpu_layers``, ``n_threads``, ``use_mmap``, ``use_mlock``), so the
+    speaker detector and the summarizer map the same GGUF only once while a
+    caller asking for other settings gets its own instance. Calls
+    through :func:`generate_response` are serialised per model (see
+    :func:`model_lock`).
+
+    Distinct *replica* numbers give independent contexts that can generate
+    concurrently; with ``use_mmap`` they share the weight pages, so each
+    extra replica mostly costs its KV cache.
+
+    A *draft* spec (see :func:`load_model`) is part of the key, so each
+    stage can decode speculatively or not on its own contexts.
+    """
+    resolved = Path(path).expanduser().resolve()
+    # None ("guess") stays in the key so cache hits skip the backend probe
+    key = (str(resolved), n_ctx, n_gpu_layers, n_threads, use_mmap, use_mlock, replica, draft or None)
+
+    with _MODELS_LOCK:
+        llm = _MODELS.get(key)
+        if llm is None:
+            if n_gpu_layers is None:
+                n_gpu_layers = _guess_gpu_layers()
+            rss_before = rss_bytes()
+            start = time.perf_counter()
+            with metrics.stage("llm.load"):
+                llm = load_model(resolved, n_gpu_layers, n_ctx=n_ctx, use_mmap=use_mmap,
+                                 use_mlock=use_mlock, n_threads=n_threads, draft=draft, verbose=verbose)
+            _MODELS[key] = llm
+            _MODEL_INFO[key] = {
+                "path": key[0],
+                "n_ctx": n_ctx,
+                "n_gpu_layers": n_gpu_layers,
+                "n_threads": n_threads,
+                "replica": replica,
+                "draft": draft or None,
+                "use_mmap": use_mmap,
+                "use_mlock": use_mlock,
+                "load_time_s": time.perf_counter() - start,
+                "rss_delta_bytes": rss_bytes() - rss_before,
+            }
+    return llm
+
+
+def model_lock(llm: Llama) -> threading.RLock:
+    """Lock guarding the KV state of *llm* during a completion."""
+    with _MODELS_LOCK:
+        lock = _GENERATE_LOCKS.get(llm)
+        if lock is None:
+            lock = _GENERATE_LOCKS[llm] = threading.RLock()
+    return lock
+
+
+def model_stats() -> Dict[str, Any]:
+    """Load time and memory of the shared models.
+
+    With ``use_mmap`` the weights are paged in lazily, so ``rss_delta_bytes``
+    at load time understates the steady state; ``rss_bytes`` is the current
+    resident size of the whole process. Models with a draft also report
+    its acceptance so far (see :func:`draft_stats`).
+    """
+    with _MODELS_LOCK:
+        models = []
+        for key, info in _MODEL_INFO.items():
+            info = dict(info)
+            if info["draft"]:
+                stats = draft_stats(_MODELS[key])
+                info.update(draft_proposed=stats["proposed"], draft_accepted=stats["accepted"],
+                            draft_acceptance_rate=stats["acceptance_rate"])
+            models.append(info)
+    return {"models": models, "rss_bytes": rss_bytes()}
+
+class PrefixCache:
+    """Evaluate each static prompt prefix once per model and reuse its KV state.
+
+    Before a completion whose prompt starts with a known prefix the saved
+    llama.cpp state is restored (``load_state``), so llama-cpp-python only
+    evaluates the tokens after the prefix. When the model still holds the
+    prefix from the previous call nothing is restored at all. States are
+    dropped together with their model.
+    """
+
+    def __init__(self):
+        self._states: "weakref.WeakKeyDictionary[Llama, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def restore(self, llm: Llama, prefix: str) -> None:
+        """Put *llm* in the state right after evaluating *prefix*."""
+        with self._lock:
+            states = self._states.setdefault(llm, {})
+
+        tokens, state = states.get(prefix, (None, None))
+        if tokens is None:
+            tokens = llm.tokenize(prefix.encode("utf-8"), special=True)
+            states[prefix] = (tokens, None)
+
+        n = len(tokens)
+        if llm.n_tokens >= n and list(llm.input_ids[:n]) == tokens:
+            return  # already there
+
+        if state is None:
+            llm.reset()
+            llm.eval(tokens)
+            states[prefix] = (tokens, llm.save_state())
+        else:
+            llm.load_state(state)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._states.clear()
+
+
+_prefix_cache = PrefixCache()
+
+
+class LlamaServer:
+    """Client for a local llama.cpp server (``llama-server``).
+
+    Started with ``--parallel N`` the server decodes up to N requests in one
+    multi-sequence batch, which is how :func:`generate_batch` gets more
+    tokens/sec out of a CPU than one prompt at a time. Completions come back
+    in the same shape as ``Llama.__call__`` so the rest of the code does not
+    care which backend it talks to.
+
+    Parameters
+    ----------
+    url : str
+        Base URL of the server.
+    model_id : str
+        Identity of the served model (e.g. the GGUF file name); part of the
+        completion cache key.
+    timeout : float
+        Seconds to wait for one completion.
+    """
+
+    def __init__(self, url: str = "http://127.0.0.1:8080", *, model_id: str, timeout: float = 600.0):
+        self.url = url.rstrip("/")
+        self.model_id = model_id
+        self.timeout = timeout
+
+    def __call__(self, prompt: str, *, max_tokens: int = 256, stop: Sequence[str] = (),
+                 **sampling: Any) -> Dict[str, Any]:
+        payload = dict(sampling, prompt=prompt, n_predict=max_tokens, stop=list(stop), cache_prompt=True)
+        request = urllib.request.Request(
+            f"{self.url}/completion",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            body = json.load(response)
+        return {
+            "choices": [{"text": body.get("content", "")}],
+            "usage": {
+                "prompt_tokens": body.get("tokens_evaluated", 0),
+                "completion_tokens": body.get("tokens_predicted", 0),
+            },
+        }
+
+
+Backend = Union[Llama, LlamaServer]
+
+
+def _backend_id(backend: Backend) -> str:
+    if isinstance(backend, LlamaServer):
+        return f"server:{backend.model_id}"
+    return model_fingerprint(backend.model_path)
+
+
+@functools.lru_cache(maxsize=16)
+def _compiled_grammar(gbnf: str) -> LlamaGrammar:
+    return LlamaGrammar.from_string(gbnf, verbose=False)
+
+
+def _generate(backend: Backend, prompt: str, max_tokens: int, prompt_version: str,
+              cache: LLMCache | None, prefix: str | None,
+              grammar: str | None = None) -> Tuple[str, Dict[str, int]]:
+    """Completion text plus token usage (zero on a cache hit).
+
+    Every call is measured as stage ``llm:<prompt_version>``, and its tokens
+    are also added to the caller's open metrics span.
+    """
+    parent = metrics.current()
+    with metrics.stage(f"llm:{prompt_version or 'default'}") as span:
+        text, usage = _complete(backend, prompt, max_tokens, prompt_version, cache, prefix, grammar)
+        tokens = dict(tokens_in=usage.get("prompt_tokens", 0), tokens_out=usage.get("completion_tokens", 0))
+        span.add(items=1, **tokens)
+    parent.add(**tokens)
+    return text, usage
+
+
+def _complete(backend: Backend, prompt: str, max_tokens: int, prompt_version: str,
+              cache: LLMCache | None, prefix: str | None, grammar: str | None) -> Tuple[str, Dict[str, int]]:
+    cache = cache if cache is not None else default_cache()
+    params = dict(_SAMPLING, max_tokens=max_tokens, stop=_STOP_TOKENS)
+
+    key = None
+    if cache.enabled:
+        key_params = dict(params, grammar=grammar) if grammar else params
+        key = cache.key(_backend_id(backend), prompt_version, key_params, prompt)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, {"prompt_tokens": 0, "completion_tokens": 0}
+
+    if isinstance(backend, LlamaServer):
+        if grammar:
+            params["grammar"] = grammar
+        response = backend(prompt, **params)  # the server keeps its own prompt cache
+    else:
+        if grammar:
+            params["grammar"] = _compiled_grammar(grammar)
+        draft = getattr(backend, "draft_model", None)
+        with model_lock(backend):
+            if prefix and prompt.startswith(prefix):
+                _prefix_cache.restore(backend, prefix)
+            before = draft.counts() if isinstance(draft, _CountingDraft) else None
+            response = backend(prompt, **params)
+            if before is not None:
+                proposed, accepted = draft.counts()
+                response["usage"] = dict(response.get("usage", {}), draft_tokens=proposed - before[0],
+                                         accepted_draft_tokens=accepted - before[1])
+    text = response["choices"][0]["text"].strip()
+
+    if key is not None:
+        cache.put(key, text)
+    return text, response.get("usage", {})
+
+
+def generate_response(llm: Backend, prompt: str, max_tokens: int = 256, *,
+                      prompt_version: str = "", cache: LLMCache | None = None,
+                      prefix: str | None = None, grammar: str | None = None) -> str:
+    """Generate a response from the LLM with consistent parameters.
+
+    Completions are looked up in *cache* (the process-wide
+    :func:`~src.inference.llm_cache.default_cache` if None) under the model
+    file, *prompt_version*, sampling parameters and prompt, so reruns over
+    unchanged inputs are free. Bump a stage's *prompt_version* whenever its
+    template changes.
+
+    When *prefix* is given (the constant head of a stage's prompt), its
+    evaluated state is restored from the :class:`PrefixCache` instead of
+    being recomputed.
+
+    *grammar* is a GBNF grammar the output is constrained to; generation
+    stops as soon as the grammar is complete.
+
+    A model loaded with a *draft* (see :func:`load_model`) decodes
+    speculatively; :func:`generate_batch` reports the draft tokens proposed
+    and accepted per completion.
+
+    *llm* may also be a :class:`LlamaServer`.
+    """
+    return _generate(llm, prompt, max_tokens, prompt_version, cache, prefix, grammar)[0]
+
+
+@dataclass
+class BatchResult:
+    """One completion of :func:`generate_batch`."""
+    text: str
+    latency_s: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    draft_tokens: int = 0           # tokens proposed by a draft model (speculative decoding)
+    accepted_draft_tokens: int = 0  # ... and kept by the main model
+
+    @property
+    def cached(self) -> bool:
+        return self.prompt_tokens == 0 and self.completion_tokens == 0
+
+    @property
+    def tokens_per_s(self) -> float:
+        return self.completion_tokens / self.latency_s if self.latency_s else 0.0
+
+    @property
+    def acceptance_rate(self) -> float:
+        return self.accepted_draft_tokens / self.draft_tokens if self.draft_tokens else 0.0
+
+
+def generate_batch(backends: Backend | Sequence[Backend], prompts: Sequence[str], max_tokens: int = 256, *,
+                   max_workers: int | None = None, prompt_version: str = "",
+                   cache: LLMCache | None = None, prefix: str | None = None,
+                   grammar: str | None = None) -> List[BatchResult]:
+    """Generate completions for many prompts; results keep input order.
+
+    With a :class:`LlamaServer`, up to *max_workers* requests (default 8; match
+    the server's ``--parallel``) are in flight and the server decodes them as
+    one multi-sequence batch. With local models this is only a thread pool:
+    pass several contexts (e.g. ``get_model(..., replica=i)``) and each one
+    decodes one prompt at a time, *max_workers* defaulting to their number.
+    No multi-sequence batch is formed locally, so the replicas compete for
+    the same cores and aggregate tokens/sec is at best that of running them
+    side by side; use a server for real batched decoding.
+    """
+    if isinstance(backends, (Llama, LlamaServer)):
+        backends = [backends]
+    if max_workers is None:
+        max_workers = 8 if any(isinstance(b, LlamaServer) for b in backends) else len(backends)
+
+    free: queue.Queue = queue.Queue()
+    for i in range(max(max_workers, 1)):
+        free.put(backends[i % len(backends)])
+
+    def _one(prompt: str) -> BatchResult:
+        backend = free.get()
+        try:
+            start = time.perf_counter()
+            text, usage = _generate(backend, prompt, max_tokens, prompt_version, cache, prefix, grammar)
+            return BatchResult(
+                text=text,
+                latency_s=time.perf_counter() - start,
+                prompt_tokens=usage.get("prompt_tokens", 0),
+                completion_tokens=usage.get("completion_tokens", 0),
+                draft_tokens=usage.get("draft_tokens", 0),
+                accepted_draft_tokens=usage.get("accepted_draft_tokens", 0),
+            )
+        finally:
+            free.put(backend)
+
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as pool:
+        return list(pool.map(_one, prompts))
+
+
+class TokenBudget:
+    """Measure text in the model's own tokens and size chunks to its context.
+
+    A chunk has to fit next to the prompt wrapped around it and the tokens
+    the model will generate, so the space left for it is
+    ``n_ctx - prompt_overhead - max_tokens - margin``. The overhead is the
+    largest of the given prompt builders applied to an empty chunk, so one
+    budget can serve several stages (speaker detection and summarisation).
+    Token counts are cached per text since the same sentences get measured
+    again on every re-split.
+    """
+
+    def __init__(self, llm: Llama, prompts: Sequence[Callable[[str], str]] = (), *,
+                 max_tokens: int = 256, margin: int = 16, cache_size: int = 1 << 16):
+        self.llm = llm
+        self.n_ctx = llm.n_ctx()
+        self.max_tokens = max_tokens
+        self.margin = margin
+        self.prompt_overhead = max(
+            (len(llm.tokenize(build("").encode("utf-8"), add_bos=True)) for build in prompts),
+            default=0,
+        )
+        self.count = functools.lru_cache(maxsize=cache_size)(self._count)
+
+    def _count(self, text: str) -> int:
+        return len(self.llm.tokenize(text.encode("utf-8"), add_bos=False))
+
+    @property
+    def chunk_tokens(self) -> int:
+        """Tokens available for the chunk itself."""
+        available = self.n_ctx - self.prompt_overhead - self.max_tokens - self.margin
+        if available <= 0:
+            raise ValueError(
+                f"n_ctx={self.n_ctx} leaves no room for a chunk "
+                f"(prompt {self.prompt_overhead} + generation {self.max_tokens} tokens)"
+            )
+        return available
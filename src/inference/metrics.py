@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import argparse
+import functools
+import http.server
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    """Highest resident set size this process reached so far."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KiB on Linux
+
+
+@dataclass
+class StageMetrics:
+    """Totals of every measurement of one stage."""
+    calls: int = 0
+    items: int = 0
+    wall_s: float = 0.0
+    tokens_in: int = 0
+    tokens_out: int = 0
+    audio_s: float = 0.0
+    peak_rss_bytes: int = 0
+
+    @property
+    def tokens_per_s(self) -> float:
+        """Generated tokens per second of wall time."""
+        return self.tokens_out / self.wall_s if self.wall_s else 0.0
+
+    @property
+    def rtf(self) -> float:
+        """Real-time factor (< 1 is faster than realtime; 0 when no audio was processed)."""
+        return self.wall_s / self.audio_s if self.audio_s else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(asdict(self), tokens_per_s=self.tokens_per_s, rtf=self.rtf)
+
+
+class Span:
+    """One measurement in progress; add what the stage consumed/produced to it."""
+
+    __slots__ = ("stage", "items", "tokens_in", "tokens_out", "audio_s")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.items = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.audio_s = 0.0
+
+    def add(self, *, items: int = 0, tokens_in: int = 0, tokens_out: int = 0, audio_s: float = 0.0) -> None:
+        self.items += items
+        self.tokens_in += tokens_in
+        self.tokens_out += tokens_out
+        self.audio_s += audio_s
+
+
+class Metrics:
+    """Thread-safe, process-wide per-stage measurements.
+
+    Stages are measured with :meth:`stage` (context manager), :meth:`timed`
+    (decorator) or :meth:`iterate` (for generators, counting only the time
+    spent producing items). Every finished measurement is folded into the
+    stage totals and, when a JSON-lines path is set (``METRICS_JSONL`` or
+    :meth:`export_jsonl`), appended there as one event.
+    """
+
+    def __init__(self, jsonl: str | None = None):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, StageMetrics] = {}
+        self._local = threading.local()
+        self._jsonl = None
+        if jsonl:
+            self.export_jsonl(jsonl)
+
+    # -- measuring --------------------------------------------------------
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Span]:
+        """Measure the wall time of the block as one call of stage *name*."""
+        span = Span(name)
+        stack = self._stack()
+        stack.append(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            wall = time.perf_counter() - start
+            stack.pop()
+            self._finish(span, wall)
+
+    def timed(self, name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+        """Decorator measuring every call of the function as stage *name*."""
+        def decorator(fn: Callable[..., T]) -> Callable[..., T]:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def iterate(self, name: str, iterable: Iterable[T]) -> Iterator[T]:
+        """Pass *iterable* through, measuring only the time spent producing its items."""
+        span = Span(name)
+        wall = 0.0
+        iterator = iter(iterable)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    wall += time.perf_counter() - start
+                span.items += 1
+                yield item
+        finally:
+            self._finish(span, wall)
+
+    def current(self) -> Span:
+        """Innermost open span of this thread (a throwaway one if there is none)."""
+        stack = self._stack()
+        return stack[-1] if stack else Span("")
+
+    def record(self, name: str, *, wall_s: float, items: int = 0, tokens_in: int = 0,
+               tokens_out: int = 0, audio_s: float = 0.0, rss: int | None = None) -> None:
+        """Add a measurement taken elsewhere (e.g. in a worker process)."""
+        span = Span(name)
+        span.add(items=items, tokens_in=tokens_in, tokens_out=tokens_out, audio_s=audio_s)
+        self._finish(span, wall_s, rss)
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _finish(self, span: Span, wall: float, rss: int | None = None) -> None:
+        rss = rss_bytes() if rss is None else rss
+        with self._lock:
+            totals = self._stages.setdefault(span.stage, StageMetrics())
+            totals.calls += 1
+            totals.items += span.items
+            totals.wall_s += wall
+            totals.tokens_in += span.tokens_in
+            totals.tokens_out += span.tokens_out
+            totals.audio_s += span.audio_s
+            totals.peak_rss_bytes = max(totals.peak_rss_bytes, rss)
+            if self._jsonl is not None:
+                self._jsonl.write(json.dumps({
+                    "ts": time.time(), "stage": span.stage, "wall_s": wall, "items": span.items,
+                    "tokens_in": span.tokens_in, "tokens_out": span.tokens_out,
+                    "audio_s": span.audio_s, "rss_bytes": rss,
+                }) + "\n")
+                self._jsonl.flush()
+
+    # -- reporting --------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Totals per stage, plus derived tokens/s and real-time factor."""
+        with self._lock:
+            return {name: stage.as_dict() for name, stage in sorted(self._stages.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+
+    def export_jsonl(self, path: str) -> None:
+        """Append one JSON line per finished measurement to *path* from now on."""
+        with self._lock:
+            if self._jsonl is not None:
+                self._jsonl.close()
+            self._jsonl = open(path, "a", encoding="utf-8")
+
+    def prometheus_text(self) -> str:
+        """Totals in the Prometheus text exposition format."""
+        lines = []
+        fields = [
+            ("calls", "calls", "counter", "Measured calls"),
+            ("items", "items", "counter", "Items produced"),
+            ("wall_s", "seconds", "counter", "Wall time spent in the stage"),
+            ("tokens_in", "prompt_tokens", "counter", "Prompt tokens evaluated"),
+            ("tokens_out", "completion_tokens", "counter", "Tokens generated"),
+            ("audio_s", "audio_seconds", "counter", "Audio processed"),
+            ("peak_rss_bytes", "peak_rss_bytes", "gauge", "Highest RSS seen at the end of a call"),
+        ]
+        snapshot = self.snapshot()
+        for key, metric, kind, help_text in fields:
+            suffix = "_total" if kind == "counter" else ""
+            name = f"congress_stage_{metric}{suffix}"
+            lines.append(f"# HELP {name} {help_text}.")
+            lines.append(f"# TYPE {name} {kind}")
+            for stage, values in snapshot.items():
+                lines.append(f'{name}{{stage="{stage}"}} {values[key]}')
+        lines.append("# HELP congress_process_peak_rss_bytes Peak RSS of the process.")
+        lines.append("# TYPE congress_process_peak_rss_bytes gauge")
+        lines.append(f"congress_process_peak_rss_bytes {peak_rss_bytes()}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9108, host: str = "127.0.0.1") -> http.server.ThreadingHTTPServer:
+        """Serve :meth:`prometheus_text` on ``/metrics`` from a daemon thread."""
+        registry = self
+
+        class _Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer((host, port), _Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+metrics = Metrics(os.getenv("METRICS_JSONL") or None)
+
+
+def format_table(snapshot: Dict[str, Dict[str, Any]]) -> str:
+    """Human-readable table of a :meth:`Metrics.snapshot`."""
+    rows = [f"{'stage':<24} {'calls':>6} {'wall s':>9} {'tok in':>8} {'tok out':>8} "
+            f"{'tok/s':>7} {'audio s':>9} {'RTF':>6} {'peak RSS MB':>12}"]
+    for name, m in sorted(snapshot.items(), key=lambda kv: -kv[1]["wall_s"]):
+        rows.append(f"{name:<24} {m['calls']:>6} {m['wall_s']:>9.1f} {m['tokens_in']:>8} {m['tokens_out']:>8} "
+                    f"{m['tokens_per_s']:>7.1f} {m['audio_s']:>9.0f} {m['rtf']:>6.2f} "
+                    f"{m['peak_rss_bytes'] / 2**20:>12.0f}")
+    return "\n".join(rows)
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(description="Summarise a METRICS_JSONL file per stage.")
+    parser.add_argument("path", help="JSON-lines file written with METRICS_JSONL / --metrics-jsonl")
+    args = parser.parse_args()
+
+    registry = Metrics()
+    with open(args.path, encoding="utf-8") as f:
+        for line in f:
+            event = json.loads(line)
+            registry.record(event["stage"], wall_s=event["wall_s"], items=event["items"],
+                            tokens_in=event["tokens_in"], tokens_out=event["tokens_out"],
+                            audio_s=event["audio_s"], rss=event["rss_bytes"])
+    print(format_table(registry.snapshot()))
+
+
+if __name__ == "__main__":
+    _main()
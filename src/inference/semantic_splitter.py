@@ -1,8 +1,36 @@
-from typing import List
+import re
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, List, Sequence, Tuple, Union
+import numpy as np
 import spacy
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .metrics import metrics
+from .stt import Segment
+from .transcript import Transcript, TranscriptView
+
+if TYPE_CHECKING:
+    from .llm_utils import TokenBudget
+
+_SENTENCE_END = (".", "?", "!", "…")
+_WORD = re.compile(r"\S+")
+
+EmbedFn = Callable[[List[str]], np.ndarray]
+
 
 class SemanticSplitter:
-    def __init__(self, model_name: str = "es_core_news_sm", max_words: int = 4096):
+    def __init__(
+        self,
+        model_name: str = "es_core_news_sm",
+        max_words: int = 4096,
+        *,
+        strategy: str = "greedy",
+        embed: EmbedFn | None = None,
+        window: int = 5,
+        threshold: float = 1.0,
+        min_words: int = 0,
+        embed_batch_size: int = 256,
+        budget: "TokenBudget | None" = None,
+    ):
         """
         Parameters
         ----------
@@ -10,10 +38,54 @@ class SemanticSplitter:
             spaCy model name for Spanish (default: 'es_core_news_sm').
         max_words : int
             Maximum number of tokens per chunk (estimated by words).
+            Ignored when ``budget`` is given.
+        strategy : str
+            ``"greedy"`` packs sentences up to ``max_words``. ``"topic"``
+            embeds the sentences and cuts where the similarity between the
+            ``window`` sentences before and after a gap drops, still never
+            exceeding ``max_words``.
+        embed : callable or None
+            ``List[str] -> (n, d) array`` sentence embedder for the topic
+            strategy (e.g. a sentence-transformers ``encode``). Defaults to
+            the spaCy document vectors of ``model_name``.
+        window : int
+            Sentences on each side of a gap compared by the topic strategy.
+        threshold : float
+            A gap is a topic boundary when its depth score exceeds
+            ``mean + threshold * std`` of all depth scores.
+        min_words : int
+            Topic boundaries are ignored until a chunk has this many words
+            (tokens when ``budget`` is given).
+        embed_batch_size : int
+            Sentences per embedding batch.
+        budget : TokenBudget or None
+            Measure sentences in real model tokens and fill chunks up to
+            ``budget.chunk_tokens`` instead of counting words.
         """
+        if strategy not in ("greedy", "topic"):
+            raise ValueError(f"Unknown strategy: {strategy}")
+
+        self.model_name = model_name
         self.nlp = spacy.load(model_name)
         self.max_words = max_words
+        self.strategy = strategy
+        self.embed = embed or self._spacy_embed
+        self.window = window
+        self.threshold = threshold
+        self.min_words = min_words
+        self.embed_batch_size = embed_batch_size
+        self.budget = budget
+        self._segmenter = None
+
+    @property
+    def max_size(self) -> int:
+        """Chunk capacity, in tokens with a budget and in words otherwise."""
+        return self.budget.chunk_tokens if self.budget is not None else self.max_words
 
+    def _size(self, sentence: str) -> int:
+        return self.budget.count(sentence) if self.budget is not None else len(sentence.split())
+
+    @metrics.timed("chunking")
     def split_text(self, text: str) -> List[str]:
         """
         Split text into semantically coherent chunks based on sentences.
@@ -28,26 +100,309 @@ class SemanticSplitter:
         List[str]
             List of text chunks.
         """
-        doc = self.nlp(text)
-        sentences = [sent.text.strip() for sent in doc.sents if sent.text.strip()]
+        spans = self._sentence_spans(text)
+        groups = self._group([text[a:b] for a, b in spans])
+        return [" ".join(text[a:b] for a, b in spans[lo:hi]) for lo, hi in groups]
+
+    @metrics.timed("chunking")
+    def split_transcript(self, transcript: Transcript | TranscriptView) -> List[TranscriptView]:
+        """
+        Same as :meth:`split_text` but returns views into *transcript*, so each
+        chunk keeps its start/end time without copying the text.
+
+        Chunk boundaries snap to transcript units: with segment-level
+        timestamps a sentence sharing a segment with the previous chunk stays
+        in that chunk. Use word-level timestamps for exact boundaries.
+        """
+        if isinstance(transcript, Transcript):
+            transcript = transcript.view()
+
+        text = transcript.text
+        spans = self._sentence_spans(text)
+        groups = self._group([text[a:b] for a, b in spans])
 
         chunks = []
-        current_chunk = ""
-        current_word_count = 0
+        prev_hi = transcript.lo
+        for lo, hi in groups:
+            first = transcript.span(*spans[lo])
+            last = transcript.span(*spans[hi - 1])
+            start = max(first.lo, prev_hi)
+            if last.hi > start:
+                chunks.append(TranscriptView(transcript.transcript, start, last.hi))
+                prev_hi = last.hi
+        return chunks
+
+    def iter_chunks(
+        self,
+        pieces: Iterable[Union[str, Segment]],
+        *,
+        block_words: int = 2000,
+        batch_size: int = 8,
+        n_process: int = 1,
+    ) -> Iterator[Union[str, TranscriptView]]:
+        """
+        Stream chunks out of an iterable of transcript pieces.
+
+        Always packs greedily: the topic strategy needs to look ahead of
+        the chunk being built, which would defeat streaming.
+
+        Pieces are grouped into blocks of roughly *block_words* words, cut
+        after a piece that ends a sentence, and sentence-segmented with a
+        pipeline that only runs ``senter`` (see :meth:`segmenter`). A chunk
+        is yielded as soon as the next sentence would not fit, so memory
+        stays constant and spaCy's ``max_length`` is never reached however
+        long the session is.
+
+        Parameters
+        ----------
+        pieces : Iterable[str or Segment]
+            Plain strings, or timestamped segments (anything with ``text``,
+            ``start`` and ``end``) such as those from ``transcribe_stream``.
+        block_words : int
+            Approximate size of the blocks handed to spaCy.
+        batch_size : int
+            Blocks per ``nlp.pipe`` batch.
+        n_process : int
+            Processes used by ``nlp.pipe``.
+
+        Yields
+        ------
+        str or TranscriptView
+            Strings for string pieces; views (with timestamps) for segments.
+        """
+        # measured as stage "chunking"; includes time spent waiting on *pieces*
+        return metrics.iterate("chunking", self._iter_chunks(pieces, block_words, batch_size, n_process))
+
+    def _iter_chunks(self, pieces: Iterable, block_words: int, batch_size: int,
+                     n_process: int) -> Iterator[Union[str, TranscriptView]]:
+        nlp = self.segmenter
+        timed = []  # whether pieces carry timestamps, decided on the first one
+        blocks = self._blocks(pieces, block_words, timed)
+        docs = nlp.pipe(((b.text, b) for b in blocks), as_tuples=True,
+                        batch_size=batch_size, n_process=n_process)
+
+        current: List[Tuple[int, TranscriptView]] = []
+        current_size = 0
+        max_size = self.max_size
+        emitted = (-1, 0)  # (block index, unit) already handed out
+
+        def _emit() -> Union[str, TranscriptView, None]:
+            nonlocal emitted
+            if not timed[0]:
+                return " ".join(view.text for _, view in current)
+            units = []
+            for block_idx, view in current:
+                skip = emitted[1] - view.lo if block_idx == emitted[0] else 0
+                units.extend(view.view(max(skip, 0)).units())
+                emitted = (block_idx, max(view.hi, emitted[1]) if block_idx == emitted[0] else view.hi)
+            # with segment-level units a chunk may consist only of units
+            # already handed out with the previous one
+            return Transcript.from_units(units).view() if units else None
+
+        for block_idx, (doc, block) in enumerate(docs):
+            whole = block.view()
+            for sent in doc.sents:
+                raw = sent.text
+                stripped = raw.strip()
+                if not stripped:
+                    continue
+                start = sent.start_char + len(raw) - len(raw.lstrip())
+                for lo, hi in self._fit(doc.text, start, start + len(stripped)):
+                    sentence_size = self._size(doc.text[lo:hi])
+                    if current_size + sentence_size > max_size and current:
+                        chunk = _emit()
+                        if chunk:
+                            yield chunk
+                        current = []
+                        current_size = 0
+                    current.append((block_idx, whole.span(lo, hi)))
+                    current_size += sentence_size
+
+        if current:
+            chunk = _emit()
+            if chunk:
+                yield chunk
 
-        for sentence in sentences:
-            sentence_word_count = len(sentence.split())
+    @property
+    def segmenter(self) -> spacy.language.Language:
+        """Sentence-segmentation-only copy of the pipeline (loaded on first use).
 
-            if current_word_count + sentence_word_count > self.max_words:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence
-                current_word_count = sentence_word_count
+        Tagger, parser, NER, etc. are excluded and the model's ``senter`` is
+        enabled, or a rule-based ``sentencizer`` added if it has none.
+        """
+        if self._segmenter is None:
+            exclude = [name for name in self.nlp.component_names if name != "senter"]
+            nlp = spacy.load(self.model_name, exclude=exclude)
+            if "senter" in nlp.component_names:
+                nlp.enable_pipe("senter")
+            else:
+                nlp.add_pipe("sentencizer")
+            self._segmenter = nlp
+        return self._segmenter
+
+    @staticmethod
+    def _blocks(pieces: Iterable, block_words: int, timed: list) -> Iterator[Transcript]:
+        """Group *pieces* into transcripts of about *block_words* words ending on a sentence."""
+        units: list = []
+        words = 0
+        for piece in pieces:
+            if not timed:
+                timed.append(not isinstance(piece, str))
+            if timed[0]:
+                text = piece.text.strip()
+                units.append((text, piece.start, piece.end))
+                words += len(text.split())
             else:
-                current_chunk += " " + sentence
-                current_word_count += sentence_word_count
+                text = piece.strip()
+                split = text.split()
+                units.extend((w, float("nan"), float("nan")) for w in split)
+                words += len(split)
+            if words >= 2 * block_words or (words >= block_words and text.endswith(_SENTENCE_END)):
+                yield Transcript.from_units(units)
+                units = []
+                words = 0
+        if units:
+            yield Transcript.from_units(units)
 
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+    def _sentence_spans(self, text: str) -> List[Tuple[int, int]]:
+        """Character spans of the non-empty sentences of *text*, whitespace-trimmed.
 
-        return chunks
+        Sentences longer than a chunk are cut into several spans (see :meth:`_fit`).
+        """
+        spans = []
+        for sent in self.nlp(text).sents:
+            raw = sent.text
+            stripped = raw.strip()
+            if stripped:
+                start = sent.start_char + len(raw) - len(raw.lstrip())
+                spans.extend(self._fit(text, start, start + len(stripped)))
+        return spans
+
+    def _fit(self, text: str, start: int, end: int) -> List[Tuple[int, int]]:
+        """Cut the sentence ``text[start:end]`` at word boundaries into spans of at most ``max_size``.
+
+        Whisper can go on for minutes without punctuation; such a "sentence"
+        would otherwise become a chunk larger than the budget. A single word
+        larger than a chunk is kept whole.
+        """
+        max_size = self.max_size
+        if self._size(text[start:end]) <= max_size:
+            return [(start, end)]
+        words = [(m.start(), m.end()) for m in _WORD.finditer(text, start, end)]
+        spans = []
+        lo = 0
+        while lo < len(words):
+            # binary search for the most words from *lo* on that still fit (at least one)
+            fit, too_many = lo + 1, len(words) + 1
+            while too_many - fit > 1:
+                mid = (fit + too_many) // 2
+                if self._size(text[words[lo][0]:words[mid - 1][1]]) <= max_size:
+                    fit = mid
+                else:
+                    too_many = mid
+            spans.append((words[lo][0], words[fit - 1][1]))
+            lo = fit
+        return spans
+
+    def _group(self, sentences: List[str]) -> List[Tuple[int, int]]:
+        """Group sentences into chunks with the configured strategy; returns index ranges."""
+        sizes = [self._size(sentence) for sentence in sentences]
+        if self.strategy == "topic" and len(sentences) > 2:
+            return self._pack_topics(sizes, self.gap_similarities(sentences))
+        return self._pack(sizes)
+
+    def _spacy_embed(self, sentences: List[str]) -> np.ndarray:
+        # doc.vector only needs static vectors (tokenizer) or the shared tok2vec tensor
+        enable = [name for name in ("tok2vec",) if name in self.nlp.pipe_names]
+        with self.nlp.select_pipes(enable=enable):
+            docs = list(self.nlp.pipe(sentences, batch_size=self.embed_batch_size))
+        return np.stack([doc.vector for doc in docs]) if sentences else np.zeros((0, 0))
+
+    def gap_similarities(self, sentences: List[str]) -> np.ndarray:
+        """
+        Cosine similarity across every gap between consecutive sentences.
+
+        ``sim[g]`` compares the mean embedding of the ``window`` sentences
+        before sentence ``g`` with the ``window`` sentences from ``g`` on;
+        ``sim[0]`` is ``inf``. Computed with prefix sums, so the cost after
+        embedding is O(n·d) whatever the window.
+        """
+        n = len(sentences)
+        emb = np.concatenate([
+            np.asarray(self.embed(sentences[i:i + self.embed_batch_size]), dtype=np.float32)
+            for i in range(0, n, self.embed_batch_size)
+        ])
+        emb /= np.linalg.norm(emb, axis=1, keepdims=True) + 1e-8
+        csum = np.vstack([np.zeros((1, emb.shape[1]), dtype=np.float32), np.cumsum(emb, axis=0)])
+
+        gaps = np.arange(1, n)
+        left = csum[gaps] - csum[np.maximum(gaps - self.window, 0)]
+        right = csum[np.minimum(gaps + self.window, n)] - csum[gaps]
+        num = np.einsum("ij,ij->i", left, right)
+        den = np.linalg.norm(left, axis=1) * np.linalg.norm(right, axis=1) + 1e-8
+
+        sim = np.empty(n, dtype=np.float32)
+        sim[0] = np.inf
+        sim[1:] = num / den
+        return sim
+
+    def topic_boundaries(self, sim: np.ndarray) -> np.ndarray:
+        """Boolean mask of the gaps (see :meth:`gap_similarities`) that start a new topic."""
+        n = len(sim)
+        if n < 3:
+            return np.zeros(n, dtype=bool)
+        w = self.window
+        inner = sim[1:]
+        padded = np.pad(inner, w, mode="edge")
+        peaks = sliding_window_view(padded, w)
+        left_peak = peaks[:len(inner)].max(axis=1)        # max over the w gaps before
+        right_peak = peaks[w + 1:w + 1 + len(inner)].max(axis=1)  # and the w gaps after
+        depth = np.maximum(left_peak - inner, 0) + np.maximum(right_peak - inner, 0)
+
+        local_min = inner <= np.minimum(padded[w - 1:w - 1 + len(inner)], padded[w + 1:w + 1 + len(inner)])
+        cutoff = depth.mean() + self.threshold * depth.std()
+        boundaries = np.zeros(n, dtype=bool)
+        boundaries[1:] = local_min & (depth > cutoff)
+        return boundaries
+
+    def _pack_topics(self, sizes: Sequence[int], sim: np.ndarray) -> List[Tuple[int, int]]:
+        """Cut at topic boundaries; when a topic overflows ``max_size`` cut at its least similar gap."""
+        boundaries = self.topic_boundaries(sim)
+        csum = np.concatenate([[0], np.cumsum(sizes)])
+        max_size = self.max_size
+        groups = []
+        lo = 0
+
+        for i in range(len(sizes)):
+            if i > lo and boundaries[i] and csum[i] - csum[lo] >= self.min_words:
+                groups.append((lo, i))
+                lo = i
+            while i > lo and csum[i + 1] - csum[lo] > max_size:
+                cut = lo + 1 + int(np.argmin(sim[lo + 1:i + 1]))
+                groups.append((lo, cut))
+                lo = cut
+
+        if lo < len(sizes):
+            groups.append((lo, len(sizes)))
+
+        return groups
+
+    def _pack(self, sizes: Sequence[int]) -> List[Tuple[int, int]]:
+        """Greedily group consecutive sentences up to ``max_size``; returns index ranges."""
+        groups = []
+        lo = 0
+        current_size = 0
+        max_size = self.max_size
+
+        for i, sentence_size in enumerate(sizes):
+            if current_size + sentence_size > max_size and i > lo:
+                groups.append((lo, i))
+                lo = i
+                current_size = sentence_size
+            else:
+                current_size += sentence_size
+
+        if lo < len(sizes):
+            groups.append((lo, len(sizes)))
+
+        return groups
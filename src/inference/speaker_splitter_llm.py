@@ -1,21 +1,128 @@
-from typing import List, Tuple
+import json
+import os
+import queue
+from typing import List, Optional, Sequence, Tuple, Union
 from pathlib import Path
-from .llm_utils import load_model, generate_response
+from .llm_cache import LLMCache
+from .llm_utils import Backend, get_model, generate_batch, generate_response
+from .metrics import metrics
+from .transcript import TranscriptView
+
+Chunk = Union[str, TranscriptView]
+Detection = Tuple[bool, Optional[str], Optional[str]]
+
+# Bump whenever build_prompt changes so cached completions are not reused.
+PROMPT_VERSION = "speaker-v1"
+
+
+# Constant head of the prompt; its KV state is evaluated once and reused.
+PROMPT_PREFIX = (
+    "[INST] <<SYS>>Eres un asistente analizando transcripciones de discursos políticos. "
+    "Responde en el formato exacto especificado.<</SYS>>\n\n"
+    "Dado el siguiente fragmento de transcripción:\n\n"
+)
+
+
+def build_prompt(chunk: str) -> str:
+    """Speaker-change detection prompt for *chunk*."""
+    return PROMPT_PREFIX + (
+        f"{chunk}\n\n"
+        "Tus tareas:\n"
+        "- Detecta si se introduce un nuevo orador.\n"
+        "- Si es así, proporciona el nombre completo/título del nuevo orador y la oración exacta donde ocurre el cambio.\n"
+        "- Si no, responde \"No speaker change\".\n\n"
+        "Formatea tu respuesta exactamente como:\n"
+        "[Nombre del Orador]|[Oración de Cambio]\n"
+        "o\n"
+        "[No speaker change]|[Oración completa][/INST]"
+    )
+
+
+# Structured mode: the answer is constrained to this JSON by a GBNF grammar,
+# so it always parses and generation stops at the closing brace.
+STRUCTURED_PROMPT_VERSION = "speaker-json-v2"
+_MAX_SPEAKER_CHARS = 80
+_MAX_SENTENCE_CHARS = 120
+
+SPEAKER_GRAMMAR = rf"""
+root    ::= "{{" ws "\"cambio\":" ws ( "false" ws "}}" | "true" ws "," ws "\"orador\":" ws orador ws "," ws "\"oracion\":" ws oracion ws "}}" )
+orador  ::= "\"" char{{1,{_MAX_SPEAKER_CHARS}}} "\""
+oracion ::= "\"" char{{1,{_MAX_SENTENCE_CHARS}}} "\""
+char    ::= [^"\\\x00-\x1f]
+ws      ::= " "?
+"""
+
+# Worst case the grammar allows, at one token per character, so generation
+# always reaches the closing brace.
+_SKELETON = '{ "cambio": true , "orador": "" , "oracion": "" }'
+STRUCTURED_MAX_TOKENS = len(_SKELETON) + _MAX_SPEAKER_CHARS + _MAX_SENTENCE_CHARS
+
+
+def build_structured_prompt(chunk: str) -> str:
+    """Speaker-change detection prompt asking for the JSON of :data:`SPEAKER_GRAMMAR`."""
+    return PROMPT_PREFIX + (
+        f"{chunk}\n\n"
+        "Tus tareas:\n"
+        "- Detecta si se introduce un nuevo orador.\n"
+        "- Si es así, proporciona el nombre completo/título del nuevo orador y las primeras "
+        "palabras, copiadas exactamente, de la oración donde ocurre el cambio.\n\n"
+        "Responde solo con JSON:\n"
+        "{\"cambio\": false}\n"
+        "o\n"
+        "{\"cambio\": true, \"orador\": \"Nombre del Orador\", \"oracion\": \"Primeras palabras\"}[/INST]"
+    )
+
+
+def _strip(chunk: Chunk) -> Chunk:
+    return chunk.strip() if isinstance(chunk, str) else chunk
+
+
+def _split_at(chunk: Chunk, idx: int) -> Tuple[Chunk, Chunk]:
+    if isinstance(chunk, str):
+        return chunk[:idx].strip(), chunk[idx:].strip()
+    return chunk.split_at(idx)
 
 
 class SpeakerDetectorLLM:
-    def __init__(self, model_path: str | Path, n_gpu_layers: int | None = None, n_ctx: int = 4096):
+    def __init__(self, model_path: str | Path, n_gpu_layers: int | None = None, n_ctx: int = 4096,
+                 cache: LLMCache | None = None, n_contexts: int = 1, structured: bool = True,
+                 draft: str | None = None):
         """
         Initialize the speaker detector with a GGUF model.
+
+        The model comes from the shared registry (``get_model``), so a
+        summarizer using the same checkpoint does not load it again.
         
         Args:
             model_path: Path to the .gguf model file
             n_gpu_layers: Number of layers to place on GPU
             n_ctx: Context window size
+            cache: Completion cache (the shared default if None; pass
+                ``LLMCache(enabled=False)`` to opt out)
+            n_contexts: Independent llama contexts (replicas sharing the
+                mmap'ed weights) so that several chunks can be analysed
+                concurrently; CPU threads are split evenly between them
+            structured: Constrain the answer to JSON with a GBNF grammar
+                (never fails to parse, needs far fewer tokens) instead of
+                the free-text ``Nombre|Oración`` format
+            draft: Speculative decoding for this stage's contexts, e.g.
+                ``"prompt-lookup"`` or a small GGUF (see ``load_model``)
         """
-        self.llm = load_model(model_path, n_gpu_layers, n_ctx=n_ctx)
+        n_threads = None
+        if n_contexts > 1:
+            n_threads = max(1, (os.cpu_count() or 1) // n_contexts)
+        self.llms = [
+            get_model(model_path, n_gpu_layers, n_ctx=n_ctx, n_threads=n_threads, replica=i, draft=draft)
+            for i in range(n_contexts)
+        ]
+        self.llm = self.llms[0]
+        self.cache = cache
+        self.structured = structured
+        self._free: queue.Queue = queue.Queue()
+        for llm in self.llms:
+            self._free.put(llm)
 
-    def detect_speaker_and_location(self, chunk: str) -> Tuple[bool, str, str]:
+    def detect_speaker_and_location(self, chunk: str) -> Detection:
         """
         Analyzes a text chunk to detect speaker changes.
         
@@ -24,28 +131,63 @@ class SpeakerDetectorLLM:
         - new_speaker: str or None
         - change_sentence: str or None
         """
-        prompt = (
-            "[INST] <<SYS>>Eres un asistente analizando transcripciones de discursos políticos. "
-            "Responde en el formato exacto especificado.<</SYS>>\n\n"
-            f"Dado el siguiente fragmento de transcripción:\n\n{chunk}\n\n"
-            "Tus tareas:\n"
-            "- Detecta si se introduce un nuevo orador.\n"
-            "- Si es así, proporciona el nombre completo/título del nuevo orador y la oración exacta donde ocurre el cambio.\n"
-            "- Si no, responde \"No speaker change\".\n\n"
-            "Formatea tu respuesta exactamente como:\n"
-            "[Nombre del Orador]|[Oración de Cambio]\n"
-            "o\n"
-            "[No speaker change]|[Oración completa][/INST]"
-        )
-        
-        cleaned = generate_response(self.llm, prompt)
+        with metrics.stage("speakers") as span:
+            llm = self._free.get()  # borrow an idle context
+            try:
+                cleaned = generate_response(llm, self._prompt(chunk), **self._generation_kwargs())
+            finally:
+                self._free.put(llm)
+            span.add(items=1)
 
-        if cleaned.lower() == "no speaker change":
+        return self._parse(cleaned)
+
+    def detect_batch(self, chunks: Sequence[str], backends: Backend | Sequence[Backend] | None = None,
+                     max_workers: int | None = None) -> List[Detection]:
+        """
+        Run :meth:`detect_speaker_and_location` on many chunks concurrently.
+
+        Uses this detector's contexts, one prompt each at a time, unless other
+        *backends* are given, e.g. a ``LlamaServer`` whose parallel slots are
+        decoded as one batch (see ``generate_batch``). Results keep input order.
+        """
+        with metrics.stage("speakers") as span:
+            results = generate_batch(
+                backends if backends is not None else self.llms,
+                [self._prompt(chunk) for chunk in chunks],
+                max_workers=max_workers,
+                **self._generation_kwargs(),
+            )
+            span.add(items=len(results), tokens_in=sum(r.prompt_tokens for r in results),
+                     tokens_out=sum(r.completion_tokens for r in results))
+        return [self._parse(result.text) for result in results]
+
+    def _prompt(self, chunk: str) -> str:
+        return build_structured_prompt(chunk) if self.structured else build_prompt(chunk)
+
+    def _generation_kwargs(self) -> dict:
+        if self.structured:
+            return dict(max_tokens=STRUCTURED_MAX_TOKENS, prompt_version=STRUCTURED_PROMPT_VERSION,
+                        cache=self.cache, prefix=PROMPT_PREFIX, grammar=SPEAKER_GRAMMAR)
+        return dict(prompt_version=PROMPT_VERSION, cache=self.cache, prefix=PROMPT_PREFIX)
+
+    def _parse(self, cleaned: str) -> Detection:
+        if self.structured:
+            try:
+                answer = json.loads(cleaned, strict=False)
+            except json.JSONDecodeError:
+                raise ValueError(f"Unexpected LLM output format: {cleaned}")
+            if not answer.get("cambio"):
+                return False, None, None
+            return True, answer["orador"].strip(), answer["oracion"].strip()
+
+        # The model sometimes echoes the template's brackets or the second field
+        head = cleaned.split("|", 1)[0].strip().strip("[]").strip()
+        if head.lower() == "no speaker change":
             return False, None, None
         else:
             try:
                 speaker, sentence = cleaned.split("|", 1)
-                return True, speaker.strip(), sentence.strip()
+                return True, speaker.strip().strip("[]").strip(), sentence.strip().strip("[]").strip()
             except ValueError:
                 raise ValueError(f"Unexpected LLM output format: {cleaned}")
 
@@ -56,25 +198,33 @@ class SpeakerAwareSplitter:
         """
         self.speaker_detector = speaker_detector
 
-    def split_chunk_on_speaker(self, chunk: str, default_speaker: str) -> List[Tuple[str, str]]:
+    def split_chunk_on_speaker(self, chunk: Chunk, default_speaker: str) -> List[Tuple[str, Chunk]]:
         """
         Splits a single semantic chunk based on speaker change inside it.
-        
+
+        *chunk* may be a plain string or a ``TranscriptView``; views are split
+        into sub-views so every piece keeps its timestamps.
+
         Returns a list of (speaker, text) pairs.
         """
-        speaker_change, new_speaker, change_sentence = self.speaker_detector.detect_speaker_and_location(chunk)
+        detection = self.speaker_detector.detect_speaker_and_location(str(chunk))
+        return self._apply_detection(chunk, detection, default_speaker)
+
+    @staticmethod
+    def _apply_detection(chunk: Chunk, detection: Detection, default_speaker: str) -> List[Tuple[str, Chunk]]:
+        """Split *chunk* according to an already computed *detection*."""
+        speaker_change, new_speaker, change_sentence = detection
 
         if not speaker_change:
-            return [(default_speaker, chunk.strip())]
+            return [(default_speaker, _strip(chunk))]
 
-        idx = chunk.find(change_sentence)
+        idx = str(chunk).find(change_sentence)
 
         if idx == -1:
             # Fallback: assign all chunk to the new speaker
-            return [(new_speaker, chunk.strip())]
+            return [(new_speaker, _strip(chunk))]
         
-        before_text = chunk[:idx].strip()
-        after_text = chunk[idx:].strip()
+        before_text, after_text = _split_at(chunk, idx)
 
         splits = []
         if before_text:
@@ -84,16 +234,35 @@ class SpeakerAwareSplitter:
         
         return splits
 
-    def split_chunks(self, semantic_chunks: List[str], starting_speaker: str = "Maestro de Ceremonias") -> List[Tuple[str, str]]:
+    def split_chunks(self, semantic_chunks: List[Chunk], starting_speaker: str = "Maestro de Ceremonias",
+                     workers: int | None = None) -> List[Tuple[str, Chunk]]:
         """
-        Input: List of semantic chunks (strings).
-        Output: List of (speaker, text) tuples.
+        Input: List of semantic chunks (strings or ``TranscriptView`` s).
+        Output: List of (speaker, text) tuples, text being of the input type.
+
+        The detector never sees the current speaker, so with *workers* > 1
+        (default: one per detector context) all chunks are analysed
+        concurrently and speaker continuity is resolved afterwards in a
+        linear pass. The output is the same as the sequential one.
         """
+        if workers is None:
+            workers = len(getattr(self.speaker_detector, "llms", ()))
+
+        if workers > 1:
+            detections = self.speaker_detector.detect_batch(
+                [str(chunk) for chunk in semantic_chunks], max_workers=workers,
+            )
+        else:
+            detections = None
+
         results = []
         current_speaker = starting_speaker
 
-        for chunk in semantic_chunks:
-            splits = self.split_chunk_on_speaker(chunk, current_speaker)
+        for i, chunk in enumerate(semantic_chunks):
+            if detections is None:
+                splits = self.split_chunk_on_speaker(chunk, current_speaker)
+            else:
+                splits = self._apply_detection(chunk, detections[i], current_speaker)
             results.extend(splits)
             if splits:
                 current_speaker = splits[-1][0]  # Update last known speaker
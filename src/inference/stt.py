@@ -2,45 +2,333 @@ from __future__ import annotations
 
 import argparse
 import os
+import queue
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Tuple, Union
+import threading
 import time
 
-import torch
+import numpy as np
 
-from transformers import (
-    WhisperForConditionalGeneration,
-    WhisperFeatureExtractor,
-    WhisperTokenizer,
-    pipeline
-)
+from .audio import SAMPLE_RATE as _SAMPLE_RATE, decode_audio, decode_audio_timed
+from .metrics import metrics
+from .transcript import Transcript
+from .vad import EnergyVAD, SpeechPlan, plan_clips
+
+if TYPE_CHECKING:
+    from ..models.download_video import AudioSlice, TimeSlice
 
-_DEVICE = "cuda:0" if torch.cuda.is_available() else "cpu"
-_DTYPE = torch.float16 if torch.cuda.is_available() else torch.float32
 _MODEL_ID = "openai/whisper-large-v3-turbo"
+_CT2_MODEL_ID = "large-v3-turbo"
+_LANGUAGE = "spanish"
+
+
+@dataclass(slots=True)
+class Segment:
+    """A piece of transcript with its position in the session, in seconds."""
+    start: float
+    end: float
+    text: str
+
+
+@dataclass(slots=True)
+class FileTranscription:
+    """Transcript of one file plus where the time went."""
+    path: str
+    transcript: Transcript
+    audio_seconds: float = 0.0
+    decode_time: float = 0.0     # seconds spent decoding/resampling (in a worker)
+    inference_time: float = 0.0  # seconds spent in the model
+    skipped: float = 0.0         # fraction of the audio dropped by the VAD
+
+    @property
+    def text(self) -> str:
+        return self.transcript.text
+
+    @property
+    def rtf(self) -> float:
+        """Real-time factor of the model step (< 1 is faster than realtime)."""
+        return self.inference_time / self.audio_seconds if self.audio_seconds else 0.0
+
+
+class WhisperEngine:
+    """Lazily-loaded Whisper ASR pipeline.
+
+    Nothing heavy (``torch``, ``transformers`` or the checkpoint itself) is
+    imported or loaded until the engine is first used, so importing this module
+    is cheap for workers that never transcribe.
+
+    Parameters
+    ----------
+    model_id : str
+        Hugging Face model id (default: ``openai/whisper-large-v3-turbo``).
+    device : str or None
+        Torch device. ``None`` picks ``cuda:0`` when available, else ``cpu``.
+    dtype : str or None
+        Torch dtype name (``"float16"``, ``"float32"``...). ``None`` picks
+        float16 on CUDA and float32 on CPU.
+    chunk_length_s : int
+        Length of the windows the pipeline feeds to the model.
+    stride_length_s : float or tuple or None
+        Overlap between consecutive windows (HF default when ``None``).
+    language : str
+        Decoding language forced on the tokenizer.
+    """
+
+    def __init__(
+        self,
+        model_id: str = _MODEL_ID,
+        *,
+        device: str | None = None,
+        dtype: str | None = None,
+        chunk_length_s: int = 30,
+        stride_length_s: float | Tuple[float, float] | None = None,
+        language: str = _LANGUAGE,
+    ):
+        self.model_id = model_id
+        self.device = device
+        self.dtype = dtype
+        self.chunk_length_s = chunk_length_s
+        self.stride_length_s = stride_length_s
+        self.language = language
+
+        self.load_time: float | None = None  # seconds spent in the cold start
+        self._pipe = None
+        self._generate_kwargs: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._pipe is not None
+
+    @property
+    def pipe(self):
+        """The underlying HF pipeline, loaded on first access."""
+        if self._pipe is None:
+            self.load()
+        return self._pipe
+
+    def load(self) -> "WhisperEngine":
+        """Load the checkpoint and build the pipeline (no-op if already loaded)."""
+        with self._lock:
+            if self._pipe is not None:
+                return self
+
+            start = time.perf_counter()
+
+            import torch
+            from transformers import (
+                WhisperForConditionalGeneration,
+                WhisperFeatureExtractor,
+                WhisperTokenizer,
+                pipeline,
+            )
+
+            device = self.device or ("cuda:0" if torch.cuda.is_available() else "cpu")
+            if self.dtype is not None:
+                dtype = getattr(torch, self.dtype)
+            else:
+                dtype = torch.float16 if device.startswith("cuda") else torch.float32
+
+            feature_extractor = WhisperFeatureExtractor.from_pretrained(self.model_id)
+            tokenizer = WhisperTokenizer.from_pretrained(
+                self.model_id, language=self.language, task="transcribe"
+            )
+            model = WhisperForConditionalGeneration.from_pretrained(self.model_id, torch_dtype=dtype)
+            model.to(device)
+
+            self._generate_kwargs = {
+                "forced_decoder_ids": tokenizer.get_decoder_prompt_ids(
+                    language=self.language, task="transcribe"
+                )
+            }
+
+            pipe_kwargs: Dict[str, Any] = {}
+            if self.stride_length_s is not None:
+                pipe_kwargs["stride_length_s"] = self.stride_length_s
+
+            self._pipe = pipeline(
+                "automatic-speech-recognition",
+                model=model,
+                tokenizer=tokenizer,
+                feature_extractor=feature_extractor,
+                torch_dtype=dtype,
+                device=device,
+                chunk_length_s=self.chunk_length_s,
+                return_timestamps=True,
+                **pipe_kwargs,
+            )
+
+            self.load_time = time.perf_counter() - start
+            metrics.record("stt.load", wall_s=self.load_time)
+            print(f"Whisper engine '{self.model_id}' loaded on {device} in {self.load_time:.1f} s")
+            return self
+
+    def run(self, inputs: Any, **kwargs: Any) -> List[Dict[str, Any]]:
+        """Run the pipeline on *inputs* and always return a list of results."""
+        results = self.pipe(inputs, generate_kwargs=self._generate_kwargs, **kwargs)
+        if isinstance(results, dict):
+            results = [results]
+        return results
+
+
+_LANGUAGE_CODES = {"spanish": "es", "english": "en", "portuguese": "pt", "guarani": "gn"}
 
-_feature_extractor = WhisperFeatureExtractor.from_pretrained(_MODEL_ID)
-_tokenizer = WhisperTokenizer.from_pretrained(_MODEL_ID, language="spanish", task="transcribe")
-_model = WhisperForConditionalGeneration.from_pretrained(_MODEL_ID)
-_forced_decoder_ids = _tokenizer.get_decoder_prompt_ids(language="spanish", task="transcribe")
 
-_model.to(_DEVICE)
+class FasterWhisperEngine:
+    """Lazily-loaded faster-whisper (CTranslate2) engine, int8 on CPU by default.
 
-_pipe = pipeline(
-    "automatic-speech-recognition",
-    model=_model,
-    tokenizer=_tokenizer,
-    feature_extractor=_feature_extractor,
-    torch_dtype=_DTYPE,
-    device=_DEVICE,
-    chunk_length_s=30,
-    return_timestamps=True,
-    #stride_length_s=(4, 2) # No estoy seguro de si este necesito para tener el algoritmo de HF
-)
+    Takes the same inputs as :class:`WhisperEngine` (paths, or
+    ``{"raw", "sampling_rate"}`` dicts at 16 kHz, alone or in lists) and
+    :meth:`run` returns the same ``{"text", "chunks"}`` results, so the two
+    are interchangeable everywhere in this module.
 
+    Parameters
+    ----------
+    model_id : str
+        faster-whisper model size or CTranslate2 repo/path (default: ``large-v3-turbo``).
+    device : str
+        ``"cpu"``, ``"cuda"`` or ``"auto"``.
+    compute_type : str
+        CTranslate2 quantization (``"int8"``, ``"int8_float16"``, ``"float16"``...).
+    cpu_threads : int
+        Intra-op threads (0 lets CTranslate2 decide).
+    beam_size : int
+        Beam width (1 is greedy, as in the HF pipeline).
+    language : str
+        Decoding language, as a name (``"spanish"``) or code (``"es"``).
+    """
 
-def transcribe(paths: List[str] | str) -> List[str]:
-    """Return raw transcripts for *paths* (preserves order)."""
+    def __init__(
+        self,
+        model_id: str = _CT2_MODEL_ID,
+        *,
+        device: str = "cpu",
+        compute_type: str = "int8",
+        cpu_threads: int = 0,
+        beam_size: int = 1,
+        language: str = _LANGUAGE,
+    ):
+        self.model_id = model_id
+        self.device = device
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.beam_size = beam_size
+        self.language = _LANGUAGE_CODES.get(language, language)
+
+        self.load_time: float | None = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        """The underlying ``faster_whisper.WhisperModel``, loaded on first access."""
+        if self._model is None:
+            self.load()
+        return self._model
+
+    def load(self) -> "FasterWhisperEngine":
+        """Load (and convert, on first download) the checkpoint; no-op if already loaded."""
+        with self._lock:
+            if self._model is not None:
+                return self
+
+            start = time.perf_counter()
+            from faster_whisper import WhisperModel
+
+            self._model = WhisperModel(
+                self.model_id,
+                device=self.device,
+                compute_type=self.compute_type,
+                cpu_threads=self.cpu_threads,
+            )
+            self.load_time = time.perf_counter() - start
+            metrics.record("stt.load", wall_s=self.load_time)
+            print(f"faster-whisper engine '{self.model_id}' ({self.compute_type}) loaded on "
+                  f"{self.device} in {self.load_time:.1f} s")
+            return self
+
+    def run(self, inputs: Any, *, batch_size: int = 1, return_timestamps: Any = True,
+            **kwargs: Any) -> List[Dict[str, Any]]:
+        """Transcribe *inputs* and return HF-pipeline-shaped results.
+
+        *batch_size* is accepted for compatibility; CTranslate2 already uses
+        every thread on one input.
+        """
+        if not isinstance(inputs, list):
+            inputs = [inputs]
+        words = return_timestamps == "word"
+
+        results = []
+        for item in inputs:
+            if isinstance(item, dict):
+                if item["sampling_rate"] != _SAMPLE_RATE:
+                    raise ValueError(f"faster-whisper expects {_SAMPLE_RATE} Hz audio")
+                audio = np.asarray(item["raw"], dtype=np.float32)
+            else:
+                audio = os.fspath(item)
+            segments, _ = self.model.transcribe(
+                audio,
+                language=self.language,
+                beam_size=self.beam_size,
+                word_timestamps=words,
+                **kwargs,
+            )
+            chunks = []
+            for seg in segments:
+                if words:
+                    chunks.extend({"text": w.word, "timestamp": (w.start, w.end)} for w in seg.words)
+                else:
+                    chunks.append({"text": seg.text, "timestamp": (seg.start, seg.end)})
+            text = " ".join(c["text"].strip() for c in chunks)
+            results.append({"text": text, "chunks": chunks})
+        return results
+
+
+SpeechEngine = Union[WhisperEngine, FasterWhisperEngine]
+
+# name -> (engine class, default model id)
+_BACKENDS: Dict[str, Tuple[type, str]] = {
+    "hf": (WhisperEngine, _MODEL_ID),
+    "ct2": (FasterWhisperEngine, _CT2_MODEL_ID),
+}
+_BACKENDS["transformers"] = _BACKENDS["hf"]
+_BACKENDS["faster-whisper"] = _BACKENDS["ct2"]
+
+_ENGINES: Dict[tuple, SpeechEngine] = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def get_engine(model_id: str | None = None, *, backend: str | None = None, **config: Any) -> SpeechEngine:
+    """Return the process-wide engine for this backend and configuration.
+
+    *backend* is ``"hf"`` (transformers pipeline) or ``"ct2"`` (faster-whisper,
+    int8 on CPU); it defaults to the ``STT_BACKEND`` environment variable,
+    then ``"hf"``. Engines are created lazily and cached, so every caller
+    asking for the same configuration shares one loaded model.
+    """
+    backend = (backend or os.getenv("STT_BACKEND") or "hf").lower()
+    if backend not in _BACKENDS:
+        raise ValueError(f"unknown STT backend {backend!r} (choose from {', '.join(_BACKENDS)})")
+    cls, default_model = _BACKENDS[backend]
+    model_id = model_id or default_model
+
+    key = (cls.__name__, model_id, tuple(sorted(config.items())))
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(key)
+        if engine is None:
+            engine = _ENGINES[key] = cls(model_id, **config)
+    return engine
+
+
+def _check_paths(paths: List[str] | str) -> List[str]:
     if isinstance(paths, (str, Path)):
         paths = [str(paths)]
 
@@ -50,36 +338,497 @@ def transcribe(paths: List[str] | str) -> List[str]:
         if not os.path.exists(p):
             raise FileNotFoundError(p)
         abs_paths.append(p)
-    
+    return abs_paths
+
+
+def transcribe(paths: List[str] | str, engine: SpeechEngine | None = None,
+               vad: EnergyVAD | None = None) -> Tuple[List[str], float]:
+    """Return raw transcripts for *paths* (preserves order) and the inference time in seconds.
+
+    With a *vad*, only the detected speech is transcribed (see :func:`transcribe_batch`).
+    """
+    abs_paths = _check_paths(paths)
+    if vad is not None:
+        results = transcribe_batch(abs_paths, engine, vad=vad)
+        return [r.text for r in results], sum(r.inference_time for r in results)
+
+    engine = engine or get_engine()
+    engine.load()  # keep the cold start out of the inference time
+
     # Start the timer
     start_time = time.time()
 
-    results = _pipe(abs_paths, generate_kwargs={"forced_decoder_ids": _forced_decoder_ids})
+    with metrics.stage("stt") as span:
+        results = engine.run(abs_paths)
+        span.add(items=len(results))
 
     # Calculate inference time
     inference_time = time.time() - start_time
-    
-    if isinstance(results, dict):
-        results = [results]
 
     transcriptions = [r["text"] for r in results]
 
     return transcriptions, inference_time
 
+
+_DONE = object()
+
+
+def _decode_speech(path: str, sample_rate: int, vad: EnergyVAD) -> Tuple[str, SpeechPlan, float]:
+    """Decode *path* and pack its speech into clips; picklable for process pools."""
+    start = time.perf_counter()
+    audio = decode_audio(path, sample_rate)
+    plan = plan_clips(audio, vad.regions(audio), sample_rate)
+    return path, plan, time.perf_counter() - start
+
+
+def transcribe_batch(
+    paths: List[str] | str,
+    engine: SpeechEngine | None = None,
+    *,
+    batch_size: int = 8,
+    workers: int | None = None,
+    queue_size: int = 4,
+    word_timestamps: bool = False,
+    vad: EnergyVAD | None = None,
+) -> List[FileTranscription]:
+    """Transcribe many files, overlapping CPU decoding with model compute.
+
+    Files are decoded and resampled to 16 kHz in a process pool. Decoded audio
+    waits in a queue of *queue_size* files, so at most ``queue_size + workers``
+    decoded files (queued or just finished in the pool) are held besides the
+    ones being transcribed, however long the backlog is. The model decodes
+    30 s windows in batches of *batch_size*; short files already waiting in
+    the queue are transcribed together while their windows fit in one batch,
+    instead of each filling a batch of its own. Files transcribed together
+    share the inference time of their batch in proportion to their audio.
+
+    With a *vad*, the decoder processes also detect speech and pack it into
+    clips of at most 30 s; only those clips reach the model, and their
+    timestamps are mapped back to the original file.
+
+    Parameters
+    ----------
+    paths : list of str or str
+        Audio/video files to transcribe.
+    engine : WhisperEngine, FasterWhisperEngine or None
+        Engine to use (the shared default engine if None).
+    batch_size : int
+        Number of 30 s windows per forward pass.
+    workers : int or None
+        Decoder processes (``os.cpu_count()`` if None).
+    queue_size : int
+        Maximum number of decoded files waiting for the model.
+    word_timestamps : bool
+        Time-stamp every word instead of every Whisper segment.
+    vad : EnergyVAD or None
+        Voice activity detector used to skip silence (no skipping if None).
+
+    Returns
+    -------
+    List[FileTranscription]
+        One result per path, in input order.
+    """
+    abs_paths = _check_paths(paths)
+    engine = engine or get_engine()
+    engine.load()
+
+    decoded: queue.Queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    workers = workers or os.cpu_count() or 1
+
+    def _put(item: Any) -> bool:
+        """Queue *item* unless the consumer is gone (False then)."""
+        while not stop.is_set():
+            try:
+                decoded.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _feed() -> None:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        try:
+            in_flight: deque = deque()
+            for p in abs_paths:
+                if vad is None:
+                    in_flight.append(pool.submit(decode_audio_timed, p, _SAMPLE_RATE))
+                else:
+                    in_flight.append(pool.submit(_decode_speech, p, _SAMPLE_RATE, vad))
+                if len(in_flight) >= workers and not _put(in_flight.popleft().result()):
+                    return
+            while in_flight:
+                if not _put(in_flight.popleft().result()):
+                    return
+        except BaseException as exc:  # surfaced in the consumer
+            _put(exc)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            _put(_DONE)
+
+    feeder = threading.Thread(target=_feed, name="stt-decode", daemon=True)
+    feeder.start()
+    try:
+        return _consume(decoded, engine, batch_size, word_timestamps)
+    finally:
+        # the consumer may have failed: unblock the feeder, drop what it decoded, stop the pool
+        stop.set()
+        while True:
+            try:
+                decoded.get_nowait()
+            except queue.Empty:
+                break
+        feeder.join()
+
+
+def _consume(decoded: queue.Queue, engine: SpeechEngine, batch_size: int,
+             word_timestamps: bool) -> List[FileTranscription]:
+    """Transcribe the files the decoder thread of :func:`transcribe_batch` queues, until it is done."""
+    results: List[FileTranscription] = []
+    return_timestamps = "word" if word_timestamps else True
+    item = None  # next file, taken from the queue but not transcribed yet
+    while True:
+        if item is None:
+            item = decoded.get()
+        if item is _DONE:
+            break
+        if isinstance(item, BaseException):
+            raise item
+
+        # add files that are already waiting while their windows fit in one batch
+        group = [item]
+        windows = _windows(item[1])
+        item = None
+        while windows < batch_size:
+            try:
+                item = decoded.get_nowait()
+            except queue.Empty:
+                break
+            if item is _DONE or isinstance(item, BaseException) or windows + _windows(item[1]) > batch_size:
+                break
+            group.append(item)
+            windows += _windows(item[1])
+            item = None
+
+        inputs = [_inputs(audio) for _, audio, _ in group]
+        start = time.perf_counter()
+        outputs = engine.run(
+            [x for file_inputs in inputs for x in file_inputs],
+            batch_size=batch_size,
+            return_timestamps=return_timestamps,
+        ) if any(inputs) else []
+        group_time = time.perf_counter() - start
+        sent = [sum(x["raw"].size for x in file_inputs) for file_inputs in inputs]
+
+        pos = 0
+        for (path, audio, decode_time), file_inputs, file_sent in zip(group, inputs, sent):
+            file_outputs = outputs[pos:pos + len(file_inputs)]
+            pos += len(file_inputs)
+            if isinstance(audio, SpeechPlan):
+                audio_seconds, skipped = audio.audio_seconds, audio.skipped
+                segments = _clip_segments(audio, file_outputs)
+            else:
+                audio_seconds, skipped = audio.size / _SAMPLE_RATE, 0.0
+                segments = _segments_from_result(file_outputs[0], 0.0, audio_seconds)
+            inference_time = group_time * file_sent / sum(sent) if sum(sent) else 0.0
+            metrics.record("stt.decode", wall_s=decode_time, items=1, audio_s=audio_seconds)
+            metrics.record("stt", wall_s=inference_time, items=1, audio_s=audio_seconds)
+
+            results.append(FileTranscription(
+                path=path,
+                transcript=Transcript.from_segments(segments),
+                audio_seconds=audio_seconds,
+                decode_time=decode_time,
+                inference_time=inference_time,
+                skipped=skipped,
+            ))
+            print(f"{Path(path).name}: {audio_seconds:.0f} s audio ({skipped:.0%} skipped), "
+                  f"decode {decode_time:.1f} s, inference {inference_time:.1f} s (RTF {results[-1].rtf:.2f})")
+    return results
+
+
+def _windows(audio: np.ndarray | SpeechPlan) -> int:
+    """Whisper windows (30 s) needed for one decoded file."""
+    if isinstance(audio, SpeechPlan):
+        return len(audio.clips)
+    return max(1, -(-audio.size // (30 * _SAMPLE_RATE)))
+
+
+def _inputs(audio: np.ndarray | SpeechPlan) -> List[Dict[str, Any]]:
+    """Engine inputs for one decoded file: the whole audio, or each speech clip."""
+    if isinstance(audio, SpeechPlan):
+        return [{"raw": clip.audio, "sampling_rate": _SAMPLE_RATE} for clip in audio.clips]
+    return [{"raw": audio, "sampling_rate": _SAMPLE_RATE}]
+
+
+def _transcribe_clips(engine: SpeechEngine, plan: SpeechPlan, batch_size: int,
+                      return_timestamps: Any) -> List[Segment]:
+    """Transcribe the speech clips of *plan* in batches, in source time."""
+    if not plan.clips:
+        return []
+    outputs = engine.run(_inputs(plan), batch_size=batch_size, return_timestamps=return_timestamps)
+    return _clip_segments(plan, outputs)
+
+
+def _clip_segments(plan: SpeechPlan, outputs: List[Dict[str, Any]]) -> List[Segment]:
+    """Segments of the transcribed speech clips of *plan*, in source time."""
+    segments = []
+    for clip, result in zip(plan.clips, outputs):
+        for seg in _segments_from_result(result, 0.0, clip.audio.size / _SAMPLE_RATE):
+            segments.append(Segment(clip.to_source(seg.start), clip.to_source(seg.end, end=True), seg.text))
+    return segments
+
+
+def _segments_from_result(result: Dict[str, Any], offset: float, duration: float) -> List[Segment]:
+    """Turn one pipeline result into :class:`Segment` s shifted by *offset*."""
+    segments = []
+    for chunk in result.get("chunks", []):
+        text = chunk["text"].strip()
+        if not text:
+            continue
+        start, end = chunk["timestamp"]
+        start = 0.0 if start is None else float(start)
+        end = duration if end is None else float(end)
+        segments.append(Segment(offset + start, offset + end, text))
+    return segments
+
+
+def transcribe_stream(
+    pcm_blocks: Iterable[bytes],
+    engine: SpeechEngine | None = None,
+    *,
+    sample_rate: int = _SAMPLE_RATE,
+    window_s: float = 30.0,
+    overlap_s: float = 5.0,
+    word_timestamps: bool = False,
+    start_s: float = 0.0,
+) -> Iterator[Segment]:
+    """Incrementally transcribe a stream of raw s16le mono PCM blocks.
+
+    Audio is accumulated into a single fixed-size window. Each time the window
+    is full it is transcribed, the segments that finished before the last
+    *overlap_s* seconds are yielded, and the window slides forward to the end
+    of the last yielded segment so that words cut at the edge are decoded again
+    with full context. Latency is therefore bounded by *window_s* and memory by
+    one window, whatever the length of the session.
+
+    Parameters
+    ----------
+    pcm_blocks : Iterable[bytes]
+        Raw PCM as produced by ``src.models.download_video.stream_audio``.
+    engine : WhisperEngine, FasterWhisperEngine or None
+        Engine to use (the shared default engine if None).
+    sample_rate : int
+        Sample rate of *pcm_blocks*.
+    window_s : float
+        Size of the window handed to Whisper (at most its 30 s context).
+    overlap_s : float
+        Tail of each window that is re-decoded with the next one.
+    word_timestamps : bool
+        Yield one segment per word instead of one per Whisper segment.
+    start_s : float
+        Session time of the first block (when resuming part-way through).
+
+    Yields
+    ------
+    Segment
+        Transcript segments with session-relative timestamps, in order.
+    """
+    if not 0 <= overlap_s < window_s / 2:
+        raise ValueError("overlap_s must be in [0, window_s / 2)")
+
+    engine = engine or get_engine()
+    window = int(window_s * sample_rate)
+    buffer = np.zeros(window, dtype=np.float32)
+    filled = 0
+    offset = start_s  # session time of buffer[0]
+    pending = b""
+
+    def _decode(n: int, final: bool) -> List[Segment]:
+        duration = n / sample_rate
+        with metrics.stage("stt") as span:  # overlapping audio is counted in every window
+            result = engine.run(
+                {"raw": buffer[:n].copy(), "sampling_rate": sample_rate},
+                return_timestamps="word" if word_timestamps else True,
+            )[0]
+            span.add(items=1, audio_s=duration)
+        segments = _segments_from_result(result, 0.0, duration)
+        if final:
+            return segments
+        horizon = duration - overlap_s
+        done = [seg for seg in segments if seg.end <= horizon]
+        if done and done[-1].end >= duration / 2:
+            return done
+        # Nothing finished early enough: commit what started before the overlap
+        return [seg for seg in segments if seg.start < horizon]
+
+    for block in pcm_blocks:
+        data = pending + block
+        usable = len(data) - len(data) % 2
+        pending = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype="<i2")
+
+        while samples.size:
+            take = min(window - filled, samples.size)
+            buffer[filled:filled + take] = samples[:take] / 32768.0
+            filled += take
+            samples = samples[take:]
+            if filled < window:
+                break
+
+            segments = _decode(filled, final=False)
+            horizon = window_s - overlap_s
+            # slide to the end of the last committed segment, even past the
+            # horizon, so that a word is never split between two windows
+            if segments and segments[-1].end >= window_s / 2:
+                cut = min(segments[-1].end, window_s)
+            else:
+                cut = horizon
+            for seg in segments:
+                yield Segment(offset + seg.start, offset + min(seg.end, cut), seg.text)
+
+            cut_samples = round(cut * sample_rate)
+            buffer[:filled - cut_samples] = buffer[cut_samples:filled]
+            filled -= cut_samples
+            offset += cut_samples / sample_rate
+
+    if filled > sample_rate // 10:  # ignore sub-100 ms tails
+        for seg in _decode(filled, final=True):
+            yield Segment(offset + seg.start, offset + seg.end, seg.text)
+
+
+def transcribe_slices(
+    slices: Iterable["AudioSlice"],
+    engine: SpeechEngine | None = None,
+    *,
+    batch_size: int = 8,
+    word_timestamps: bool = False,
+    vad: EnergyVAD | None = None,
+) -> Iterator[Segment]:
+    """Transcribe overlapping session slices and stitch them into one timeline.
+
+    *slices* usually come from ``src.models.download_video.iter_slices`` and
+    may arrive in any order; each one is transcribed as soon as it arrives
+    and its segments are shifted to session time. Every instant of the
+    session is taken from exactly one slice: a slice keeps the segments that
+    start before the end of its keep range (a segment straddling the
+    boundary is kept whole), and the next slice only contributes what ends
+    after both its own keep start and the text already kept, clipped to
+    start where that text ends. Segments are yielded in session order as
+    soon as every earlier slice is done.
+
+    Parameters
+    ----------
+    slices : Iterable[AudioSlice]
+        Decoded slices with their time ranges.
+    engine : WhisperEngine, FasterWhisperEngine or None
+        Engine to use (the shared default engine if None).
+    batch_size : int
+        Number of 30 s windows per forward pass.
+    word_timestamps : bool
+        Time-stamp every word instead of every Whisper segment.
+    vad : EnergyVAD or None
+        Voice activity detector used to skip silence (no skipping if None).
+
+    Yields
+    ------
+    Segment
+        Transcript segments with session-relative timestamps, in order.
+    """
+    engine = engine or get_engine()
+    engine.load()
+    return_timestamps = "word" if word_timestamps else True
+
+    waiting: Dict[int, List[Segment]] = {}
+    spans: Dict[int, "TimeSlice"] = {}
+    expected = 0
+    last_end = 0.0
+    for item in slices:
+        span, audio = item.span, item.audio
+        spans[span.index] = span
+        duration = audio.size / item.sample_rate
+        metrics.record("stt.fetch", wall_s=item.fetch_time, items=1, audio_s=duration)
+
+        start = time.perf_counter()
+        with metrics.stage("stt") as stage:
+            if vad is None:
+                result = engine.run({"raw": audio, "sampling_rate": item.sample_rate},
+                                    batch_size=batch_size, return_timestamps=return_timestamps)[0]
+                segments = _segments_from_result(result, 0.0, duration)
+            else:
+                plan = plan_clips(audio, vad.regions(audio), item.sample_rate)
+                segments = _transcribe_clips(engine, plan, batch_size, return_timestamps)
+            stage.add(items=1, audio_s=duration)
+        print(f"slice {span.index}: {span.start:.0f}-{span.end:.0f} s, fetch {item.fetch_time:.1f} s, "
+              f"inference {time.perf_counter() - start:.1f} s")
+
+        waiting[span.index] = [
+            Segment(span.start + seg.start, span.start + seg.end, seg.text) for seg in segments
+            if span.start + seg.start < span.keep_end
+        ]
+        while expected in waiting:
+            floor = max(spans[expected].keep_start, last_end)
+            for seg in waiting.pop(expected):
+                if seg.end <= floor:
+                    continue  # covered by the previous slice
+                seg.start = max(seg.start, last_end)
+                last_end = seg.end
+                yield seg
+            expected += 1
+
+
 def _main() -> None:
     parser = argparse.ArgumentParser(
         description="Whisper v3‑turbo transcriber.",
     )
-    parser.add_argument("audios", nargs="+", help="Audio file paths")
+    parser.add_argument("audios", nargs="+", help="Audio file paths (or recorded video URLs with --segmented)")
+    parser.add_argument("--backend", choices=sorted(_BACKENDS), default=None,
+                        help="STT backend (default: $STT_BACKEND or hf)")
+    parser.add_argument("--batch-size", type=int, default=8, help="30 s windows per forward pass")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Decoder processes, or concurrent slice fetches with --segmented (default: all cores)")
+    parser.add_argument("--queue-size", type=int, default=4, help="Decoded files buffered ahead of the model")
+    parser.add_argument("--words", action="store_true", help="Word-level timestamps")
+    parser.add_argument("--vad", action="store_true", help="Skip silence before transcribing")
+    parser.add_argument("--segmented", action="store_true",
+                        help="Fetch each input as overlapping time slices in parallel (files or URLs)")
+    parser.add_argument("--slice-sec", type=float, default=600.0, help="Slice length with --segmented")
+    parser.add_argument("--overlap-sec", type=float, default=10.0, help="Slice overlap with --segmented")
     args = parser.parse_args()
 
-    textos = transcribe(args.audios)
-    for path, txt in zip(args.audios, textos):
-        name = Path(path).stem
+    if args.segmented:
+        from ..models.download_video import iter_slices
+
+        engine = get_engine(backend=args.backend)
+        for source in args.audios:
+            start = time.perf_counter()
+            slices = iter_slices(source, slice_sec=args.slice_sec, overlap_sec=args.overlap_sec,
+                                 workers=args.workers or os.cpu_count() or 1)
+            segments = list(transcribe_slices(slices, engine, batch_size=args.batch_size,
+                                              word_timestamps=args.words, vad=EnergyVAD() if args.vad else None))
+            print(f"===== {Path(source).stem or source} =====")
+            print(Transcript.from_segments(segments).text)
+            print(f"({segments[-1].end if segments else 0:.0f} s transcribed in {time.perf_counter() - start:.1f} s)")
+            print()
+        return
+
+    results = transcribe_batch(
+        args.audios,
+        get_engine(backend=args.backend),
+        batch_size=args.batch_size,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        word_timestamps=args.words,
+        vad=EnergyVAD() if args.vad else None,
+    )
+    for res in results:
+        name = Path(res.path).stem
         print(f"===== {name} =====")
-        print(txt)
+        print(res.text)
+        print(f"({res.audio_seconds:.0f} s audio · {res.skipped:.0%} skipped · decode {res.decode_time:.1f} s · "
+              f"inference {res.inference_time:.1f} s · RTF {res.rtf:.2f})")
         print()
 
 
-if __name__ == "__main__":  
-    _main()
\ No newline at end of file
+if __name__ == "__main__":
+    _main()
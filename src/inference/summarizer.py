@@ -1,21 +1,61 @@
 from __future__ import annotations
 
 import time
-from typing import Tuple
+from typing import List, Sequence, Tuple
 from llama_cpp import Llama
-from .llm_utils import generate_response
-
-def summarise(llm: Llama, text: str, *, max_tokens: int = 256) -> Tuple[str, float]:
-    """Summarise *text* and return *(summary, elapsed_ms)*."""
-    prompt = (
-        "[INST] <<SYS>>Responde **EXCLUSIVAMENTE** en español. "
-        "No utilices ningún otro idioma.<</SYS>>\n\n"
-        f"Texto original:\n{text}\n\n"
+from .llm_cache import LLMCache
+from .llm_utils import Backend, generate_batch, generate_response
+from .metrics import metrics
+from .transcript import TranscriptView
+
+# Bump whenever build_prompt changes so cached summaries are not reused.
+PROMPT_VERSION = "summary-v1"
+
+# Constant head of the prompt; its KV state is evaluated once and reused.
+PROMPT_PREFIX = (
+    "[INST] <<SYS>>Responde **EXCLUSIVAMENTE** en español. "
+    "No utilices ningún otro idioma.<</SYS>>\n\n"
+    "Texto original:\n"
+)
+
+def build_prompt(text: str) -> str:
+    """Summarisation prompt for *text*."""
+    return PROMPT_PREFIX + (
+        f"{text}\n\n"
         "Devuelve un resumen gramaticalmente correcto, coherente y de máximo 3 frases, "
         "mencionando al inicio quién es el autor.[/INST]"
     )
 
+def summarise(llm: Llama, text: str | TranscriptView, *, max_tokens: int = 256,
+              cache: LLMCache | None = None) -> Tuple[str, float]:
+    """Summarise *text* (a string or a transcript view) and return *(summary, elapsed_ms)*.
+
+    Summaries are served from *cache* when available (see ``generate_response``).
+    """
+    prompt = build_prompt(text)
+
     start = time.perf_counter()
-    summary = generate_response(llm, prompt, max_tokens)
+    with metrics.stage("summarise") as span:
+        summary = generate_response(llm, prompt, max_tokens, prompt_version=PROMPT_VERSION, cache=cache,
+                                    prefix=PROMPT_PREFIX)
+        span.add(items=1)
     dur_ms = (time.perf_counter() - start) * 1000
     return summary, dur_ms
+
+def summarise_batch(backends: Backend | Sequence[Backend], texts: Sequence[str | TranscriptView], *,
+                    max_tokens: int = 256, cache: LLMCache | None = None,
+                    max_workers: int | None = None) -> List[Tuple[str, float]]:
+    """Summarise many texts concurrently (see ``generate_batch``); returns *(summary, elapsed_ms)* per text, in order."""
+    with metrics.stage("summarise") as span:
+        results = generate_batch(
+            backends,
+            [build_prompt(text) for text in texts],
+            max_tokens,
+            max_workers=max_workers,
+            prompt_version=PROMPT_VERSION,
+            cache=cache,
+            prefix=PROMPT_PREFIX,
+        )
+        span.add(items=len(results), tokens_in=sum(r.prompt_tokens for r in results),
+                 tokens_out=sum(r.completion_tokens for r in results))
+    return [(result.text, result.latency_s * 1000) for result in results]
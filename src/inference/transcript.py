@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import re
+from typing import Iterable, Iterator, Tuple
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\S+")
+
+
+def format_timestamp(seconds: float) -> str:
+    """Format *seconds* as ``HH:MM:SS`` (``--:--:--`` when unknown)."""
+    if seconds is None or np.isnan(seconds):
+        return "--:--:--"
+    total = int(seconds)
+    return f"{total // 3600:02d}:{total % 3600 // 60:02d}:{total % 60:02d}"
+
+
+class Transcript:
+    """Compact, array-backed transcript.
+
+    The whole session is stored as one string plus four parallel arrays with,
+    for every unit (a word, or a Whisper segment when word timestamps are not
+    available), its character span in ``text`` and its start/end time in
+    seconds. Downstream stages work on :class:`TranscriptView` slices of it,
+    which only hold two integers, instead of copying substrings around.
+    """
+
+    __slots__ = ("text", "char_start", "char_end", "start", "end")
+
+    def __init__(self, text: str, char_start: np.ndarray, char_end: np.ndarray,
+                 start: np.ndarray, end: np.ndarray):
+        self.text = text
+        self.char_start = np.asarray(char_start, dtype=np.int32)
+        self.char_end = np.asarray(char_end, dtype=np.int32)
+        self.start = np.asarray(start, dtype=np.float32)
+        self.end = np.asarray(end, dtype=np.float32)
+
+    @classmethod
+    def from_units(cls, units: Iterable[Tuple[str, float, float]]) -> "Transcript":
+        """Build a transcript from ``(text, start, end)`` units (words or segments)."""
+        pieces: list[str] = []
+        char_start: list[int] = []
+        char_end: list[int] = []
+        start: list[float] = []
+        end: list[float] = []
+        pos = 0
+        for text, t0, t1 in units:
+            text = text.strip()
+            if not text:
+                continue
+            if pieces:
+                pos += 1  # joining space
+            pieces.append(text)
+            char_start.append(pos)
+            pos += len(text)
+            char_end.append(pos)
+            start.append(t0)
+            end.append(t1)
+        return cls(" ".join(pieces), char_start, char_end, start, end)
+
+    @classmethod
+    def from_segments(cls, segments: Iterable) -> "Transcript":
+        """Build a transcript from :class:`~src.inference.stt.Segment` records."""
+        return cls.from_units((seg.text, seg.start, seg.end) for seg in segments)
+
+    @classmethod
+    def from_text(cls, text: str) -> "Transcript":
+        """Wrap plain text (one unit per word, unknown times)."""
+        spans = [(m.start(), m.end()) for m in _WORD_RE.finditer(text)]
+        n = len(spans)
+        offsets = np.array(spans, dtype=np.int32).reshape(n, 2)
+        nan = np.full(n, np.nan, dtype=np.float32)
+        return cls(text, offsets[:, 0], offsets[:, 1], nan, nan.copy())
+
+    def __len__(self) -> int:
+        return len(self.char_start)
+
+    def __str__(self) -> str:
+        return self.text
+
+    def view(self, lo: int = 0, hi: int | None = None) -> "TranscriptView":
+        """Return a view over units ``[lo, hi)``."""
+        return TranscriptView(self, lo, len(self) if hi is None else hi)
+
+    def units_in(self, char_lo: int, char_hi: int) -> Tuple[int, int]:
+        """Return the unit range ``[lo, hi)`` overlapping characters ``[char_lo, char_hi)``."""
+        lo = int(np.searchsorted(self.char_end, char_lo, side="right"))
+        hi = int(np.searchsorted(self.char_start, char_hi, side="left"))
+        return lo, max(lo, hi)
+
+
+class TranscriptView:
+    """A contiguous run of units of a :class:`Transcript`.
+
+    Cheap to create and slice; the text is only materialised when asked for.
+    """
+
+    __slots__ = ("transcript", "lo", "hi")
+
+    def __init__(self, transcript: Transcript, lo: int, hi: int):
+        self.transcript = transcript
+        self.lo = lo
+        self.hi = hi
+
+    def __len__(self) -> int:
+        return self.hi - self.lo
+
+    def __bool__(self) -> bool:
+        return self.hi > self.lo
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"TranscriptView([{self.lo}:{self.hi}], {format_timestamp(self.start)}-{format_timestamp(self.end)})"
+
+    @property
+    def char_span(self) -> Tuple[int, int]:
+        if not self:
+            return 0, 0
+        t = self.transcript
+        return int(t.char_start[self.lo]), int(t.char_end[self.hi - 1])
+
+    @property
+    def text(self) -> str:
+        lo, hi = self.char_span
+        return self.transcript.text[lo:hi]
+
+    @property
+    def start(self) -> float:
+        return float(self.transcript.start[self.lo]) if self else float("nan")
+
+    @property
+    def end(self) -> float:
+        return float(self.transcript.end[self.hi - 1]) if self else float("nan")
+
+    @property
+    def timestamp(self) -> str:
+        """Start of the view as ``HH:MM:SS``."""
+        return format_timestamp(self.start)
+
+    def view(self, lo: int = 0, hi: int | None = None) -> "TranscriptView":
+        """Sub-view over units ``[lo, hi)`` relative to this view."""
+        hi = len(self) if hi is None else min(hi, len(self))
+        return TranscriptView(self.transcript, self.lo + lo, self.lo + max(lo, hi))
+
+    def span(self, char_lo: int, char_hi: int) -> "TranscriptView":
+        """Sub-view covering characters ``[char_lo, char_hi)`` of :attr:`text`."""
+        base = self.char_span[0]
+        lo, hi = self.transcript.units_in(base + char_lo, base + char_hi)
+        lo, hi = max(lo, self.lo), min(hi, self.hi)
+        return TranscriptView(self.transcript, lo, max(lo, hi))
+
+    def split_at(self, char_idx: int) -> Tuple["TranscriptView", "TranscriptView"]:
+        """Split before the unit containing character *char_idx* of :attr:`text`."""
+        base = self.char_span[0]
+        cut = int(np.searchsorted(self.transcript.char_end, base + char_idx, side="right"))
+        cut = min(max(cut, self.lo), self.hi)
+        return TranscriptView(self.transcript, self.lo, cut), TranscriptView(self.transcript, cut, self.hi)
+
+    def units(self) -> Iterator[Tuple[str, float, float]]:
+        """Iterate over ``(text, start, end)`` of each unit."""
+        t = self.transcript
+        for i in range(self.lo, self.hi):
+            yield t.text[t.char_start[i]:t.char_end[i]], float(t.start[i]), float(t.end[i])
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+from .audio import SAMPLE_RATE
+
+
+class EnergyVAD:
+    """Frame-energy voice activity detector with an adaptive threshold.
+
+    A frame is speech when it is *margin_db* above the noise floor (the
+    10th percentile of frame energies) and above *min_db* dBFS. Short pauses
+    are bridged and short blips dropped before the regions are padded.
+
+    Any object with the same ``regions(audio)`` method (a WebRTC or ONNX
+    detector, say) can be used in its place.
+
+    Parameters
+    ----------
+    sample_rate : int
+        Sample rate of the audio.
+    frame_s : float
+        Analysis frame length.
+    margin_db : float
+        Height above the noise floor that counts as speech.
+    min_db : float
+        Absolute floor in dBFS, so digital silence never passes as speech.
+    min_speech_s : float
+        Speech runs shorter than this are dropped.
+    min_silence_s : float
+        Pauses shorter than this are kept as speech.
+    pad_s : float
+        Context kept on both sides of every region.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, *, frame_s: float = 0.03,
+                 margin_db: float = 12.0, min_db: float = -50.0, min_speech_s: float = 0.25,
+                 min_silence_s: float = 0.8, pad_s: float = 0.2):
+        self.sample_rate = sample_rate
+        self.frame = int(frame_s * sample_rate)
+        self.margin_db = margin_db
+        self.min_db = min_db
+        self.min_speech_s = min_speech_s
+        self.min_silence_s = min_silence_s
+        self.pad_s = pad_s
+
+    def frame_db(self, audio: np.ndarray) -> np.ndarray:
+        """Energy of every full frame, in dBFS."""
+        n = audio.size // self.frame
+        frames = audio[:n * self.frame].reshape(n, self.frame)
+        return 10 * np.log10(np.mean(frames ** 2, axis=1, dtype=np.float64) + 1e-12)
+
+    def regions(self, audio: np.ndarray) -> np.ndarray:
+        """Speech regions as an ``(n, 2)`` array of ``[start, end)`` sample offsets."""
+        db = self.frame_db(audio)
+        if db.size == 0:
+            return np.empty((0, 2), dtype=np.int64)
+        threshold = max(np.percentile(db, 10) + self.margin_db, self.min_db)
+        runs = _runs(db > threshold)
+
+        frame_s = self.frame / self.sample_rate
+        if len(runs):
+            # bridge short pauses, then drop short blips
+            gaps = runs[1:, 0] - runs[:-1, 1]
+            first = np.flatnonzero(np.concatenate([[True], gaps * frame_s >= self.min_silence_s]))
+            last = np.concatenate([first[1:] - 1, [len(runs) - 1]])
+            runs = np.stack([runs[first, 0], runs[last, 1]], axis=1)
+            runs = runs[(runs[:, 1] - runs[:, 0]) * frame_s >= self.min_speech_s]
+
+        pad = int(self.pad_s * self.sample_rate)
+        spans = runs * self.frame
+        spans[:, 0] = np.maximum(spans[:, 0] - pad, 0)
+        spans[:, 1] = np.minimum(spans[:, 1] + pad, audio.size)
+        return _merge_overlaps(spans)
+
+
+@dataclass(slots=True)
+class SpeechClip:
+    """Speech regions packed back to back, with a map to source times.
+
+    Piece ``i`` of the clip starts at ``clip_start[i]`` seconds in
+    :attr:`audio` and at ``source_start[i]`` seconds in the source, and lasts
+    ``duration[i]`` seconds.
+    """
+    audio: np.ndarray
+    clip_start: np.ndarray
+    source_start: np.ndarray
+    duration: np.ndarray
+
+    def to_source(self, t: float, *, end: bool = False) -> float:
+        """Map clip time *t* to source time.
+
+        A time on the boundary between two pieces belongs to the later one,
+        or to the earlier one when *end* is set (so segment ends do not jump
+        over the removed silence).
+        """
+        i = int(np.searchsorted(self.clip_start, t, side="left" if end else "right")) - 1
+        i = min(max(i, 0), len(self.clip_start) - 1)
+        return float(self.source_start[i] + min(max(t - self.clip_start[i], 0.0), self.duration[i]))
+
+
+@dataclass(slots=True)
+class SpeechPlan:
+    """What the VAD kept of one file."""
+    clips: List[SpeechClip]
+    audio_seconds: float
+    speech_seconds: float
+
+    @property
+    def skipped(self) -> float:
+        """Fraction of the audio that is never sent to the model."""
+        return 1.0 - self.speech_seconds / self.audio_seconds if self.audio_seconds else 0.0
+
+
+def plan_clips(audio: np.ndarray, regions: np.ndarray, sample_rate: int = SAMPLE_RATE, *,
+               max_clip_s: float = 30.0, gap_s: float = 0.1) -> SpeechPlan:
+    """Pack speech *regions* of *audio* into clips of at most *max_clip_s*.
+
+    Regions longer than a clip are cut at their quietest frame near the limit.
+    Consecutive regions are concatenated with *gap_s* of silence between them,
+    so each clip fills one Whisper window and can be batched with the others.
+    """
+    max_len = int(max_clip_s * sample_rate)
+    gap = int(gap_s * sample_rate)
+    pieces = _split_long(audio, regions, max_len, sample_rate)
+
+    clips: List[SpeechClip] = []
+    current: list = []  # (start, end) sample spans of the clip being filled
+    used = 0
+    for start, end in pieces:
+        length = end - start
+        if current and used + gap + length > max_len:
+            clips.append(_build_clip(audio, current, gap, sample_rate))
+            current, used = [], 0
+        used += (gap if current else 0) + length
+        current.append((start, end))
+    if current:
+        clips.append(_build_clip(audio, current, gap, sample_rate))
+
+    speech = sum(end - start for start, end in pieces)
+    return SpeechPlan(clips, audio.size / sample_rate, speech / sample_rate)
+
+
+def _build_clip(audio: np.ndarray, spans: list, gap: int, sample_rate: int) -> SpeechClip:
+    silence = np.zeros(gap, dtype=audio.dtype)
+    parts, clip_start, source_start, duration = [], [], [], []
+    pos = 0
+    for k, (start, end) in enumerate(spans):
+        if k:
+            parts.append(silence)
+            pos += gap
+        parts.append(audio[start:end])
+        clip_start.append(pos / sample_rate)
+        source_start.append(start / sample_rate)
+        duration.append((end - start) / sample_rate)
+        pos += end - start
+    return SpeechClip(np.concatenate(parts), np.array(clip_start), np.array(source_start), np.array(duration))
+
+
+def _split_long(audio: np.ndarray, regions: np.ndarray, max_len: int, sample_rate: int) -> List[tuple]:
+    frame = sample_rate // 50  # 20 ms
+    search = min(5 * sample_rate, max_len // 2)
+    pieces = []
+    for start, end in regions.tolist():
+        while end - start > max_len:
+            lo = start + max_len - search
+            window = audio[lo:start + max_len]
+            n = window.size // frame
+            energy = np.mean(window[:n * frame].reshape(n, frame) ** 2, axis=1)
+            cut = lo + int(energy.argmin()) * frame + frame // 2
+            pieces.append((start, cut))
+            start = cut
+        if end > start:
+            pieces.append((start, end))
+    return pieces
+
+
+def _runs(mask: np.ndarray) -> np.ndarray:
+    """``[start, end)`` indices of the runs of True in *mask*."""
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    return np.stack([np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)], axis=1)
+
+
+def _merge_overlaps(spans: np.ndarray) -> np.ndarray:
+    if len(spans) < 2:
+        return spans
+    new = np.concatenate([[True], spans[1:, 0] > spans[:-1, 1]])
+    starts = spans[new, 0]
+    ends = np.maximum.reduceat(spans[:, 1], np.flatnonzero(new))
+    return np.stack([starts, ends], axis=1)
@@ -1,5 +1,25 @@
+import json
+import math
+import os
 import subprocess
 import argparse
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Dict, Iterator, List
+
+import numpy as np
+
+try:
+    from ..inference.audio import SAMPLE_RATE, pcm16_to_float
+except ImportError:  # run as a script: python src/models/download_video.py
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from src.inference.audio import SAMPLE_RATE, pcm16_to_float
+
+_BYTES_PER_SAMPLE = 2  # s16le
 
 
 def record_video(
@@ -39,6 +59,288 @@ def record_video(
     subprocess.run(cmd, check=True)
 
 
+def stream_audio(
+    source: str,
+    *,
+    sample_rate: int = SAMPLE_RATE,
+    block_sec: float = 1.0,
+    duration_sec: int | None = None,
+    realtime: bool = False,
+    start_sec: float = 0.0,
+) -> Iterator[bytes]:
+    """
+    Stream *source* as raw 16-bit mono PCM without writing anything to disk.
+
+    URLs are fetched with yt-dlp writing to stdout and piped into ffmpeg;
+    local files are decoded by ffmpeg directly. Only one block is held in
+    memory at a time, so a live plenary can be consumed while it happens.
+
+    Parameters
+    ----------
+    source : str
+        YouTube/live URL or local media file.
+    sample_rate : int
+        Output sample rate in Hz (Whisper expects 16 kHz).
+    block_sec : float
+        Approximate duration of each yielded block.
+    duration_sec : int or None
+        Stop after that many seconds. If None, reads until the stream ends.
+    realtime : bool
+        Replay local files at native speed (``ffmpeg -re``), handy to
+        simulate a live session offline.
+    start_sec : float
+        Skip this much audio first (to resume an interrupted session). Files
+        and recorded videos are opened at that point with an input seek (no
+        download of what comes before it); live streams cannot seek and
+        raise ``ValueError`` (stream from now and offset the timestamps).
+
+    Yields
+    ------
+    bytes
+        Consecutive blocks of little-endian int16 samples.
+
+    Raises
+    ------
+    RuntimeError
+        If yt-dlp or ffmpeg exit with an error (bad URL, geo-block, corrupt
+        media...), once the audio they produced has been yielded.
+    """
+    is_local = os.path.exists(source)
+    seek_url = bool(start_sec) and not is_local
+    if seek_url and is_live(source):
+        raise ValueError(f"{source} is live and cannot be started at {start_sec} s")
+
+    ffmpeg_cmd = ["ffmpeg", "-nostdin", "-loglevel", "error"]
+    if is_local and realtime:
+        ffmpeg_cmd.append("-re")
+    if seek_url:
+        # seek in the media itself (HTTP range requests) instead of piping yt-dlp from the beginning
+        ffmpeg_cmd += ["-reconnect", "1", "-reconnect_streamed", "1", "-reconnect_delay_max", "10"]
+    if start_sec:
+        ffmpeg_cmd += ["-ss", str(start_sec)]
+    ffmpeg_cmd += ["-i", source if is_local else media_url(source) if seek_url else "pipe:0"]
+    if duration_sec is not None:
+        ffmpeg_cmd += ["-t", str(duration_sec)]
+    ffmpeg_cmd += ["-vn", "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "pipe:1"]
+
+    # stderr goes to files, not pipes: nobody reads it until the end and a full pipe would block the process
+    procs: list[tuple[str, subprocess.Popen, IO[bytes]]] = []
+    ytdlp = None
+    if not is_local and not seek_url:
+        err = tempfile.TemporaryFile()
+        ytdlp = subprocess.Popen(
+            ["yt-dlp", source, "-f", "bestaudio/best", "--quiet", "--no-warnings", "-o", "-"],
+            stdout=subprocess.PIPE,
+            stderr=err,
+        )
+        procs.append(("yt-dlp", ytdlp, err))
+    err = tempfile.TemporaryFile()
+    ffmpeg = subprocess.Popen(ffmpeg_cmd, stdin=ytdlp.stdout if ytdlp else None, stdout=subprocess.PIPE, stderr=err)
+    if ytdlp is not None:
+        ytdlp.stdout.close()  # let yt-dlp get SIGPIPE if ffmpeg exits
+    procs.append(("ffmpeg", ffmpeg, err))
+
+    block_bytes = max(1, int(block_sec * sample_rate)) * _BYTES_PER_SAMPLE
+    received = 0
+    try:
+        while True:
+            block = ffmpeg.stdout.read(block_bytes)
+            if not block:
+                break
+            received += len(block)
+            yield block
+
+        # EOF: find out whether the stream ended or something failed on the way
+        ffmpeg.wait()
+        expected = None if duration_sec is None else (duration_sec - 1) * sample_rate * _BYTES_PER_SAMPLE
+        stopped = ffmpeg.returncode == 0 and expected is not None and received >= expected
+        if ytdlp is not None:
+            if stopped and ytdlp.poll() is None:
+                ytdlp.terminate()  # ffmpeg stopped at -t; the rest of the download is not needed
+            ytdlp.wait()
+        failed = [
+            f"{name} exited with status {proc.returncode}: {_stderr_tail(err) or 'no error output'}"
+            for name, proc, err in procs
+            if proc.returncode != 0 and not (proc is ytdlp and stopped)  # SIGPIPE/terminate caused by -t
+        ]
+        if failed:
+            raise RuntimeError(f"Streaming {source} failed after {received // _BYTES_PER_SAMPLE / sample_rate:.1f} s "
+                               f"of audio: " + "; ".join(failed))
+    finally:
+        ffmpeg.stdout.close()
+        for _, proc, err in reversed(procs):
+            if proc.poll() is None:
+                proc.terminate()
+            proc.wait()
+            err.close()
+
+
+def _stderr_tail(err: IO[bytes], limit: int = 2000) -> str:
+    """Last *limit* bytes a process wrote to the file *err*."""
+    err.seek(0, os.SEEK_END)
+    err.seek(max(0, err.tell() - limit))
+    return err.read().decode(errors="replace").strip()
+
+
+@dataclass(slots=True)
+class TimeSlice:
+    """One time range of a recorded session, in seconds.
+
+    Audio is fetched for ``[start, end)``; the transcript of the slice is
+    kept for ``[keep_start, keep_end)``. The keep ranges of consecutive
+    slices tile the session, and the margins around them are the overlap
+    that gives Whisper context at the cut.
+    """
+    index: int
+    start: float
+    end: float
+    keep_start: float
+    keep_end: float
+
+
+@dataclass(slots=True)
+class AudioSlice:
+    """Decoded audio of one :class:`TimeSlice` (mono float32 at *sample_rate*)."""
+    span: TimeSlice
+    audio: np.ndarray
+    sample_rate: int
+    fetch_time: float
+
+
+def _is_url(source: str) -> bool:
+    return not os.path.exists(source)
+
+
+def _video_info(source: str) -> Dict:
+    cmd = ["yt-dlp", "--skip-download", "--no-warnings", "--dump-single-json", source]
+    return json.loads(subprocess.run(cmd, stdout=subprocess.PIPE, check=True).stdout)
+
+
+def is_live(source: str) -> bool:
+    """Whether *source* is a stream being broadcast right now (never true for local files)."""
+    return _is_url(source) and bool(_video_info(source).get("is_live"))
+
+
+def probe_duration(source: str) -> float:
+    """Duration of a local media file (ffprobe) or of a recorded video (yt-dlp), in seconds."""
+    if _is_url(source):
+        info = _video_info(source)
+        if info.get("is_live") or not info.get("duration"):
+            raise ValueError(f"{source} has no known duration (live stream?); use stream_audio instead")
+        return float(info["duration"])
+    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+           "-of", "default=noprint_wrappers=1:nokey=1", source]
+    out = subprocess.run(cmd, stdout=subprocess.PIPE, check=True, text=True).stdout.strip()
+    try:
+        return float(out)
+    except ValueError:
+        raise ValueError(f"ffprobe found no duration for {source}") from None
+
+
+def media_url(source: str) -> str:
+    """What ffmpeg should open: the file itself, or the direct audio URL behind a video page."""
+    if not _is_url(source):
+        return source
+    cmd = ["yt-dlp", "--no-warnings", "-f", "bestaudio/best", "--get-url", source]
+    return subprocess.run(cmd, stdout=subprocess.PIPE, check=True, text=True).stdout.splitlines()[0]
+
+
+def plan_slices(duration: float, *, slice_sec: float = 600.0, overlap_sec: float = 10.0) -> List[TimeSlice]:
+    """Cut *duration* seconds into slices of *slice_sec*, each fetched with *overlap_sec* on both sides."""
+    if slice_sec <= 2 * overlap_sec:
+        raise ValueError("slice_sec must be longer than twice overlap_sec")
+    n = max(1, math.ceil(duration / slice_sec))
+    slices = []
+    for k in range(n):
+        keep_start = k * slice_sec
+        keep_end = min((k + 1) * slice_sec, duration) if k < n - 1 else math.inf
+        slices.append(TimeSlice(
+            index=k,
+            start=max(0.0, keep_start - overlap_sec),
+            end=min(duration, (k + 1) * slice_sec + overlap_sec),
+            keep_start=keep_start,
+            keep_end=keep_end,
+        ))
+    return slices
+
+
+def fetch_slice(url: str, span: TimeSlice, *, sample_rate: int = SAMPLE_RATE) -> AudioSlice:
+    """Decode ``[span.start, span.end)`` of *url* straight to 16-bit mono PCM.
+
+    ``-ss`` before ``-i`` makes ffmpeg seek in the container (with HTTP range
+    requests for remote media) instead of decoding everything before the
+    slice, so every slice costs about the same wherever it is.
+    """
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error"]
+    if _is_url(url):
+        cmd += ["-reconnect", "1", "-reconnect_streamed", "1", "-reconnect_delay_max", "10"]
+    cmd += ["-ss", f"{span.start:.3f}", "-i", url, "-t", f"{span.end - span.start:.3f}",
+            "-vn", "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "pipe:1"]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed on slice {span.index} ({span.start:.0f}-{span.end:.0f} s): "
+                           f"{proc.stderr.decode(errors='replace').strip()}")
+    return AudioSlice(span, pcm16_to_float(proc.stdout), sample_rate, time.perf_counter() - start)
+
+
+def iter_slices(
+    source: str,
+    *,
+    slice_sec: float = 600.0,
+    overlap_sec: float = 10.0,
+    workers: int = 4,
+    sample_rate: int = SAMPLE_RATE,
+) -> Iterator[AudioSlice]:
+    """
+    Fetch a recorded session as overlapping slices, *workers* at a time.
+
+    Instead of one yt-dlp/ffmpeg process downloading and transcoding the
+    whole recording, the duration is probed, the session is cut with
+    :func:`plan_slices` and every slice is decoded by its own seeking ffmpeg
+    directly to PCM. Slices are yielded as soon as they land, so in
+    completion order (see ``TimeSlice.index``); at most *workers* are held
+    in memory ahead of the consumer.
+
+    Parameters
+    ----------
+    source : str
+        Video/audio URL of a finished recording, or a local media file.
+    slice_sec : float
+        Length of the part of the session each slice is responsible for.
+    overlap_sec : float
+        Extra audio fetched on both sides of a slice.
+    workers : int
+        Concurrent ffmpeg processes.
+    sample_rate : int
+        Output sample rate in Hz.
+
+    Yields
+    ------
+    AudioSlice
+        Decoded slices, in the order they finish.
+    """
+    slices = plan_slices(probe_duration(source), slice_sec=slice_sec, overlap_sec=overlap_sec)
+    url = media_url(source)
+    pending = iter(slices)
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch-slice")
+    in_flight: Dict[Future, TimeSlice] = {}
+    try:
+        while True:
+            for span in pending:
+                in_flight[pool.submit(fetch_slice, url, span, sample_rate=sample_rate)] = span
+                if len(in_flight) >= workers:
+                    break
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda f: in_flight[f].index):
+                del in_flight[future]
+                yield future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
 def _parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Record a YouTube video segment using yt-dlp and ffmpeg.")
     parser.add_argument(
@@ -0,0 +1,561 @@
+"""End-to-end session pipeline: audio in, ordered speaker summaries out.
+
+    python -m src.pipeline <video_url or file> --model ./data/models/eva_gguf/Turdus-trained-20-int4.gguf \\
+        --speaker-workers 2 --summary-workers 2 --output session.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+from .inference.llm_cache import LLMCache, model_fingerprint
+from .inference.llm_utils import TokenBudget, get_model, model_stats
+from .inference.metrics import format_table, metrics
+from .inference.semantic_splitter import SemanticSplitter
+from .inference.speaker_splitter_llm import (
+    PROMPT_VERSION as SPEAKER_PROMPT_VERSION,
+    STRUCTURED_MAX_TOKENS,
+    STRUCTURED_PROMPT_VERSION,
+    SpeakerAwareSplitter,
+    SpeakerDetectorLLM,
+    build_prompt as build_speaker_prompt,
+    build_structured_prompt,
+)
+from .inference.stt import Segment, SpeechEngine, get_engine, transcribe_stream
+from .inference.summarizer import (
+    PROMPT_VERSION as SUMMARY_PROMPT_VERSION,
+    build_prompt as build_summary_prompt,
+    summarise,
+)
+from .inference.transcript import Transcript, TranscriptView
+from .models.download_video import is_live, stream_audio
+from .store import QuoteStore
+from .workspace import Artifact, Workspace
+
+_DONE = object()
+_POLL_S = 0.1
+
+
+class _Aborted(Exception):
+    """Raised inside a stage when another stage failed."""
+
+
+class Pipeline:
+    """Run every stage of a session concurrently, connected by bounded queues.
+
+    ::
+
+        stream_audio ─► transcribe_stream ─► iter_chunks ─► speaker detection (×N)
+            ─► continuity ─► summarise (×M) ─► ordered records
+
+    Each arrow is a ``queue.Queue`` of at most *queue_size* items, so a slow
+    stage blocks the ones before it instead of letting work pile up in
+    memory. Speaker detection and summarisation have their own worker count
+    (one llama context each); chunks are numbered and put back in order
+    where order matters (speaker continuity and the output), so the result
+    is the same as running the stages one after another. Summaries start
+    while the audio is still being transcribed, and wall time tends to the
+    time of the slowest stage instead of the sum of all of them.
+
+    Parameters
+    ----------
+    model_path : str or Path
+        GGUF checkpoint for speaker detection and summaries.
+    n_gpu_layers : int or None
+        Layers offloaded to the GPU (see ``load_model``).
+    n_ctx : int
+        Context of every llama context.
+    engine : WhisperEngine, FasterWhisperEngine or None
+        STT engine (the shared default if None).
+    splitter : SemanticSplitter or None
+        Chunker (``SemanticSplitter()`` if None).
+    speaker_workers, summary_workers : int
+        Concurrent LLM calls of each stage.
+    queue_size : int
+        Capacity of every queue between stages.
+    starting_speaker : str
+        Speaker assumed before the first detected change.
+    summary_tokens : int
+        Generation budget of each summary.
+    cache : LLMCache or None
+        Completion cache (the shared default if None).
+    speaker_draft, summary_draft : str or None
+        Speculative decoding per stage, e.g. ``"prompt-lookup"`` or a small
+        GGUF (see ``load_model``); None decodes normally.
+    stt_window_s, stt_overlap_s : float
+        Window and re-decoded overlap of the streaming transcription (see
+        ``transcribe_stream``).
+    token_budget : bool
+        Size chunks in model tokens so that each one fills ``n_ctx`` next to
+        the speaker and summary prompts (sets ``splitter.budget`` unless it
+        already has one). False keeps the splitter's ``max_words``.
+    """
+
+    def __init__(self, model_path: str | Path, n_gpu_layers: int | None = None, *, n_ctx: int = 4096,
+                 engine: SpeechEngine | None = None, splitter: SemanticSplitter | None = None,
+                 speaker_workers: int = 1, summary_workers: int = 1, queue_size: int = 8,
+                 starting_speaker: str = "Maestro de Ceremonias", summary_tokens: int = 256,
+                 cache: LLMCache | None = None, speaker_draft: str | None = None,
+                 summary_draft: str | None = None, stt_window_s: float = 30.0, stt_overlap_s: float = 5.0,
+                 token_budget: bool = True):
+        self.engine = engine or get_engine()
+        self.splitter = splitter or SemanticSplitter()
+        self.speaker_workers = speaker_workers
+        self.summary_workers = summary_workers
+        self.queue_size = queue_size
+        self.starting_speaker = starting_speaker
+        self.summary_tokens = summary_tokens
+        self.cache = cache
+        self.model_path = model_path
+        self.stt_window_s = stt_window_s
+        self.stt_overlap_s = stt_overlap_s
+
+        # one llama context per worker; all of them share the mmap'ed weights
+        n_threads = max(1, (os.cpu_count() or 1) // (speaker_workers + summary_workers))
+        self.detector = SpeakerDetectorLLM(model_path, n_gpu_layers, n_ctx, cache=cache,
+                                           n_contexts=speaker_workers, draft=speaker_draft)
+        self.summary_llms = [
+            get_model(model_path, n_gpu_layers, n_ctx=n_ctx, n_threads=n_threads, replica=speaker_workers + i,
+                      draft=summary_draft)
+            for i in range(summary_workers)
+        ]
+        if token_budget and self.splitter.budget is None:
+            speaker_prompt = build_structured_prompt if self.detector.structured else build_speaker_prompt
+            self.splitter.budget = TokenBudget(
+                self.summary_llms[0],
+                [speaker_prompt, lambda chunk: build_summary_prompt(f"Orador: {starting_speaker}\n{chunk}")],
+                max_tokens=max(summary_tokens, STRUCTURED_MAX_TOKENS),
+                # detected speaker names are longer than the starting one
+                margin=64,
+            )
+
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self._stats_lock = threading.Lock()
+        self._abort = threading.Event()
+        self._errors: List[BaseException] = []
+        self._artifacts: Dict[str, Artifact] = {}
+        self._done_detections: Dict[int, Any] = {}
+        self._done_summaries: Dict[int, Any] = {}
+
+    def run(self, source: str, *, realtime: bool = False, duration_sec: int | None = None,
+            workspace: str | Path | None = None) -> Iterator[Dict[str, Any]]:
+        """Process *source* (URL or file) and yield one record per speaker turn, in order.
+
+        Records look like ``{"speaker", "text", "summary", "timestamp", "start", "end"}``.
+
+        With a *workspace* directory, every stage's output is saved there as
+        it is produced (see :mod:`src.workspace`). Running the same source
+        again with the same configuration skips the finished stages and
+        resumes the interrupted ones: transcription from the last saved
+        segment, LLM stages from the last saved chunk.
+        """
+        self._abort.clear()
+        self._errors.clear()
+        self.stats = {}
+        self._artifacts = self._open_workspace(workspace, source, duration_sec) if workspace else {}
+        self._done_detections = self._saved("speakers", "idx", "detection")
+        self._done_summaries = self._saved("summaries", "seq", "record")
+
+        segments: queue.Queue = queue.Queue(self.queue_size)
+        chunks: queue.Queue = queue.Queue(self.queue_size)
+        detected: queue.Queue = queue.Queue(self.queue_size)
+        pieces: queue.Queue = queue.Queue(self.queue_size)
+        summaries: queue.Queue = queue.Queue(self.queue_size)
+
+        chunks_saved = self._artifacts.get("chunks")
+        threads = [
+            self._source("chunk", lambda: self._chunk(segments), chunks, consumers=self.speaker_workers),
+            *self._workers("speakers", self._detect, chunks, detected, self.speaker_workers, consumers=1,
+                           on_done=self._commit("speakers")),
+            self._source("continuity", lambda: self._continuity(detected), pieces,
+                         consumers=self.summary_workers),
+            *self._workers("summarise", self._summarise, pieces, summaries, self.summary_workers, consumers=1,
+                           on_done=self._commit("summaries")),
+        ]
+        if not (chunks_saved and chunks_saved.complete):
+            threads.insert(0, self._source("transcribe", lambda: self._transcribe(source, realtime, duration_sec),
+                                           segments, consumers=1))
+        for thread in threads:
+            thread.start()
+
+        try:
+            yield from self._reorder(summaries, lambda item: item[0], lambda item: item[1])
+        except _Aborted:
+            pass  # the failing stage's exception is raised below
+        finally:
+            if sys.exc_info()[0] is not None or self._errors:
+                self._abort.set()
+            for thread in threads:
+                thread.join()
+            for artifact in self._artifacts.values():
+                artifact.close()
+        if self._errors:
+            raise self._errors[0]
+
+    # -- workspace --------------------------------------------------------
+
+    def _open_workspace(self, root: str | Path, source: str, duration_sec: int | None) -> Dict[str, Artifact]:
+        """Artifacts of this run, each keyed on the previous one."""
+        ws = Workspace(root, source)
+        engine = self.engine
+        model = model_fingerprint(self.model_path)
+        transcribe = ws.artifact("transcribe", {
+            "engine": type(engine).__name__,
+            "model": engine.model_id,
+            "language": engine.language,
+            "compute_type": getattr(engine, "compute_type", None),
+            "dtype": getattr(engine, "dtype", None),
+            "window_s": self.stt_window_s,
+            "overlap_s": self.stt_overlap_s,
+            "duration_sec": duration_sec,
+        })
+        chunks = ws.artifact("chunks", {
+            "spacy_model": self.splitter.model_name,
+            "max_size": self.splitter.max_size,
+        }, transcribe)
+        speakers = ws.artifact("speakers", {
+            "model": model,
+            "prompt_version": STRUCTURED_PROMPT_VERSION if self.detector.structured else SPEAKER_PROMPT_VERSION,
+        }, chunks)
+        summaries = ws.artifact("summaries", {
+            "model": model,
+            "prompt_version": SUMMARY_PROMPT_VERSION,
+            "max_tokens": self.summary_tokens,
+            "starting_speaker": self.starting_speaker,
+        }, speakers)
+        print(f"Workspace {ws.path}: " + ", ".join(
+            f"{a.stage} {'done' if a.complete else len(a.records())}" for a in (transcribe, chunks, speakers, summaries)
+        ), file=sys.stderr)
+        return {"transcribe": transcribe, "chunks": chunks, "speakers": speakers, "summaries": summaries}
+
+    def _saved(self, stage: str, index: str, value: str) -> Dict[int, Any]:
+        artifact = self._artifacts.get(stage)
+        return {r[index]: r[value] for r in artifact.records()} if artifact else {}
+
+    def _save(self, stage: str, record: Dict[str, Any]) -> None:
+        artifact = self._artifacts.get(stage)
+        if artifact is not None:
+            artifact.append(record)
+
+    def _commit(self, stage: str) -> Callable[[], None]:
+        def _done() -> None:
+            artifact = self._artifacts.get(stage)
+            if artifact is not None:
+                artifact.commit()
+        return _done
+
+    # -- stages -----------------------------------------------------------
+
+    def _transcribe(self, source: str, realtime: bool, duration_sec: int | None) -> Iterator[Segment]:
+        artifact = self._artifacts.get("transcribe")
+        saved = artifact.records() if artifact else []
+        for record in saved:
+            yield Segment(**record)
+        if artifact and artifact.complete:
+            return
+
+        resume = saved[-1]["end"] if saved else 0.0
+        offset, live = resume, False
+        if artifact is not None and not saved:
+            artifact.note(started_at=time.time())
+        elif saved and not os.path.exists(source) and is_live(source):
+            # a live stream cannot seek: pick it up at "now", placed on the
+            # session timeline by the wall-clock time since the first run started
+            live = True
+            started_at = artifact.info.get("started_at")
+            if started_at is None:
+                print(f"No start time recorded for {source}; resumed audio is placed right after "
+                      f"{resume:.0f} s", file=sys.stderr)
+            else:
+                offset = max(resume, time.time() - started_at)
+                print(f"Resuming live {source} at {offset:.0f} s ({offset - resume:.0f} s were missed)",
+                      file=sys.stderr)
+        if duration_sec is not None and offset >= duration_sec:
+            pcm = iter(())
+        else:
+            pcm = stream_audio(source, realtime=realtime, start_sec=0.0 if live else resume,
+                               duration_sec=None if duration_sec is None else duration_sec - offset)
+        for segment in transcribe_stream(pcm, self.engine, window_s=self.stt_window_s,
+                                         overlap_s=self.stt_overlap_s, start_s=offset):
+            self._save("transcribe", {"start": segment.start, "end": segment.end, "text": segment.text})
+            yield segment
+        self._commit("transcribe")()
+
+    def _chunk(self, segments: queue.Queue) -> Iterator:
+        artifact = self._artifacts.get("chunks")
+        saved = artifact.records() if artifact else []
+        if artifact and artifact.complete:
+            for idx, record in enumerate(saved):
+                yield idx, _chunk_from_record(record)
+            return
+
+        # chunking is deterministic, so a resumed run re-creates the saved
+        # chunks identically and only the new ones are written
+        for idx, chunk in enumerate(self.splitter.iter_chunks(self._drain(segments))):
+            if idx >= len(saved):
+                self._save("chunks", _chunk_to_record(chunk))
+            yield idx, chunk
+        self._commit("chunks")()
+
+    def _detect(self, worker: int, item):
+        idx, chunk = item
+        detection = self._done_detections.get(idx)
+        if detection is None:
+            detection = self.detector.detect_speaker_and_location(str(chunk))
+            self._save("speakers", {"idx": idx, "detection": list(detection)})
+        yield idx, chunk, tuple(detection)
+
+    def _continuity(self, detected: queue.Queue) -> Iterator:
+        """Resolve speakers in chunk order, as ``SpeakerAwareSplitter.split_chunks`` does."""
+        current = self.starting_speaker
+        seq = 0
+        for _, chunk, detection in self._reorder(detected, lambda item: item[0], lambda item: item):
+            for speaker, piece in SpeakerAwareSplitter._apply_detection(chunk, detection, current):
+                yield seq, speaker, piece
+                seq += 1
+                current = speaker
+
+    def _summarise(self, worker: int, item):
+        seq, speaker, piece = item
+        record = self._done_summaries.get(seq)
+        if record is None:
+            summary, _ = summarise(self.summary_llms[worker], f"Orador: {speaker}\n{piece}",
+                                   max_tokens=self.summary_tokens, cache=self.cache)
+            record = {
+                "speaker": speaker,
+                "text": str(piece),
+                "summary": summary,
+                "timestamp": getattr(piece, "timestamp", None),
+                "start": getattr(piece, "start", None),
+                "end": getattr(piece, "end", None),
+            }
+            self._save("summaries", {"seq": seq, "record": record})
+        yield seq, record
+
+    # -- plumbing ---------------------------------------------------------
+
+    def _put(self, q: queue.Queue, item) -> None:
+        while True:
+            if self._abort.is_set():
+                raise _Aborted
+            try:
+                q.put(item, timeout=_POLL_S)
+                return
+            except queue.Full:
+                pass
+
+    def _drain(self, q: queue.Queue) -> Iterator:
+        """Yield items of *q* until its end marker."""
+        while True:
+            try:
+                item = q.get(timeout=_POLL_S)
+            except queue.Empty:
+                if self._abort.is_set():
+                    raise _Aborted
+                continue
+            if item is _DONE:
+                return
+            yield item
+
+    def _reorder(self, q: queue.Queue, index: Callable, value: Callable) -> Iterator:
+        """Yield ``value(item)`` for the items of *q* in ``index(item)`` order."""
+        waiting: Dict[int, Any] = {}
+        expected = 0
+        for item in self._drain(q):
+            waiting[index(item)] = item
+            while expected in waiting:
+                yield value(waiting.pop(expected))
+                expected += 1
+
+    def _record(self, name: str, busy: float, items: int) -> None:
+        with self._stats_lock:
+            stats = self.stats.setdefault(name, {"items": 0, "busy_s": 0.0})
+            stats["items"] += items
+            stats["busy_s"] += busy
+        metrics.record(f"pipeline.{name}", wall_s=busy, items=items)
+
+    def _fail(self, exc: BaseException) -> None:
+        if not isinstance(exc, _Aborted):
+            self._errors.append(exc)
+        self._abort.set()
+
+    def _source(self, name: str, produce: Callable[[], Iterable], out: queue.Queue,
+                consumers: int) -> threading.Thread:
+        """Thread putting everything *produce* yields into *out*."""
+        def _target() -> None:
+            busy, items = 0.0, 0
+            try:
+                iterator = iter(produce())
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        break
+                    finally:
+                        busy += time.perf_counter() - start
+                    self._put(out, item)
+                    items += 1
+            except BaseException as exc:
+                self._fail(exc)
+            finally:
+                # time blocked on an upstream queue counts as busy here; good
+                # enough to spot the bottleneck
+                self._record(name, busy, items)
+                if not self._abort.is_set():  # a failed stage must not look finished downstream
+                    for _ in range(consumers):
+                        self._put_done(out)
+
+        return threading.Thread(target=_target, name=f"pipeline-{name}", daemon=True)
+
+    def _workers(self, name: str, fn: Callable, inbox: queue.Queue, out: queue.Queue, workers: int,
+                 consumers: int, on_done: Callable[[], None] | None = None) -> List[threading.Thread]:
+        """*workers* threads mapping *inbox* through ``fn(worker, item)`` into *out*.
+
+        *on_done* runs once, after every worker finished without error.
+        """
+        remaining = [workers]
+        lock = threading.Lock()
+
+        def _target(worker: int) -> None:
+            busy, items = 0.0, 0
+            try:
+                for item in self._drain(inbox):
+                    start = time.perf_counter()
+                    outputs = list(fn(worker, item))
+                    busy += time.perf_counter() - start
+                    for output in outputs:
+                        self._put(out, output)
+                    items += 1
+            except BaseException as exc:
+                self._fail(exc)
+            finally:
+                self._record(name, busy, items)
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last and not self._abort.is_set():
+                    try:
+                        if on_done is not None:
+                            on_done()
+                    except BaseException as exc:
+                        self._fail(exc)
+                    else:
+                        for _ in range(consumers):
+                            self._put_done(out)
+
+        return [threading.Thread(target=_target, args=(i,), name=f"pipeline-{name}-{i}", daemon=True)
+                for i in range(workers)]
+
+    def _put_done(self, q: queue.Queue) -> None:
+        try:
+            self._put(q, _DONE)
+        except _Aborted:
+            pass  # consumers stop on the abort flag instead
+
+
+def _chunk_to_record(chunk: str | TranscriptView) -> Dict[str, Any]:
+    if isinstance(chunk, TranscriptView):
+        return {"units": list(chunk.units())}
+    return {"text": chunk}
+
+
+def _chunk_from_record(record: Dict[str, Any]) -> str | TranscriptView:
+    if "units" in record:
+        return Transcript.from_units(record["units"]).view()
+    return record["text"]
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Transcribe, split by speaker and summarise a session.")
+    parser.add_argument("source", help="Video/live URL or local media file")
+    parser.add_argument("--model", default="./data/models/eva_gguf/Turdus-trained-20-int4.gguf",
+                        help="Path to the GGUF checkpoint")
+    parser.add_argument("--gpu-layers", type=int, default=None)
+    parser.add_argument("--n-ctx", type=int, default=4096)
+    parser.add_argument("--stt-backend", default=None, help="STT backend (default: $STT_BACKEND or hf)")
+    parser.add_argument("--spacy-model", default="es_core_news_sm")
+    parser.add_argument("--max-words", type=int, default=None,
+                        help="Words per semantic chunk (default: fill --n-ctx, measured in model tokens)")
+    parser.add_argument("--speaker-workers", type=int, default=1, help="Concurrent speaker detections")
+    parser.add_argument("--summary-workers", type=int, default=1, help="Concurrent summaries")
+    parser.add_argument("--queue-size", type=int, default=8, help="Items buffered between stages")
+    parser.add_argument("--speaker-draft", default=None,
+                        help="Speculative decoding for speaker detection: 'prompt-lookup[:N]' or a draft GGUF")
+    parser.add_argument("--summary-draft", default=None,
+                        help="Speculative decoding for summaries: 'prompt-lookup[:N]' or a draft GGUF")
+    parser.add_argument("--duration", type=int, default=None, help="Stop after this many seconds of audio")
+    parser.add_argument("--realtime", action="store_true", help="Replay local files at native speed")
+    parser.add_argument("--output", default=None, help="Write the records as JSON here (default: stdout)")
+    parser.add_argument("--metrics-jsonl", default=None, help="Append per-call stage metrics to this file")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics on this port while running")
+    parser.add_argument("--workspace", default=None,
+                        help="Save every stage's output here and resume from it on the next run")
+    parser.add_argument("--store", default=None,
+                        help="Also add the records to this quote store (see src.store) as they arrive")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    if args.metrics_jsonl:
+        metrics.export_jsonl(args.metrics_jsonl)
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+    pipeline = Pipeline(
+        args.model,
+        args.gpu_layers,
+        n_ctx=args.n_ctx,
+        engine=get_engine(backend=args.stt_backend),
+        splitter=SemanticSplitter(args.spacy_model, args.max_words or 512),
+        speaker_workers=args.speaker_workers,
+        summary_workers=args.summary_workers,
+        queue_size=args.queue_size,
+        speaker_draft=args.speaker_draft,
+        summary_draft=args.summary_draft,
+        token_budget=args.max_words is None,
+    )
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    store = QuoteStore(args.store) if args.store else None
+    start = time.perf_counter()
+    try:
+        # written as it arrives, so a partial run still leaves valid records behind
+        out.write("[")
+        records = pipeline.run(args.source, realtime=args.realtime, duration_sec=args.duration,
+                               workspace=args.workspace)
+        for i, record in enumerate(records):
+            out.write(("," if i else "") + "\n  " + json.dumps(record, ensure_ascii=False))
+            out.flush()
+            if store is not None:
+                store.append(args.source, i, record)
+            print(f"[{record['timestamp'] or '--:--:--'}] {record['speaker']}", file=sys.stderr)
+        out.write("\n]\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if store is not None:
+            store.close()
+
+    wall = time.perf_counter() - start
+    print(f"Wall time {wall:.1f} s", file=sys.stderr)
+    for name, stats in pipeline.stats.items():
+        print(f"  {name:>10}: {stats['items']:5.0f} items, busy {stats['busy_s']:7.1f} s", file=sys.stderr)
+    print(format_table(metrics.snapshot()), file=sys.stderr)
+    for model in model_stats()["models"]:
+        if model["draft"]:
+            print(f"  replica {model['replica']} draft {model['draft']}: "
+                  f"{model['draft_accepted']}/{model['draft_proposed']} draft tokens accepted "
+                  f"({model['draft_acceptance_rate']:.0%})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
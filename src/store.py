@@ -0,0 +1,356 @@
+"""Persistent, full-text indexed store of speaker turns across sessions.
+
+Every processed session adds its records (speaker, quoted text, summary,
+timestamps) to one SQLite file. Speaker names are normalised so that
+"Senador López" and "senador Lopez" are the same speaker, and text and
+summaries are indexed with FTS5 (accent- and case-insensitive), so queries
+such as "everything López said about the budget" over thousands of sessions
+are answered from the index instead of rescanning JSON files.
+
+    python -m src.store ingest session.json --source <video_url> --date 2024-05-02
+    python -m src.store search presupuesto --speaker "senador lopez"
+    python -m src.store speakers
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from .inference.transcript import TranscriptView
+
+_DEFAULT_PATH = Path("~/.cache/py-congress-summary/quotes.sqlite")
+
+# Leading articles and honorifics, not part of the name. Offices (senador,
+# presidente, ...) are kept: "Presidente Peña" and "Senador Peña" are not
+# the same person.
+_TITLES = {
+    "el", "la", "los", "las", "don", "dona", "sr", "sra", "srta", "senor", "senora", "senorita",
+    "dr", "dra", "doctor", "doctora",
+}
+_PUNCT = re.compile(r"[^\w\s]")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY, source TEXT NOT NULL UNIQUE, title TEXT, date TEXT, ingested REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS speakers (
+    id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE, name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS speaker_aliases (
+    alias TEXT PRIMARY KEY, speaker_id INTEGER NOT NULL REFERENCES speakers(id)
+);
+CREATE TABLE IF NOT EXISTS quotes (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    seq INTEGER NOT NULL,
+    speaker_id INTEGER NOT NULL REFERENCES speakers(id),
+    speaker_key TEXT NOT NULL,
+    text TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    start REAL,
+    end REAL,
+    timestamp TEXT,
+    UNIQUE (session_id, seq)
+);
+CREATE INDEX IF NOT EXISTS quotes_speaker ON quotes(speaker_id, session_id, seq);
+CREATE VIRTUAL TABLE IF NOT EXISTS quotes_fts USING fts5(
+    text, summary, speaker_key,
+    content='quotes', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS quotes_ai AFTER INSERT ON quotes BEGIN
+    INSERT INTO quotes_fts(rowid, text, summary, speaker_key)
+    VALUES (new.id, new.text, new.summary, new.speaker_key);
+END;
+CREATE TRIGGER IF NOT EXISTS quotes_ad AFTER DELETE ON quotes BEGIN
+    INSERT INTO quotes_fts(quotes_fts, rowid, text, summary, speaker_key)
+    VALUES ('delete', old.id, old.text, old.summary, old.speaker_key);
+END;
+"""
+
+
+def _fold(text: str) -> str:
+    """Lowercase, without accents or punctuation, single-spaced."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    return " ".join(_PUNCT.sub(" ", text).split())
+
+
+def normalize_speaker(name: str) -> str:
+    """Key identifying a speaker regardless of case, accents and leading honorifics.
+
+    ``"Senador López"`` and ``"senador Lopez"`` give ``"senador lopez"``;
+    ``"el Sr. López"`` and ``"Don Lopez"`` give ``"lopez"``. Offices are part
+    of the key, so people sharing a surname stay apart. Honorifics with no
+    name after them (``"Señor"``) are kept whole; a name without any letters
+    or digits gives ``""``.
+    """
+    words = _fold(name).split()
+    i = 0
+    while i < len(words) and words[i] in _TITLES:
+        i += 1
+    if i == len(words) or words[i] in ("de", "del"):
+        return " ".join(words)
+    return " ".join(words[i:])
+
+
+def _fts_query(query: str) -> str:
+    """Every word of *query* as a quoted FTS5 term (all must match)."""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+@dataclass(slots=True)
+class Quote:
+    """One speaker turn of one session."""
+    session: str
+    seq: int
+    speaker: str
+    text: str
+    summary: str
+    start: float | None
+    end: float | None
+    timestamp: str | None
+    snippet: str | None = None
+
+
+def records_from_pairs(pairs: Sequence[Tuple[str, Any]], summaries: Sequence[str] | None = None) -> List[Dict[str, Any]]:
+    """Records for :meth:`QuoteStore.add_session` from ``SpeakerAwareSplitter.split_chunks`` output.
+
+    *pairs* are *(speaker, chunk)* with chunks as strings or transcript
+    views (which carry their timestamps); *summaries*, if given, are the
+    matching summaries.
+    """
+    records = []
+    for i, (speaker, chunk) in enumerate(pairs):
+        view = chunk if isinstance(chunk, TranscriptView) else None
+        records.append({
+            "speaker": speaker,
+            "text": str(chunk),
+            "summary": summaries[i] if summaries is not None else "",
+            "timestamp": view.timestamp if view is not None else None,
+            "start": view.start if view is not None else None,
+            "end": view.end if view is not None else None,
+        })
+    return records
+
+
+class QuoteStore:
+    """SQLite store of speaker turns with a full-text index.
+
+    Appends are incremental: records are numbered within their session and
+    adding a record number that is already stored does nothing, so a
+    session can be ingested while it is processed, and ingesting it again
+    (or resuming an interrupted ingest) does not duplicate anything.
+
+    Parameters
+    ----------
+    path : str or Path
+        SQLite file (created if missing).
+    """
+
+    def __init__(self, path: str | Path = _DEFAULT_PATH):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(_SCHEMA)
+        self._speaker_ids: Dict[str, int] = {}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    # -- ingest -----------------------------------------------------------
+
+    def add_session(self, source: str, records: Iterable[Dict[str, Any]], *, title: str | None = None,
+                    date: str | None = None, replace: bool = False) -> int:
+        """Store the records of session *source* in one transaction; returns how many were new.
+
+        Records are dicts with ``speaker``, ``text``, ``summary`` and
+        optionally ``start``, ``end``, ``timestamp`` and ``seq`` (their
+        position in the session; the order of *records* otherwise). With
+        *replace*, the quotes already stored for the session are dropped
+        first (e.g. after reprocessing it with another model).
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                session_id = self._session_id(source, title, date)
+                if replace:
+                    self._db.execute("DELETE FROM quotes WHERE session_id = ?", (session_id,))
+                added = 0
+                for i, record in enumerate(records):
+                    added += self._insert(session_id, record.get("seq", i), record)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                # ids handed out in this transaction are gone and may be reused
+                self._speaker_ids.clear()
+                raise
+        return added
+
+    def append(self, source: str, seq: int, record: Dict[str, Any]) -> bool:
+        """Store record number *seq* of session *source* as soon as it is produced."""
+        return self.add_session(source, [dict(record, seq=seq)]) == 1
+
+    def _session_id(self, source: str, title: str | None, date: str | None) -> int:
+        self._db.execute(
+            "INSERT INTO sessions (source, title, date, ingested) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(source) DO UPDATE SET title = COALESCE(excluded.title, title), "
+            "date = COALESCE(excluded.date, date), ingested = excluded.ingested",
+            (source, title, date, time.time()),
+        )
+        return self._db.execute("SELECT id FROM sessions WHERE source = ?", (source,)).fetchone()[0]
+
+    def _speaker_id(self, name: str) -> Tuple[int, str]:
+        """Id and key of the speaker called *name*, registering both if new."""
+        name = " ".join(name.split())
+        cached = self._speaker_ids.get(name)
+        key = normalize_speaker(name)
+        if not key:
+            raise ValueError(f"Speaker name {name!r} has no letters to identify it by")
+        if cached is None:
+            self._db.execute("INSERT OR IGNORE INTO speakers (key, name) VALUES (?, ?)", (key, name))
+            cached = self._db.execute("SELECT id FROM speakers WHERE key = ?", (key,)).fetchone()[0]
+            self._db.execute("INSERT OR IGNORE INTO speaker_aliases (alias, speaker_id) VALUES (?, ?)",
+                             (name, cached))
+            self._speaker_ids[name] = cached
+        return cached, key
+
+    def _insert(self, session_id: int, seq: int, record: Dict[str, Any]) -> int:
+        speaker_id, key = self._speaker_id(record["speaker"])
+        cursor = self._db.execute(
+            "INSERT OR IGNORE INTO quotes (session_id, seq, speaker_id, speaker_key, text, summary, "
+            "start, end, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (session_id, seq, speaker_id, key, record.get("text") or "", record.get("summary") or "",
+             record.get("start"), record.get("end"), record.get("timestamp")),
+        )
+        return cursor.rowcount
+
+    # -- queries ----------------------------------------------------------
+
+    def search(self, query: str | None = None, *, speaker: str | None = None, session: str | None = None,
+               limit: int = 50, offset: int = 0, raw: bool = False) -> List[Quote]:
+        """Quotes matching *query*, optionally only from *speaker* and/or *session*.
+
+        Every word of *query* must appear in the text or the summary,
+        ignoring case and accents (``presupuesto``, ``Presupuésto``). With
+        *raw*, *query* is passed to FTS5 as is (phrases, ``OR``, ``NEAR``,
+        prefixes like ``presupuest*``). Matches are ranked by relevance;
+        without a query quotes come in session order. A *speaker* that
+        normalises to nothing (e.g. ``"..."``) raises ``ValueError``.
+        """
+        where, params = [], []
+        speaker_key = None
+        if speaker is not None:
+            speaker_key = normalize_speaker(speaker)
+            if not speaker_key:
+                raise ValueError(f"Speaker name {speaker!r} has no letters to search for")
+            where.append("q.speaker_key = ?")
+            params.append(speaker_key)
+        if session is not None:
+            where.append("s.source = ?")
+            params.append(session)
+
+        columns = ("s.source, q.seq, sp.name, q.text, q.summary, q.start, q.end, q.timestamp")
+        if query:
+            match = query if raw else "{text summary} : (" + _fts_query(query) + ")"
+            if speaker_key is not None:
+                # let the index intersect the speaker's quotes with the terms
+                match = f"({match}) AND speaker_key : ({_fts_query(speaker_key)})"
+            sql = (f"SELECT {columns}, snippet(quotes_fts, 0, '[', ']', '…', 16) "
+                   "FROM quotes_fts JOIN quotes q ON q.id = quotes_fts.rowid "
+                   "JOIN sessions s ON s.id = q.session_id JOIN speakers sp ON sp.id = q.speaker_id "
+                   f"WHERE quotes_fts MATCH ? {''.join(' AND ' + w for w in where)} "
+                   "ORDER BY rank LIMIT ? OFFSET ?")
+            params = [match, *params]
+        else:
+            sql = (f"SELECT {columns}, NULL FROM quotes q "
+                   "JOIN sessions s ON s.id = q.session_id JOIN speakers sp ON sp.id = q.speaker_id "
+                   f"{'WHERE ' + ' AND '.join(where) if where else ''} "
+                   "ORDER BY s.date, s.id, q.seq LIMIT ? OFFSET ?")
+        with self._lock:
+            rows = self._db.execute(sql, (*params, limit, offset)).fetchall()
+        return [Quote(*row) for row in rows]
+
+    def speakers(self) -> List[Dict[str, Any]]:
+        """Every speaker with the name variants seen and the number of quotes, most quoted first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT sp.id, sp.name, sp.key, COUNT(q.id) FROM speakers sp "
+                "LEFT JOIN quotes q ON q.speaker_id = sp.id GROUP BY sp.id ORDER BY COUNT(q.id) DESC, sp.name"
+            ).fetchall()
+            aliases: Dict[int, List[str]] = {}
+            for alias, speaker_id in self._db.execute("SELECT alias, speaker_id FROM speaker_aliases"):
+                aliases.setdefault(speaker_id, []).append(alias)
+        return [{"name": name, "key": key, "quotes": n, "aliases": sorted(aliases.get(i, []))}
+                for i, name, key, n in rows]
+
+    def sessions(self) -> List[Dict[str, Any]]:
+        """Every stored session with its number of quotes."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT s.source, s.title, s.date, COUNT(q.id) FROM sessions s "
+                "LEFT JOIN quotes q ON q.session_id = s.id GROUP BY s.id ORDER BY s.date, s.id"
+            ).fetchall()
+        return [{"source": source, "title": title, "date": date, "quotes": n} for source, title, date, n in rows]
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(description="Ingest and search processed sessions.")
+    parser.add_argument("--db", default=str(_DEFAULT_PATH), help="SQLite file of the store")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="Add the JSON output of src.pipeline")
+    ingest.add_argument("json", help="JSON array of records written by src.pipeline --output")
+    ingest.add_argument("--source", default=None, help="Session URL or file (default: the JSON path)")
+    ingest.add_argument("--title", default=None)
+    ingest.add_argument("--date", default=None, help="Session date (YYYY-MM-DD); used for ordering")
+    ingest.add_argument("--replace", action="store_true", help="Drop what was stored for this session first")
+
+    search = commands.add_parser("search", help="Full-text search of quotes and summaries")
+    search.add_argument("query", nargs="?", default=None)
+    search.add_argument("--speaker", default=None)
+    search.add_argument("--session", default=None)
+    search.add_argument("--limit", type=int, default=20)
+    search.add_argument("--raw", action="store_true", help="Pass the query to FTS5 unchanged")
+
+    commands.add_parser("speakers", help="List speakers by number of quotes")
+    commands.add_parser("sessions", help="List ingested sessions")
+    args = parser.parse_args()
+
+    store = QuoteStore(args.db)
+    if args.command == "ingest":
+        records = json.loads(Path(args.json).read_text(encoding="utf-8"))
+        added = store.add_session(args.source or args.json, records, title=args.title, date=args.date,
+                                  replace=args.replace)
+        print(f"{added} new quotes ({len(records)} records)")
+    elif args.command == "search":
+        start = time.perf_counter()
+        quotes = store.search(args.query, speaker=args.speaker, session=args.session, limit=args.limit,
+                              raw=args.raw)
+        elapsed = (time.perf_counter() - start) * 1000
+        for quote in quotes:
+            print(f"[{quote.session} {quote.timestamp or '--:--:--'}] {quote.speaker}: "
+                  f"{quote.snippet or quote.summary or quote.text[:200]}")
+        print(f"({len(quotes)} quotes in {elapsed:.1f} ms)")
+    elif args.command == "speakers":
+        for speaker in store.speakers():
+            print(f"{speaker['quotes']:6d}  {speaker['name']}  ({', '.join(speaker['aliases'])})")
+    else:
+        for session in store.sessions():
+            print(f"{session['quotes']:6d}  {session['date'] or '----------'}  {session['source']}"
+                  f"{'  ' + session['title'] if session['title'] else ''}")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,189 @@
+"""On-disk session workspace: per-stage artifacts that survive crashes.
+
+Every stage writes its output as a JSONL artifact whose key hashes the
+session input, the stage configuration and the key of the artifact it was
+computed from, so changing anything upstream invalidates everything below
+it. Records are appended to ``<stage>-<key>.jsonl.partial`` while the stage
+runs and the file is atomically renamed to ``<stage>-<key>.jsonl`` when it
+completes: a rerun skips complete artifacts and resumes partial ones from
+their last record.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .inference.llm_cache import model_fingerprint
+
+# Bump to invalidate every artifact written by older code.
+_FORMAT_VERSION = 1
+
+
+def source_id(source: str | Path) -> str:
+    """Identity of a session input: file path, size and mtime, or the URL itself."""
+    if os.path.exists(source):
+        return model_fingerprint(source)
+    return str(source)
+
+
+def _digest(payload: Any) -> str:
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _write_atomic(path: Path, data: str) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Artifact:
+    """Output of one stage of one session, as a JSONL file of records.
+
+    Appends are thread-safe, so the workers of a stage can share one
+    artifact. Records written before a crash are kept; a record torn by the
+    crash is dropped when the artifact is reopened.
+    """
+
+    def __init__(self, workspace: "Workspace", stage: str, key: str):
+        self.workspace = workspace
+        self.stage = stage
+        self.key = key
+        self.path = workspace.path / f"{stage}-{key[:16]}.jsonl"
+        self.partial_path = self.path.with_name(self.path.name + ".partial")
+        self._lock = threading.Lock()
+        self._file = None
+
+    def __repr__(self) -> str:
+        state = "complete" if self.complete else "partial" if self.partial_path.exists() else "empty"
+        return f"Artifact({self.stage!r}, {self.key[:16]}, {state})"
+
+    @property
+    def complete(self) -> bool:
+        return self.path.exists()
+
+    @property
+    def info(self) -> Dict[str, Any]:
+        """Facts about the run that produced the artifact, recorded with :meth:`note`."""
+        return self.workspace._manifest()["artifacts"].get(self.path.name, {}).get("info", {})
+
+    def note(self, **values: Any) -> None:
+        """Record *values* in :attr:`info` (kept in the manifest, not in the records)."""
+        self.workspace._noted(self, values)
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Every record written so far (complete artifact or resumable partial one)."""
+        path = self.path if self.complete else self.partial_path
+        if not path.exists():
+            return []
+        records = []
+        with open(path, "rb") as f:
+            good = 0
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break  # torn write: drop it and everything after
+                if not line.endswith(b"\n"):
+                    records.pop()
+                    break
+                good += len(line)
+        if path == self.partial_path and good != path.stat().st_size:
+            with open(path, "r+b") as f:
+                f.truncate(good)
+        return records
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """Add one record to the partial artifact (flushed immediately)."""
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self.complete:
+                raise RuntimeError(f"{self} is already complete")
+            if self._file is None:
+                self.records()  # drop a torn last line before appending after it
+                self._file = open(self.partial_path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+
+    def commit(self) -> None:
+        """Mark the stage as done: the partial file becomes the artifact, atomically."""
+        with self._lock:
+            if self.complete:
+                return
+            if self._file is not None:
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+            if not self.partial_path.exists():
+                self.partial_path.touch()
+            os.replace(self.partial_path, self.path)
+        self.workspace._committed(self)
+
+    def close(self) -> None:
+        """Close the partial file without committing (the stage can resume later)."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class Workspace:
+    """Directory holding the artifacts of one session.
+
+    Parameters
+    ----------
+    root : str or Path
+        Directory shared by all sessions.
+    source : str or Path
+        Session input (URL or media file); its identity picks the
+        subdirectory, so the same input always lands in the same workspace.
+    """
+
+    def __init__(self, root: str | Path, source: str | Path):
+        self.source = str(source)
+        self.source_id = source_id(source)
+        name = Path(self.source.rstrip("/")).stem or "session"
+        self.path = Path(root).expanduser() / f"{name[:40]}-{_digest(self.source_id)[:12]}"
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._manifest_lock = threading.Lock()
+
+    def artifact(self, stage: str, config: Dict[str, Any], upstream: Artifact | None = None) -> Artifact:
+        """Artifact of *stage* for this *config*, computed from *upstream*."""
+        key = _digest([_FORMAT_VERSION, self.source_id, stage, config, upstream.key if upstream else None])
+        artifact = Artifact(self, stage, key)
+        self._describe(artifact, config, upstream)
+        return artifact
+
+    def _manifest(self) -> Dict[str, Any]:
+        path = self.path / "manifest.json"
+        if path.exists():
+            return json.loads(path.read_text(encoding="utf-8"))
+        return {"source": self.source, "source_id": self.source_id, "artifacts": {}}
+
+    def _describe(self, artifact: Artifact, config: Dict[str, Any], upstream: Artifact | None) -> None:
+        with self._manifest_lock:
+            manifest = self._manifest()
+            entry = manifest["artifacts"].setdefault(artifact.path.name, {})
+            entry.update(stage=artifact.stage, config=config, complete=artifact.complete,
+                         upstream=upstream.path.name if upstream else None)
+            _write_atomic(self.path / "manifest.json", json.dumps(manifest, indent=2, ensure_ascii=False, default=str))
+
+    def _noted(self, artifact: Artifact, values: Dict[str, Any]) -> None:
+        with self._manifest_lock:
+            manifest = self._manifest()
+            manifest["artifacts"].setdefault(artifact.path.name, {}).setdefault("info", {}).update(values)
+            _write_atomic(self.path / "manifest.json", json.dumps(manifest, indent=2, ensure_ascii=False, default=str))
+
+    def _committed(self, artifact: Artifact) -> None:
+        with self._manifest_lock:
+            manifest = self._manifest()
+            manifest["artifacts"].setdefault(artifact.path.name, {})["complete"] = True
+            _write_atomic(self.path / "manifest.json", json.dumps(manifest, indent=2, ensure_ascii=False, default=str))
+
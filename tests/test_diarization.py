@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from benchmarks.fixtures import synthetic_audio
+from src.inference.diarization import Diarizer
+
+
+def _cluster_purity(turns, truth, step=0.1):
+    """Share of each found cluster's speech that belongs to its majority true speaker."""
+    grid = np.arange(0.0, max(end for _, end, _ in truth), step)
+    ref = np.full(grid.size, -1)
+    hyp = np.full(grid.size, -1)
+    for start, end, label in truth:
+        ref[(grid >= start) & (grid < end)] = label
+    for turn in turns:
+        hyp[(grid >= turn.start) & (grid < turn.end)] = turn.label
+    both = (ref >= 0) & (hyp >= 0)
+    return {int(c): np.bincount(ref[both][hyp[both] == c]).max() / (hyp[both] == c).sum()
+            for c in np.unique(hyp[both])}
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_default_diarizer_finds_three_pure_speakers(seed):
+    audio, truth = synthetic_audio(300, n_speakers=3, seed=seed)
+    purity = _cluster_purity(Diarizer().diarize(audio), truth)
+    assert len(purity) == 3
+    assert min(purity.values()) > 0.9
+
+
+def test_known_speaker_count_is_respected():
+    audio, truth = synthetic_audio(120, n_speakers=2, seed=0)
+    turns = Diarizer(n_speakers=2).diarize(audio)
+    assert {t.label for t in turns} == {0, 1}
+    assert all(a.end <= b.start for a, b in zip(turns, turns[1:]))
+
+
+def test_silence_has_no_turns():
+    assert Diarizer().diarize(np.zeros(16000 * 10, dtype=np.float32)) == []
@@ -0,0 +1,73 @@
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+from src.inference import llm_cache
+from src.inference.llm_cache import LLMCache
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    """A clock that ticks on every call, so access order never ties."""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(llm_cache, "time", SimpleNamespace(time=lambda: float(next(ticks))))
+
+
+def _keys(cache):
+    return {key for (key,) in cache._db.execute("SELECT key FROM completions")}
+
+
+def test_hits_and_misses_are_counted(tmp_path):
+    cache = LLMCache(tmp_path / "cache.sqlite")
+
+    assert cache.get("a") is None
+    cache.put("a", "respuesta")
+    assert cache.get("a") == "respuesta"
+    assert cache.get("a") == "respuesta"
+    assert cache.get("b") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (2, 2, 0.5)
+    assert (stats["entries"], stats["bytes"]) == (1, len("respuesta"))
+
+
+def test_least_recently_used_entry_is_evicted_first(tmp_path):
+    cache = LLMCache(tmp_path / "cache.sqlite", max_entries=3)
+    for key in "abc":
+        cache.put(key, key * 10)
+
+    cache.get("a")  # "b" is now the least recently used
+    cache.put("d", "d" * 10)
+    assert _keys(cache) == {"a", "c", "d"}
+
+    cache.put("e", "e" * 10)
+    assert _keys(cache) == {"a", "d", "e"}
+
+
+def test_size_budget_evicts_until_it_fits(tmp_path):
+    cache = LLMCache(tmp_path / "cache.sqlite", max_bytes=25)
+    cache.put("a", "x" * 10)
+    cache.put("b", "x" * 10)
+    cache.get("a")
+
+    cache.put("c", "x" * 10)
+    assert _keys(cache) == {"a", "c"}
+    assert cache.stats()["bytes"] == 20
+
+
+def test_entries_survive_reopening(tmp_path):
+    LLMCache(tmp_path / "cache.sqlite").put("a", "respuesta")
+
+    cache = LLMCache(tmp_path / "cache.sqlite")
+    assert cache.get("a") == "respuesta"
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_disabled_cache_always_misses(tmp_path):
+    cache = LLMCache(tmp_path / "cache.sqlite", enabled=False)
+    cache.put("a", "respuesta")
+
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+    assert not (tmp_path / "cache.sqlite").exists()
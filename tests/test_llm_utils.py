@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip("llama_cpp")
+
+from src.inference import llm_utils  # noqa: E402
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    calls = {"load": [], "guess": 0}
+
+    def _guess():
+        calls["guess"] += 1
+        return 0
+
+    def _load(path, n_gpu_layers=None, **kwargs):
+        calls["load"].append(dict(kwargs, n_gpu_layers=n_gpu_layers))
+        return object()
+
+    monkeypatch.setattr(llm_utils, "_MODELS", {})
+    monkeypatch.setattr(llm_utils, "_MODEL_INFO", {})
+    monkeypatch.setattr(llm_utils, "_guess_gpu_layers", _guess)
+    monkeypatch.setattr(llm_utils, "load_model", _load)
+    return calls
+
+
+def test_cache_hit_does_not_probe_the_backend(loads, tmp_path):
+    first = llm_utils.get_model(tmp_path / "model.gguf")
+    again = llm_utils.get_model(tmp_path / "model.gguf")
+
+    assert again is first
+    assert loads["guess"] == 1
+    assert loads["load"][0]["n_gpu_layers"] == 0
+
+
+def test_different_loading_parameters_get_their_own_model(loads, tmp_path):
+    path = tmp_path / "model.gguf"
+    base = llm_utils.get_model(path, 0)
+
+    others = [
+        llm_utils.get_model(path, 0, n_threads=2),
+        llm_utils.get_model(path, 0, use_mmap=False),
+        llm_utils.get_model(path, 0, use_mlock=True),
+    ]
+
+    assert all(other is not base for other in others)
+    assert [call["n_threads"] for call in loads["load"]] == [None, 2, None, None]
+    assert [call["use_mmap"] for call in loads["load"]] == [True, True, False, True]
+    assert [call["use_mlock"] for call in loads["load"]] == [False, False, False, True]
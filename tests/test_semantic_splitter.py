@@ -0,0 +1,29 @@
+from src.inference.semantic_splitter import SemanticSplitter
+from src.inference.stt import Segment
+
+
+def _splitter(max_words):
+    # a blank pipeline gets the rule-based sentencizer, no model download needed
+    return SemanticSplitter("blank:es", max_words)
+
+
+def test_unpunctuated_run_is_cut_at_word_boundaries():
+    words = [f"palabra{i}" for i in range(37)]
+    text = "Buenos días. " + " ".join(words) + ". Gracias."
+
+    chunks = [str(chunk) for chunk in _splitter(10).iter_chunks([text])]
+
+    assert all(len(chunk.split()) <= 10 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_cut_sentence_keeps_segment_times():
+    segments = [Segment(float(i), float(i + 1), f"p{i}") for i in range(45)]
+
+    chunks = list(_splitter(10).iter_chunks(segments))
+
+    assert [len(str(chunk).split()) for chunk in chunks] == [10, 10, 10, 10, 5]
+    assert [(chunk.start, chunk.end) for chunk in chunks] == [
+        (0.0, 10.0), (10.0, 20.0), (20.0, 30.0), (30.0, 40.0), (40.0, 45.0),
+    ]
+
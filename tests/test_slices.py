@@ -0,0 +1,73 @@
+import math
+
+import numpy as np
+import pytest
+
+from src.inference.stt import transcribe_slices
+from src.models.download_video import AudioSlice, plan_slices
+
+SAMPLE_RATE = 100  # plenty for timestamps, keeps the fake audio small
+
+
+class ClockEngine:
+    """Fake STT engine: the audio holds its own session time, the text names every second a segment covers.
+
+    Segment boundaries depend on where the slice starts, so two slices never
+    cut the overlap the same way.
+    """
+
+    def __init__(self, segment_s=7.0, phases=None):
+        self.segment_s = segment_s
+        self.phases = phases or {}
+
+    def load(self):
+        return self
+
+    def run(self, item, **kwargs):
+        audio = item["raw"]
+        origin = float(audio[0])
+        duration = audio.size / SAMPLE_RATE
+        phase = self.phases.get(round(origin), (origin * 0.37) % self.segment_s)
+        cuts = [0.0, *np.arange(phase or self.segment_s, duration, self.segment_s), duration]
+        chunks = [
+            {"text": " ".join(str(int(math.floor(origin + t))) for t in np.arange(math.ceil(a), b)),
+             "timestamp": (a, b)}
+            for a, b in zip(cuts[:-1], cuts[1:])
+        ]
+        return [{"text": "", "chunks": chunks}]
+
+
+def _slices(duration, slice_sec, overlap_sec, order):
+    spans = plan_slices(duration, slice_sec=slice_sec, overlap_sec=overlap_sec)
+    for k in order(len(spans)):
+        span = spans[k]
+        t = span.start + np.arange(int((span.end - span.start) * SAMPLE_RATE)) / SAMPLE_RATE
+        yield AudioSlice(span, t.astype(np.float64), SAMPLE_RATE, 0.0)
+
+
+def test_plan_slices_keep_ranges_tile_the_session():
+    spans = plan_slices(1250, slice_sec=600, overlap_sec=10)
+    assert [(s.keep_start, s.keep_end) for s in spans] == [(0, 600), (600, 1200), (1200, math.inf)]
+    assert [(s.start, s.end) for s in spans] == [(0, 610), (590, 1210), (1190, 1250)]
+    with pytest.raises(ValueError):
+        plan_slices(100, slice_sec=20, overlap_sec=10)
+
+
+@pytest.mark.parametrize("order", [lambda n: range(n), lambda n: reversed(range(n))])
+def test_stitched_slices_cover_every_second_once_in_order(order):
+    segments = list(transcribe_slices(_slices(300, 60, 8, order), ClockEngine()))
+    assert all(a.end <= b.start for a, b in zip(segments, segments[1:]))
+    assert all(s.start < s.end for s in segments)
+    said = [int(w) for s in segments for w in s.text.split()]
+    assert set(range(300)) <= set(said)
+    assert abs(segments[0].start) < 1e-9 and segments[-1].end == pytest.approx(300)
+
+
+def test_segment_straddling_a_slice_boundary_is_not_lost():
+    # slice 0 decodes 58-66 around its boundary at 60, slice 1 decodes 52-61:
+    # neither has most of its segment on its own side of the boundary
+    engine = ClockEngine(segment_s=8, phases={0: 2, 52: 1})
+    segments = list(transcribe_slices(_slices(120, 60, 8, lambda n: range(n)), engine))
+    said = {int(w) for s in segments for w in s.text.split()}
+    assert {58, 59, 60} <= said
+    assert all(a.end <= b.start for a, b in zip(segments, segments[1:]))
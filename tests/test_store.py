@@ -0,0 +1,76 @@
+import pytest
+
+from src.store import QuoteStore, normalize_speaker
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = QuoteStore(tmp_path / "quotes.sqlite")
+    yield store
+    store.close()
+
+
+RECORDS = [
+    {"speaker": "Senador López", "text": "El presupuesto de educación es insuficiente.", "summary": "Critica el presupuesto."},
+    {"speaker": "senador Lopez", "text": "Pido que se vote la ley de pesca.", "summary": "Pide votar."},
+    {"speaker": "Presidente Peña", "text": "Tiene la palabra el senador Peña.", "summary": "Da la palabra."},
+    {"speaker": "Senador Peña", "text": "El presupuesto no alcanza para los hospitales.", "summary": "Pide más fondos."},
+    {"speaker": "el Sr. Gómez", "text": "Gracias, presidente.", "summary": ""},
+]
+
+
+def test_honorifics_are_dropped_but_offices_kept():
+    assert normalize_speaker("Senador López") == normalize_speaker("senador Lopez") == "senador lopez"
+    assert normalize_speaker("el Sr. López") == normalize_speaker("Don Lopez") == "lopez"
+    assert normalize_speaker("Presidente Peña") != normalize_speaker("Senador Peña")
+    assert normalize_speaker("Señor") == "senor"
+    assert normalize_speaker("...") == ""
+
+
+def test_ingest_merges_name_variants(store):
+    assert store.add_session("s1", RECORDS) == len(RECORDS)
+    assert store.add_session("s1", RECORDS) == 0  # re-ingesting adds nothing
+
+    speakers = {s["key"]: s for s in store.speakers()}
+    assert speakers["senador lopez"]["quotes"] == 2
+    assert speakers["senador lopez"]["aliases"] == ["Senador López", "senador Lopez"]
+    assert speakers["presidente pena"]["quotes"] == speakers["senador pena"]["quotes"] == 1
+    assert speakers["gomez"]["name"] == "el Sr. Gómez"
+
+
+def test_search_ignores_case_and_accents(store):
+    store.add_session("s1", RECORDS)
+
+    for query in ("presupuesto", "PRESUPUÉSTO"):
+        assert sorted(q.seq for q in store.search(query)) == [0, 3]
+    assert [q.seq for q in store.search("educacion")] == [0]
+
+
+def test_search_by_speaker(store):
+    store.add_session("s1", RECORDS)
+
+    assert [q.seq for q in store.search(speaker="SENADOR LÓPEZ")] == [0, 1]
+    assert [q.seq for q in store.search("presupuesto", speaker="senador pena")] == [3]
+    assert store.search("presupuesto", speaker="presidente pena") == []
+    # the office alone is not enough to match a multi-word key
+    assert store.search("presupuesto", speaker="senador") == []
+
+
+def test_nameless_speaker_is_rejected(store):
+    with pytest.raises(ValueError):
+        store.add_session("s1", [{"speaker": "—", "text": "x", "summary": ""}])
+    assert store.sessions() == []
+    with pytest.raises(ValueError):
+        store.search("presupuesto", speaker="...")
+
+
+def test_rolled_back_speaker_ids_are_not_reused(store):
+    with pytest.raises(ValueError):
+        store.add_session("s1", [{"speaker": "Senador X", "text": "uno", "summary": ""},
+                                 {"speaker": "—", "text": "dos", "summary": ""}])
+    store.add_session("s2", [{"speaker": "Diputado Y", "text": "tres", "summary": ""}])
+    store.add_session("s3", [{"speaker": "Senador X", "text": "cuatro", "summary": ""}])
+
+    assert [(q.speaker, q.text) for q in store.search(speaker="senador x")] == [("Senador X", "cuatro")]
+    assert [(q.speaker, q.text) for q in store.search(speaker="diputado y")] == [("Diputado Y", "tres")]
+    assert {s["name"]: s["quotes"] for s in store.speakers()} == {"Senador X": 1, "Diputado Y": 1}
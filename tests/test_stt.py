@@ -0,0 +1,181 @@
+import multiprocessing
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.inference import stt
+from src.inference.stt import transcribe_batch
+
+SAMPLE_RATE = 16_000
+
+
+def _fake_decode(path, sample_rate=SAMPLE_RATE):
+    """Stands in for ``decode_audio_timed`` in the decoder processes: the file holds "<id> <seconds>"."""
+    file_id, seconds = open(path).read().split()
+    if file_id == "bad":
+        raise OSError(f"cannot decode {path}")
+    time.sleep(0.01)
+    return path, np.full(int(float(seconds) * sample_rate), int(file_id) / 1000, dtype=np.float32), 0.01
+
+
+class FakeEngine:
+    """Names the file each input came from; optionally slow or failing on some call."""
+
+    def __init__(self, delay=0.0, fail_on_call=None):
+        self.delay = delay
+        self.fail_on_call = fail_on_call
+        self.calls = []
+
+    def load(self):
+        return self
+
+    def run(self, inputs, **kwargs):
+        if isinstance(inputs, dict):
+            inputs = [inputs]
+        self.calls.append(len(inputs))
+        if self.fail_on_call == len(self.calls):
+            raise RuntimeError("engine failed")
+        time.sleep(self.delay)
+        results = []
+        for item in inputs:
+            duration = item["raw"].size / item["sampling_rate"]
+            text = f"archivo {round(float(item['raw'][0]) * 1000)}"
+            results.append({"text": text, "chunks": [{"text": text, "timestamp": (0.0, duration)}]})
+        return results
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    monkeypatch.setattr(stt, "decode_audio_timed", _fake_decode)
+
+    def _make(seconds):
+        paths = []
+        for i, s in enumerate(seconds):
+            path = tmp_path / f"{i}.wav"
+            path.write_text(f"{i} {s}")
+            paths.append(str(path))
+        return paths
+    return _make
+
+
+def test_results_keep_input_order_with_per_file_timings(files):
+    seconds = [40, 5, 70, 5, 5, 12]
+    paths = files(seconds)
+
+    results = transcribe_batch(paths, FakeEngine(delay=0.02), batch_size=4, workers=3, queue_size=2)
+
+    assert [r.path for r in results] == paths
+    assert [r.text for r in results] == [f"archivo {i}" for i in range(len(paths))]
+    for r, s in zip(results, seconds):
+        assert r.audio_seconds == s
+        assert r.decode_time == pytest.approx(0.01)
+        assert r.inference_time > 0
+        assert r.rtf == pytest.approx(r.inference_time / s)
+        assert (r.transcript.view().start, r.transcript.view().end) == (0.0, s)
+
+
+def test_queued_short_files_share_one_batch(files):
+    paths = files([5] * 8)
+    engine = FakeEngine(delay=0.3)  # the decoders fill the queue during the first call
+
+    results = transcribe_batch(paths, engine, batch_size=4, workers=4, queue_size=4)
+
+    assert [r.text for r in results] == [f"archivo {i}" for i in range(8)]
+    assert sum(engine.calls) == 8
+    assert max(engine.calls) == 4  # never more windows than batch_size
+    assert len(engine.calls) < 8
+
+
+def _run_in_thread(fn):
+    outcome = {}
+
+    def _target():
+        try:
+            outcome["result"] = fn()
+        except BaseException as exc:
+            outcome["error"] = exc
+
+    thread = threading.Thread(target=_target, daemon=True)
+    thread.start()
+    thread.join(timeout=30)
+    assert not thread.is_alive(), "transcribe_batch hung"
+    return outcome
+
+
+def test_engine_error_propagates_and_shuts_the_pool_down(files):
+    paths = files([5] * 30)  # far more than the queue and the pool hold
+
+    outcome = _run_in_thread(lambda: transcribe_batch(
+        paths, FakeEngine(fail_on_call=2), batch_size=1, workers=2, queue_size=1))
+
+    assert isinstance(outcome.get("error"), RuntimeError)
+    assert not any(t.name == "stt-decode" for t in threading.enumerate())
+    assert multiprocessing.active_children() == []
+
+
+def test_decoder_error_propagates(files, tmp_path):
+    paths = files([5, 5])
+    bad = tmp_path / "bad.wav"
+    bad.write_text("bad 5")
+
+    outcome = _run_in_thread(lambda: transcribe_batch([*paths, str(bad)], FakeEngine(), workers=2))
+
+    assert isinstance(outcome.get("error"), OSError)
+    assert multiprocessing.active_children() == []
+
+
+def _spoken_pcm(seed, seconds, sample_rate):
+    """Synthetic speech: words of constant amplitude (their id) between pauses, and one long pause."""
+    rng = np.random.default_rng(seed)
+    pcm = np.zeros(int(seconds * sample_rate), dtype="<i2")
+    words = []
+    t = 0.2
+    while t < seconds - 1.0:
+        if 9.0 <= t < 13.0:
+            t = 13.0  # nothing said for 4 s
+            continue
+        length = rng.uniform(0.2, 0.9)
+        start, end = int(t * sample_rate), int((t + length) * sample_rate)
+        pcm[start:end] = len(words) + 1
+        words.append((f"w{len(words) + 1}", start / sample_rate, end / sample_rate))
+        t += length + rng.choice([0.0, rng.uniform(0.05, 0.5)])
+    return pcm, words
+
+
+class WordEngine:
+    """Recognises each run of one non-zero amplitude as a word, with its exact times in the window."""
+
+    def run(self, item, return_timestamps=True, **kwargs):
+        values = np.rint(item["raw"] * 32768).astype(np.int32)
+        edges = np.flatnonzero(np.diff(values)) + 1
+        starts = np.concatenate([[0], edges])
+        ends = np.concatenate([edges, [values.size]])
+        chunks = [{"text": f"w{values[s]}", "timestamp": (s / item["sampling_rate"], e / item["sampling_rate"])}
+                  for s, e in zip(starts, ends) if values[s]]
+        return [{"text": " ".join(c["text"] for c in chunks), "chunks": chunks}]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_stream_windows_are_stitched_without_gaps_or_repeats(seed):
+    sample_rate = 1000
+    pcm, words = _spoken_pcm(seed, 40.0, sample_rate)
+    data = pcm.tobytes()
+    rng = np.random.default_rng(seed)
+    cuts = np.sort(rng.choice(len(data), 50, replace=False))  # odd byte counts split samples
+    blocks = [data[a:b] for a, b in zip([0, *cuts], [*cuts, len(data)])]
+
+    segments = list(stt.transcribe_stream(blocks, WordEngine(), sample_rate=sample_rate, window_s=6.0,
+                                          overlap_s=2.0, word_timestamps=True, start_s=100.0))
+
+    assert [seg.text for seg in segments] == [text for text, _, _ in words]
+    for seg, (_, start, end) in zip(segments, words):
+        assert seg.start == pytest.approx(100.0 + start, abs=1e-6)
+        assert seg.end == pytest.approx(100.0 + end, abs=1e-6)
+    assert all(a.end <= b.start + 1e-6 for a, b in zip(segments, segments[1:]))
+
+
+def test_stream_rejects_overlap_of_half_a_window():
+    with pytest.raises(ValueError):
+        list(stt.transcribe_stream([b""], WordEngine(), window_s=10.0, overlap_s=5.0))
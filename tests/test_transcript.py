@@ -0,0 +1,64 @@
+import math
+
+import pytest
+
+from src.inference.transcript import Transcript, TranscriptView
+
+UNITS = [("Buenos", 0.0, 0.4), ("días", 0.4, 0.9), (" ", 0.9, 1.0), ("señor", 1.2, 1.6),
+         ("presidente.", 1.6, 2.3), ("Gracias.", 3.0, 3.5)]
+
+
+def _transcript():
+    return Transcript.from_units(UNITS)
+
+
+def test_from_units_joins_words_and_drops_blanks():
+    t = _transcript()
+
+    assert str(t) == "Buenos días señor presidente. Gracias."
+    assert len(t) == 5
+    assert [t.text[a:b] for a, b in zip(t.char_start, t.char_end)] == [
+        "Buenos", "días", "señor", "presidente.", "Gracias."]
+
+
+def test_view_text_times_and_units():
+    view = _transcript().view(1, 4)
+
+    assert isinstance(view, TranscriptView)
+    assert view.text == "días señor presidente."
+    assert (view.start, view.end) == (pytest.approx(0.4), pytest.approx(2.3))  # stored as float32
+    assert [u[0] for u in view.units()] == ["días", "señor", "presidente."]
+    assert view.view(1).text == "señor presidente."
+    assert view.view(2, 10).text == "presidente."
+
+
+def test_span_maps_characters_of_the_view_to_units():
+    view = _transcript().view(1)
+    text = view.text
+
+    lo = text.index("señor")
+    sub = view.span(lo, lo + len("señor presidente."))
+    assert sub.text == "señor presidente."
+    assert (sub.lo, sub.hi) == (2, 4)
+    # a span touching part of a word takes the whole word
+    assert view.span(lo + 2, lo + 3).text == "señor"
+
+
+def test_split_at_cuts_before_the_word_holding_the_character():
+    view = _transcript().view()
+    text = view.text
+
+    left, right = view.split_at(text.index("presidente") + 3)
+    assert (left.text, right.text) == ("Buenos días señor", "presidente. Gracias.")
+    assert left.hi == right.lo
+
+    head, tail = view.split_at(0)
+    assert not head and tail.text == text
+    assert math.isnan(head.start) and head.text == ""
+
+
+def test_from_text_has_unknown_times():
+    view = Transcript.from_text("  hola  mundo ").view()
+
+    assert [u[0] for u in view.units()] == ["hola", "mundo"]
+    assert math.isnan(view.start) and view.timestamp == "--:--:--"
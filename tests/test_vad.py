@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from src.inference.vad import plan_clips
+
+SAMPLE_RATE = 100
+
+
+def _audio(seconds, speech):
+    """Silence with a tone over each ``(start_s, end_s)`` of *speech*; also returns the sample regions."""
+    audio = np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+    regions = np.array([(int(a * SAMPLE_RATE), int(b * SAMPLE_RATE)) for a, b in speech])
+    for start, end in regions:
+        audio[start:end] = np.sin(np.arange(end - start))
+    return audio, regions
+
+
+def test_regions_are_packed_with_gaps_and_mapped_back():
+    audio, regions = _audio(60, [(2, 5), (10, 14), (40, 45)])
+
+    plan = plan_clips(audio, regions, SAMPLE_RATE, max_clip_s=30.0, gap_s=0.5)
+
+    assert len(plan.clips) == 1
+    clip = plan.clips[0]
+    np.testing.assert_allclose(clip.clip_start, [0.0, 3.5, 8.0])
+    np.testing.assert_allclose(clip.source_start, [2.0, 10.0, 40.0])
+    np.testing.assert_allclose(clip.duration, [3.0, 4.0, 5.0])
+    assert clip.audio.size == int(13.0 * SAMPLE_RATE)
+    assert plan.speech_seconds == pytest.approx(12.0)
+    assert plan.skipped == pytest.approx(1 - 12 / 60)
+
+    assert clip.to_source(0.0) == pytest.approx(2.0)
+    assert clip.to_source(1.5) == pytest.approx(3.5)
+    assert clip.to_source(4.0) == pytest.approx(10.5)
+    assert clip.to_source(9.0) == pytest.approx(41.0)
+    # inside a gap: clamped to the end of the previous piece
+    assert clip.to_source(3.2) == pytest.approx(5.0)
+
+
+def test_piece_boundary_belongs_to_the_later_piece_unless_it_is_an_end():
+    audio, regions = _audio(30, [(1, 3), (10, 12)])
+    clip = plan_clips(audio, regions, SAMPLE_RATE, gap_s=0.0).clips[0]
+
+    assert clip.to_source(2.0) == pytest.approx(10.0)
+    assert clip.to_source(2.0, end=True) == pytest.approx(3.0)
+
+
+def test_clips_never_exceed_the_limit():
+    audio, regions = _audio(200, [(0, 20), (25, 40), (50, 125)])
+
+    plan = plan_clips(audio, regions, SAMPLE_RATE, max_clip_s=30.0, gap_s=0.1)
+
+    assert all(clip.audio.size <= 30 * SAMPLE_RATE for clip in plan.clips)
+    # every speech second is sent exactly once, and maps back to where it came from
+    pieces = sorted((float(s), float(s + d)) for clip in plan.clips
+                    for s, d in zip(clip.source_start, clip.duration))
+    assert sum(b - a for a, b in pieces) == pytest.approx(110.0)
+    assert all(b0 <= a1 for (_, b0), (a1, _) in zip(pieces, pieces[1:]))
+    for clip in plan.clips:
+        for c, s, d in zip(clip.clip_start, clip.source_start, clip.duration):
+            start = int(round(c * SAMPLE_RATE))
+            source = int(round(s * SAMPLE_RATE))
+            n = int(round(d * SAMPLE_RATE))
+            np.testing.assert_array_equal(clip.audio[start:start + n], audio[source:source + n])
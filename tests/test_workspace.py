@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from src.workspace import Workspace
+
+SOURCE = "https://example.org/sesion-2024-05-02"
+
+
+def test_torn_last_line_is_dropped_and_appending_resumes_after_it(tmp_path):
+    artifact = Workspace(tmp_path, SOURCE).artifact("transcribe", {"model": "small"})
+    for i in range(3):
+        artifact.append({"seq": i})
+    artifact.close()
+    with open(artifact.partial_path, "ab") as f:
+        f.write(b'{"seq": 3, "te')  # killed mid-write
+
+    resumed = Workspace(tmp_path, SOURCE).artifact("transcribe", {"model": "small"})
+    assert resumed.path == artifact.path
+    assert resumed.records() == [{"seq": 0}, {"seq": 1}, {"seq": 2}]
+
+    resumed.append({"seq": 3})
+    resumed.commit()
+    assert resumed.records() == [{"seq": i} for i in range(4)]
+    assert not resumed.partial_path.exists()
+
+
+def test_complete_json_without_newline_counts_as_torn(tmp_path):
+    artifact = Workspace(tmp_path, SOURCE).artifact("speakers", {})
+    artifact.partial_path.write_bytes(b'{"seq": 0}\n{"seq": 1}')
+
+    assert artifact.records() == [{"seq": 0}]
+    assert artifact.partial_path.read_bytes() == b'{"seq": 0}\n'
+
+
+def test_committed_artifact_is_reused_and_read_only(tmp_path):
+    artifact = Workspace(tmp_path, SOURCE).artifact("summaries", {"max_tokens": 256})
+    artifact.append({"seq": 0})
+    artifact.commit()
+
+    again = Workspace(tmp_path, SOURCE).artifact("summaries", {"max_tokens": 256})
+    assert again.complete and again.records() == [{"seq": 0}]
+    with pytest.raises(RuntimeError):
+        again.append({"seq": 1})
+
+
+def test_config_or_upstream_change_starts_over(tmp_path):
+    workspace = Workspace(tmp_path, SOURCE)
+    transcribe = workspace.artifact("transcribe", {"model": "small"})
+    speakers = workspace.artifact("speakers", {"prompt": 1}, transcribe)
+    speakers.append({"seq": 0})
+    speakers.close()
+
+    other_config = workspace.artifact("speakers", {"prompt": 2}, transcribe)
+    other_upstream = workspace.artifact("speakers", {"prompt": 1},
+                                        workspace.artifact("transcribe", {"model": "large"}))
+    assert other_config.records() == [] and other_upstream.records() == []
+    assert workspace.artifact("speakers", {"prompt": 1}, transcribe).records() == [{"seq": 0}]
+
+
+def test_notes_are_kept_in_the_manifest(tmp_path):
+    artifact = Workspace(tmp_path, SOURCE).artifact("transcribe", {})
+    artifact.note(live=True, started_at=123.0)
+    artifact.note(started_at=456.0)
+
+    assert Workspace(tmp_path, SOURCE).artifact("transcribe", {}).info == {"live": True, "started_at": 456.0}
+
+
+def test_modified_local_file_gets_a_new_workspace(tmp_path):
+    media = tmp_path / "sesion.wav"
+    media.write_bytes(b"RIFF0000")
+    before = Workspace(tmp_path / "ws", media)
+
+    media.write_bytes(b"RIFF00000000")
+    os.utime(media, ns=(0, 1))
+    assert Workspace(tmp_path / "ws", media).path != before.path